@@ -0,0 +1,110 @@
+import json
+import numpy as np
+
+# magnus coefficients (sonntag 1990), good to about 0.35 °C between -45 and 60 °C.
+MAGNUS_A = 17.62
+MAGNUS_B = 243.12
+MAX_HISTOGRAM_BINS = 200
+
+def dew_point(temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+  with np.errstate(divide='ignore', invalid='ignore'):
+    gamma = np.log(humidity / 100.0) + MAGNUS_A * temperature / (MAGNUS_B + temperature)
+    return MAGNUS_B * gamma / (MAGNUS_A - gamma)
+
+def absolute_humidity(temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+  # grams of water vapour per cubic metre of air.
+  vapour_pressure = 6.112 * np.exp(MAGNUS_A * temperature / (MAGNUS_B + temperature)) * humidity / 100.0
+  return 216.7 * vapour_pressure / (273.15 + temperature)
+
+def heat_index(temperature: np.ndarray, humidity: np.ndarray) -> np.ndarray:
+  # nws algorithm: steadman's simple formula, rothfusz regression and its adjustments above 80 °F.
+  t = temperature * 9 / 5 + 32
+  rh = humidity
+
+  simple = 0.5 * (t + 61.0 + (t - 68.0) * 1.2 + rh * 0.094)
+
+  regression = (
+    -42.379 + 2.04901523 * t + 10.14333127 * rh
+    - 0.22475541 * t * rh - 6.83783e-3 * t * t
+    - 5.481717e-2 * rh * rh + 1.22874e-3 * t * t * rh
+    + 8.5282e-4 * t * rh * rh - 1.99e-6 * t * t * rh * rh
+  )
+
+  with np.errstate(invalid='ignore'):
+    dry = (rh < 13) & (t >= 80) & (t <= 112)
+    regression = np.where(dry, regression - (13 - rh) / 4 * np.sqrt(np.clip(17 - np.abs(t - 95), 0, None) / 17), regression)
+
+  humid = (rh > 85) & (t >= 80) & (t <= 87)
+  regression = np.where(humid, regression + (rh - 85) / 10 * (87 - t) / 5, regression)
+
+  result = np.where((simple + t) / 2 >= 80, regression, simple)
+  return (result - 32) * 5 / 9
+
+METRICS = {
+  'temperature': lambda temperature, _: temperature,
+  'humidity': lambda _, humidity: humidity,
+  'dew_point': dew_point,
+  'heat_index': heat_index,
+  'absolute_humidity': absolute_humidity
+}
+
+def metric(series: np.ndarray, name: str) -> np.ndarray:
+  if name not in METRICS:
+    raise Exception(f'Unsupported metric "{name}", use {", ".join(METRICS)}.')
+
+  # series columns are ts, temperature and humidity, as loaded by series_array_async.
+  return METRICS[name](series[:, 1], series[:, 2])
+
+def derived(series: np.ndarray) -> dict[str, np.ndarray]:
+  return {'ts': series[:, 0].astype(np.int64)} | {name: metric(series, name) for name in METRICS}
+
+def rolling(ts: np.ndarray, values: np.ndarray, window: int) -> dict[str, np.ndarray]:
+  # time based window, (ts - window, ts], so gaps in the data shrink it instead of skewing it.
+  left = np.searchsorted(ts, ts - window, side='right')
+  right = np.arange(1, len(ts) + 1)
+  count = right - left
+
+  sums = np.concatenate(([0.0], np.cumsum(values)))
+  squares = np.concatenate(([0.0], np.cumsum(values * values)))
+
+  mean = (sums[right] - sums[left]) / count
+  variance = np.maximum((squares[right] - squares[left]) / count - mean * mean, 0.0)
+
+  return {
+    'ts': ts.astype(np.int64),
+    'mean': mean,
+    'std': np.sqrt(variance),
+    'count': count
+  }
+
+def histogram(values: np.ndarray, bins: int) -> dict[str, np.ndarray | dict[str, float]]:
+  values = values[np.isfinite(values)]
+
+  if len(values) == 0:
+    return {'edges': np.empty(0), 'counts': np.empty(0, dtype=np.int64), 'percentiles': {}}
+
+  counts, edges = np.histogram(values, bins=min(bins, MAX_HISTOGRAM_BINS))
+  percentiles = np.percentile(values, (5, 25, 50, 75, 95))
+
+  return {
+    'edges': edges,
+    'counts': counts,
+    'percentiles': {f'p{p}': float(value) for p, value in zip((5, 25, 50, 75, 95), percentiles)}
+  }
+
+def encode(columns: dict) -> bytes:
+  # json has no nan or inf, a reading the formulas can't handle is sent as null.
+  result = {}
+
+  for name, value in columns.items():
+    if isinstance(value, np.ndarray) and value.dtype.kind == 'f':
+      rounded = np.round(value, 3).astype(object)
+      rounded[~np.isfinite(value)] = None
+      result[name] = rounded.tolist()
+    elif isinstance(value, np.ndarray):
+      result[name] = value.tolist()
+    else:
+      result[name] = value
+
+  # already plain lists, jsonable_encoder would only walk every value again.
+  return json.dumps(result, separators=(',', ':')).encode()
@@ -0,0 +1,37 @@
+import numpy as np
+
+MAX_BATCH_QUERIES = 32
+
+def merge_ranges(ranges: list[tuple[int, int]]) -> list[tuple[int, int]]:
+  # overlapping periods are scanned once, year over year periods stay separate ranges.
+  merged: list[tuple[int, int]] = []
+
+  for start, end in sorted(ranges):
+    if merged and start <= merged[-1][1]:
+      merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+    else:
+      merged.append((start, end))
+
+  return merged
+
+def range_clause(column: str, ranges: list[tuple[int, int]]) -> tuple[str, list[int]]:
+  return '(' + ' OR '.join(f'({column} >= ? AND {column} < ?)' for _ in ranges) + ')', [value for r in ranges for value in r]
+
+def group_series(rows: np.ndarray, start: int, end: int, sensor_id: int | None, scale: float) -> list[tuple[int, float, float]]:
+  # rows are (sensor_id, ts, temperature_sum, humidity_sum, count), sorted by ts.
+  lo, hi = np.searchsorted(rows[:, 1], (start, end))
+  rows = rows[lo:hi]
+
+  if sensor_id is not None:
+    rows = rows[rows[:, 0] == sensor_id]
+
+  if len(rows) == 0:
+    return []
+
+  # same average as the rollup queries, sum over sum of counts per bucket across sensors.
+  buckets, inverse = np.unique(rows[:, 1], return_inverse=True)
+  counts = np.bincount(inverse, weights=rows[:, 4]) * scale
+  temperature = np.bincount(inverse, weights=rows[:, 2]) / counts
+  humidity = np.bincount(inverse, weights=rows[:, 3]) / counts
+
+  return list(zip(buckets.tolist(), temperature.tolist(), humidity.tolist()))
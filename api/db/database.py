@@ -1,6 +1,18 @@
+import asyncio
 import calendar
+import time
 import aiosqlite
-from datetime import datetime, timedelta
+import numpy as np
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import AsyncGenerator, AsyncIterator, Iterator, Optional
+from api.db.batch import MAX_BATCH_QUERIES, group_series, merge_ranges, range_clause
+from api.db.downsample import lttb, reconstruct
+from api.db.pagination import Page, encode_cursor
+from api.db.recent import RecentReadings
+from api.db.read_pool import ReadPool, queue_depth
+from api.metrics import db_query_duration, timed
+from api.db.storage import FIXED_POINT, to_fixed, hour_start, day_start, date_start, date_end, fmt_ts
 from api.models.app_config import AppConfig
 from api.models.status_response import StatusResponse
 from api.models.entries.log_entry import LogEntry
@@ -8,66 +20,139 @@ from api.models.log_delete_result import LogDeleteResult
 from api.models.daterange import DateRange
 from api.models.entries.statistic_entry import StatisticEntry
 from api.models.entries.sensor_entry import SensorEntry
+from api.models.sensor_config import SensorConfig
+from api.models.series_query import SeriesQuery
+from api.models.series_result import SeriesResult
+
+SCALE = float(FIXED_POINT)
+CLOSED_PERIOD_GRACE = 3600
+COMPACTED_BUCKET = 300
+INCREMENTAL_VACUUM_PAGES = 2048
+BULK_CHUNK_SIZE = 50000
+STORED_KEYS_CHUNK = 500
+EXPORT_BATCH_SIZE = 65536
+WRITE_LOCK_TIMEOUT = 30
+
+# which tables a buffered reading is written to, compressed polls skip the raw row.
+STORE_RAW = 1
+STORE_ROLLUP = 2
+STORE_ALL = STORE_RAW | STORE_ROLLUP
+COMPRESSION_MODES = ('off', 'deadband', 'swinging_door')
+FILL_MODES = ('step', 'linear')
+
+# tables copied into a ranged dump and the timestamp column they are filtered on.
+DUMP_TABLES = (
+  ('sensors', None),
+  ('config', None),
+  ('meta', None),
+  ('readings', 'ts'),
+  ('readings_5min', 'bucket_ts'),
+  ('readings_hourly', 'hour_ts'),
+  ('readings_daily', 'day_ts')
+)
+
+def _rollup_upsert(table: str, bucket: str) -> str:
+  return f"""
+    INSERT INTO {table} (
+      sensor_id, {bucket}, count,
+      temperature_sum, temperature_min, temperature_max,
+      humidity_sum, humidity_min, humidity_max
+    ) VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)
+    ON CONFLICT (sensor_id, {bucket}) DO UPDATE SET
+      count = count + 1,
+      temperature_sum = temperature_sum + excluded.temperature_sum,
+      temperature_min = MIN(temperature_min, excluded.temperature_min),
+      temperature_max = MAX(temperature_max, excluded.temperature_max),
+      humidity_sum = humidity_sum + excluded.humidity_sum,
+      humidity_min = MIN(humidity_min, excluded.humidity_min),
+      humidity_max = MAX(humidity_max, excluded.humidity_max);
+  """
+
+def _bulk_rollup(table: str, bucket: str, expression: str) -> str:
+  return f"""
+    INSERT INTO {table} (
+      sensor_id, {bucket}, count,
+      temperature_sum, temperature_min, temperature_max,
+      humidity_sum, humidity_min, humidity_max
+    )
+    SELECT
+      sensor_id, {expression}, COUNT(*),
+      SUM(temperature), MIN(temperature), MAX(temperature),
+      SUM(humidity), MIN(humidity), MAX(humidity)
+    FROM bulk_staging
+    WHERE true
+    GROUP BY sensor_id, {expression}
+    ON CONFLICT (sensor_id, {bucket}) DO UPDATE SET
+      count = count + excluded.count,
+      temperature_sum = temperature_sum + excluded.temperature_sum,
+      temperature_min = MIN(temperature_min, excluded.temperature_min),
+      temperature_max = MAX(temperature_max, excluded.temperature_max),
+      humidity_sum = humidity_sum + excluded.humidity_sum,
+      humidity_min = MIN(humidity_min, excluded.humidity_min),
+      humidity_max = MAX(humidity_max, excluded.humidity_max);
+  """
 
 class Database:
   def __init__(self, db_file: str):
     self.dbfile = db_file
     self.ctx: aiosqlite.Connection
+    self.readers: Optional[ReadPool] = None
     self.config: AppConfig = AppConfig.default()
 
-  async def all_async(self) -> list[SensorEntry]:
-    async with self.ctx.execute("""
-      SELECT
-        timestamp_date as ts,
-        AVG(temperature) AS temperature,
-        AVG(humidity) AS humidity
-      FROM sensor_data
-      GROUP BY ts
-      ORDER BY ts;
-    """) as cursor:
+    self._write_lock = asyncio.Lock()
+    self._pending_readings: list[tuple[int, int, int, int, int]] = []
+    self._pending_logs: list[tuple[str, str, int]] = []
+    self._flush_task: Optional[asyncio.Task] = None
 
-      return [SensorEntry.from_row(row) for row in await cursor.fetchall()]
+    # bumped on every reading write, history_version only when closed periods change.
+    self.data_version = 0
+    self.history_version = 0
 
-  async def by_month_async(self, year: int, month: int) -> list[SensorEntry]:
-    (_, days) = calendar.monthrange(year, month)
-    start_date = datetime(year, month, 1).strftime(self.config.dateformat)
-    end_date = datetime(year, month, days).strftime(self.config.dateformat)
+    # what this process last saw of other processes' commits, see sync_async.
+    self._seen_data_version = 0
+    self._seen_history_version = 0
+    self._seen_config_version = 0
+    self._history_changed = False
 
-    async with self.ctx.execute("""
-      SELECT
-        timestamp_date as ts,
-        AVG(temperature) AS temperature,
-        AVG(humidity) AS humidity
-      FROM sensor_data
-      WHERE timestamp_date BETWEEN ? AND ?
-      GROUP BY ts
-      ORDER BY ts;
-    """, [start_date, end_date]) as cursor:
+    # readings before this epoch only exist in the 5 minute, hourly and daily tiers.
+    self.compacted_until = 0
+
+    # 5 minute and hourly buckets before this epoch were pruned, only days are left.
+    self.pruned_until = 0
+
+    # ring buffers of the sensors this process polls, see SensorPoll.prefill.
+    self.recent = RecentReadings()
+
+  @timed(db_query_duration)
+  async def all_async(self, sensor_id: int | None = None, points: int | None = None, page: Page | None = None) -> list[SensorEntry]:
+    return [SensorEntry.from_row(row) async for row in self.iter_all_async(sensor_id, points, page)]
+
+  def iter_all_async(self, sensor_id: int | None = None, points: int | None = None, page: Page | None = None) -> AsyncIterator[dict]:
+    start = page.start(None) if page else None
+
+    return self._iter_entries_async(*self._daily_query(sensor_id, start), self.config.dateformat, points, page)
 
-      return [SensorEntry.from_row(row) for row in await cursor.fetchall()]
+  @timed(db_query_duration)
+  async def by_month_async(self, year: int, month: int, sensor_id: int | None = None, points: int | None = None, page: Page | None = None) -> list[SensorEntry]:
+    return [SensorEntry.from_row(row) async for row in self.iter_by_month_async(year, month, sensor_id, points, page)]
 
-  async def by_week_async(self, week: str) -> list[SensorEntry]:
-    first = datetime.strptime(f'{week}-1', self.config.iso_week_format)
+  def iter_by_month_async(self, year: int, month: int, sensor_id: int | None = None, points: int | None = None, page: Page | None = None) -> AsyncIterator[dict]:
+    start, end = self.month_bounds(year, month)
+    start = page.start(start) if page else start
 
+    return self._iter_entries_async(*self._daily_query(sensor_id, start, end), self.config.dateformat, points, page)
+
+  @timed(db_query_duration)
+  async def by_week_async(self, week: str, sensor_id: int | None = None) -> list[SensorEntry]:
     data_by_weekday: dict[str, SensorEntry] = {}
 
-    start_date = first.strftime(self.config.dateformat)
-    end_date = (first + timedelta(days=6)).strftime(self.config.dateformat)
+    start, end = self.week_bounds(week)
 
-    async with self.ctx.execute("""
-      SELECT
-        timestamp_date AS ts,
-        AVG(temperature) AS temperature,
-        AVG(humidity) AS humidity
-      FROM sensor_data
-      WHERE timestamp_date BETWEEN ? AND ?
-      GROUP BY ts
-      ORDER BY ts ASC;
-    """, [start_date, end_date]) as cursor:
+    async with self._reader() as ctx, ctx.execute(*self._daily_query(sensor_id, start, end)) as cursor:
       rows = await cursor.fetchall()
 
       for row in rows:
-        dt = datetime.strptime(row["ts"], self.config.dateformat)
+        dt = datetime.fromtimestamp(row["ts"])
         weekday = calendar.day_name[dt.weekday()]
 
         data_by_weekday[weekday] = SensorEntry(
@@ -92,118 +177,1429 @@ class Database:
 
     return entries
 
-  async def by_date_async(self, day, month, year) -> list[SensorEntry]:
-    date = datetime(year, month, day).strftime(self.config.dateformat)
-    async with self.ctx.execute("""
-      SELECT
-        timestamp_time as ts,
-        temperature,
-        humidity
-      FROM sensor_data
-      WHERE timestamp_date = ?
-      GROUP BY ts
-      ORDER BY ts;
-    """, [date]) as cursor:
+  @timed(db_query_duration)
+  async def by_date_async(self, day, month, year, sensor_id: int | None = None, points: int | None = None, page: Page | None = None, fill: str | None = None) -> list[SensorEntry]:
+    return [SensorEntry.from_row(row) async for row in self.iter_by_date_async(day, month, year, sensor_id, points, page, fill)]
 
-      return [SensorEntry.from_row(row) for row in await cursor.fetchall()]
+  def iter_by_date_async(self, day, month, year, sensor_id: int | None = None, points: int | None = None, page: Page | None = None, fill: str | None = None) -> AsyncIterator[dict]:
+    start, end = self.date_bounds(day, month, year)
+    start = page.start(start) if page else start
 
-  async def by_range_async(self, start: str, end: str) -> list[SensorEntry]:
-    start_date = datetime.strptime(start, self.config.dateformat).date()
-    end_date = datetime.strptime(end, self.config.dateformat).date()
+    recent = self._recent_rows(sensor_id, start, end)
+    if recent is not None:
+      return self._iter_recent_async(recent, self.config.timeformat, points, page, fill)
 
-    async with self.ctx.execute(f"""
-      SELECT
-        timestamp_date as ts,
-        AVG(temperature) as temperature,
-        AVG(humidity) as humidity
-      FROM sensor_data
-      WHERE DATE(timestamp_date) BETWEEN ? AND ?
-      GROUP BY ts
+    return self._iter_entries_async(*self._raw_query(sensor_id, start, end), self.config.timeformat, points, page, fill)
+
+  @timed(db_query_duration)
+  async def recent_async(self, hours: int, sensor_id: int | None = None, points: int | None = None, fill: str | None = None) -> list[SensorEntry]:
+    return [SensorEntry.from_row(row) async for row in self.iter_recent_async(hours, sensor_id, points, fill)]
+
+  def iter_recent_async(self, hours: int, sensor_id: int | None = None, points: int | None = None, fill: str | None = None) -> AsyncIterator[dict]:
+    start = int(time.time()) - hours * 3600
+    fmt = f'{self.config.dateformat} {self.config.timeformat}'
+
+    recent = self._recent_rows(sensor_id, start)
+    if recent is not None:
+      return self._iter_recent_async(recent, fmt, points, fill=fill)
+
+    return self._iter_entries_async(*self._raw_query(sensor_id, start), fmt, points, fill=fill)
+
+  @timed(db_query_duration)
+  async def recent_readings_async(self, sensor_id: int, since: int) -> np.ndarray:
+    # fills a sensor's ring buffer, raw fixed point values straight into an int64 array.
+    chunks: list[np.ndarray] = []
+
+    async with self._reader() as ctx, ctx.execute("""
+      SELECT ts, temperature, humidity
+      FROM readings
+      WHERE sensor_id = ? AND ts >= ?
       ORDER BY ts;
-    """, [start_date, end_date]) as cursor:
+    """, [sensor_id, since]) as cursor:
+      cursor.row_factory = None
 
-      return [SensorEntry.from_row(row) for row in await cursor.fetchall()]
+      while rows := await cursor.fetchmany(EXPORT_BATCH_SIZE):
+        chunks.append(np.array(rows, dtype=np.int64))
 
-  async def daterange_async(self):
-    async with self.ctx.execute("""
+    return np.concatenate(chunks) if chunks else np.empty((0, 3), dtype=np.int64)
+
+  @timed(db_query_duration)
+  async def by_range_async(self, start: str, end: str, sensor_id: int | None = None, points: int | None = None, page: Page | None = None) -> list[SensorEntry]:
+    return [SensorEntry.from_row(row) async for row in self.iter_by_range_async(start, end, sensor_id, points, page)]
+
+  def iter_by_range_async(self, start: str, end: str, sensor_id: int | None = None, points: int | None = None, page: Page | None = None) -> AsyncIterator[dict]:
+    # checked up front, the downsampled branch below has no page to honour.
+    self._check_entry_options(points, page, None)
+
+    start_ts, end_ts = self.range_bounds(start, end)
+
+    if points is None:
+      start_ts = page.start(start_ts) if page else start_ts
+      return self._iter_entries_async(*self._daily_query(sensor_id, start_ts, end_ts), self.config.dateformat, page=page)
+
+    # use the coarsest table that still has at least `points` rows in the range.
+    if (end_ts - start_ts) // 86400 >= points:
+      query = self._daily_query(sensor_id, start_ts, end_ts)
+    elif (end_ts - start_ts) // 3600 >= points:
+      query = self._hourly_query(sensor_id, start_ts, end_ts)
+    else:
+      query = self._raw_query(sensor_id, start_ts, end_ts)
+
+    return self._iter_entries_async(*query, f'{self.config.dateformat} {self.config.timeformat}', points)
+
+  @timed(db_query_duration)
+  async def series_array_async(self, start: str, end: str, sensor_id: int | None = None, resolution: str = 'raw') -> np.ndarray:
+    start_ts, end_ts = self.range_bounds(start, end)
+
+    queries = {
+      'raw': self._raw_query,
+      'hourly': self._hourly_query,
+      'daily': self._daily_query
+    }
+
+    if resolution not in queries:
+      raise Exception(f'Unsupported resolution "{resolution}", use {", ".join(queries)}.')
+
+    chunks: list[np.ndarray] = []
+
+    async with self._reader() as ctx, ctx.execute(*queries[resolution](sensor_id, start_ts, end_ts)) as cursor:
+      # plain tuples straight into float64 arrays, one conversion per batch.
+      cursor.row_factory = None
+
+      while rows := await cursor.fetchmany(EXPORT_BATCH_SIZE):
+        chunks.append(np.array(rows, dtype=np.float64))
+
+    if not chunks:
+      return np.empty((0, 3))
+
+    return np.concatenate(chunks)
+
+  @timed(db_query_duration)
+  async def batch_query_async(self, queries: list[SeriesQuery]) -> list[SeriesResult]:
+    if len(queries) > MAX_BATCH_QUERIES:
+      raise Exception(f'At most {MAX_BATCH_QUERIES} queries can be batched!')
+
+    bounds = [self.range_bounds(query.start, query.end) for query in queries]
+    granularities = list(dict.fromkeys(query.granularity for query in queries))
+    selects: list[str] = []
+    params: list[int] = []
+
+    # one statement for the whole batch, every granularity is scanned once over the union
+    # of its periods and all of them read the same snapshot.
+    for kind, granularity in enumerate(granularities):
+      wanted = [(query, bound) for query, bound in zip(queries, bounds) if query.granularity == granularity]
+      sensor_ids = None if any(query.sensor_id is None for query, _ in wanted) else sorted({query.sensor_id for query, _ in wanted})
+
+      sql, scan_params = self._batch_scan_query(kind, granularity, merge_ranges([bound for _, bound in wanted]), sensor_ids)
+      selects.append(sql)
+      params += scan_params
+
+    chunks: list[np.ndarray] = []
+
+    if selects:
+      async with self._reader() as ctx, ctx.execute('\nUNION ALL\n'.join(selects) + ';', params) as cursor:
+        cursor.row_factory = None
+
+        while rows := await cursor.fetchmany(EXPORT_BATCH_SIZE):
+          chunks.append(np.array(rows, dtype=np.int64))
+
+    scanned = np.concatenate(chunks) if chunks else np.empty((0, 6), dtype=np.int64)
+    scans: dict[str, np.ndarray] = {}
+
+    for kind, granularity in enumerate(granularities):
+      rows = scanned[scanned[:, 0] == kind, 1:]
+      scans[granularity] = rows[np.argsort(rows[:, 1], kind='stable')]
+
+    results: list[SeriesResult] = []
+
+    for query, (start, end) in zip(queries, bounds):
+      fmt = self.config.dateformat if query.granularity == 'daily' else f'{self.config.dateformat} {self.config.timeformat}'
+      rows = group_series(scans[query.granularity], start, end, query.sensor_id, SCALE)
+
+      if query.points is not None:
+        rows = lttb(rows, query.points)
+
+      results.append(SeriesResult(
+        id=query.id,
+        granularity=query.granularity,
+        entries=[SensorEntry(ts=fmt_ts(ts, fmt), temperature=temperature, humidity=humidity) for ts, temperature, humidity in rows]
+      ))
+
+    return results
+
+  def _batch_scan_query(self, kind: int, granularity: str, ranges: list[tuple[int, int]], sensor_ids: list[int] | None) -> tuple[str, list[int]]:
+    def _select(table: str, bucket: str, sums: str, ranges: list[tuple[int, int]]) -> tuple[str, list[int]]:
+      where, params = range_clause(bucket, ranges)
+
+      if sensor_ids is not None:
+        where += f' AND sensor_id IN ({", ".join("?" for _ in sensor_ids)})'
+        params += sensor_ids
+
+      return f"""
+        SELECT {kind}, sensor_id, {bucket}, {sums}
+        FROM {table}
+        WHERE {where}
+      """, params
+
+    if granularity == 'daily':
+      return _select('readings_daily', 'day_ts', 'temperature_sum, humidity_sum, count', ranges)
+
+    # periods are split between the tiers the same way _tiered_query splits a single range.
+    tiers = self._tiers('readings_hourly' if granularity == 'hourly' else 'readings')
+    clipped: dict[tuple[str, str], list[tuple[int, int]]] = {}
+
+    for start, end in ranges:
+      for table, bucket, segment_start, segment_end in self._segments(tiers, start, end) or [(tiers[-1][0], tiers[-1][1], start, end)]:
+        clipped.setdefault((table, bucket), []).append((segment_start, end if segment_end is None else segment_end))
+
+    selects = [
+      _select(table, bucket, 'temperature, humidity, 1' if table == 'readings' else 'temperature_sum, humidity_sum, count', table_ranges)
+      for (table, bucket), table_ranges in clipped.items()
+    ]
+
+    return '\nUNION ALL\n'.join(sql for sql, _ in selects), [value for _, params in selects for value in params]
+
+  @timed(db_query_duration)
+  async def daterange_async(self, sensor_id: int | None = None):
+    # the daily tier is kept forever, so it covers compacted history as well.
+    where, params = self._where(sensor_id)
+
+    async with self._reader() as ctx, ctx.execute(f"""
       SELECT
-        MIN(timestamp_date) as min,
-        MAX(timestamp_date) as max
-      FROM sensor_data;
-    """) as cursor:
+        MIN(day_ts) as min,
+        MAX(day_ts) as max
+      FROM readings_daily
+      {where};
+    """, params) as cursor:
 
       row = await cursor.fetchone()
       if row is None:
         return StatusResponse(success=False, message='Could not fetch dates')
 
       return {
-        'dates': DateRange(first=row["min"], last=row["max"]),
+        'dates': DateRange(
+          first=fmt_ts(row["min"], self.config.dateformat),
+          last=fmt_ts(row["max"], self.config.dateformat)
+        ),
         'weeks': self._fmt_range(row["min"], row["max"], self.config.weekformat),
         'months': self._fmt_range(row["min"], row["max"], self.config.monthformat)
       }
 
-  async def insert_sensor_entry_async(self, temp: float, humi: float, date: str, time: str):
-    await self.ctx.execute_insert("""
-      INSERT INTO sensor_data(temperature, humidity, timestamp_date, timestamp_time)
+  def month_bounds(self, year: int, month: int) -> tuple[int, int]:
+    (_, days) = calendar.monthrange(year, month)
+    return date_start(date(year, month, 1)), date_end(date(year, month, days))
+
+  def week_bounds(self, week: str) -> tuple[int, int]:
+    first = datetime.strptime(f'{week}-1', self.config.iso_week_format).date()
+    return date_start(first), date_end(first + timedelta(days=6))
+
+  def date_bounds(self, day: int, month: int, year: int) -> tuple[int, int]:
+    day_date = date(year, month, day)
+    return date_start(day_date), date_end(day_date)
+
+  def range_bounds(self, start: str, end: str) -> tuple[int, int]:
+    return (
+      date_start(datetime.strptime(start, self.config.dateformat).date()),
+      date_end(datetime.strptime(end, self.config.dateformat).date())
+    )
+
+  def is_closed(self, end: int) -> bool:
+    # a period is closed once no buffered or late reading can still land in it.
+    return end + max(CLOSED_PERIOD_GRACE, self.config.write_buffer_max_age) <= time.time()
+
+  def version_of(self, end: int | None) -> int:
+    return self.history_version if end is not None and self.is_closed(end) else self.data_version
+
+  def _bump_versions(self, oldest: int | None = None):
+    self.data_version += 1
+
+    if oldest is None or self.is_closed(oldest):
+      self.history_version += 1
+      self._history_changed = True
+
+  def _raw_query(self, sensor_id: int | None, start: int | None = None, end: int | None = None) -> tuple[str, list[int]]:
+    return self._tiered_query(sensor_id, start, end, self._tiers('readings'))
+
+  def _hourly_query(self, sensor_id: int | None, start: int | None = None, end: int | None = None) -> tuple[str, list[int]]:
+    return self._tiered_query(sensor_id, start, end, self._tiers('readings_hourly'))
+
+  def _tiers(self, table: str) -> list[tuple[str, str, int, int | None]]:
+    # (table, bucket, from, until) from coarsest to finest. a range falls back to the next
+    # coarser tier that still covers it, days are kept forever.
+    if table == 'readings_hourly':
+      return [
+        ('readings_daily', 'day_ts', 0, self.pruned_until),
+        ('readings_hourly', 'hour_ts', self.pruned_until, None)
+      ]
+
+    # raw rows are only compacted up to compacted_until, pruning can't take anything before that.
+    pruned_until = min(self.pruned_until, self.compacted_until)
+
+    return [
+      ('readings_daily', 'day_ts', 0, pruned_until),
+      ('readings_5min', 'bucket_ts', pruned_until, self.compacted_until),
+      ('readings', 'ts', self.compacted_until, None)
+    ]
+
+  def _segments(self, tiers: list[tuple[str, str, int, int | None]], start: int | None, end: int | None) -> list[tuple[str, str, int, int | None]]:
+    segments = []
+
+    for table, bucket, tier_start, tier_end in tiers:
+      if tier_end is not None and (tier_end <= tier_start or (start is not None and start >= tier_end)):
+        continue
+
+      if end is not None and end <= tier_start:
+        continue
+
+      segment_start = tier_start if start is None else max(start, tier_start)
+      segment_end = tier_end if end is None else (end if tier_end is None else min(end, tier_end))
+      segments.append((table, bucket, segment_start, segment_end))
+
+    return segments
+
+  def _tiered_query(self, sensor_id: int | None, start: int | None, end: int | None, tiers: list[tuple[str, str, int, int | None]]) -> tuple[str, list[int]]:
+    # the tiers cover every epoch, only an empty range has no segment, the finest tier answers it.
+    segments = self._segments(tiers, start, end) or [(tiers[-1][0], tiers[-1][1], start, end)]
+
+    selects: list[str] = []
+    params: list[int] = []
+
+    for table, bucket, segment_start, segment_end in segments:
+      where, where_params = self._where(sensor_id, bucket, segment_start or None, segment_end)
+
+      if table != 'readings':
+        selects.append(f"""
+          SELECT
+            {bucket} AS ts,
+            SUM(temperature_sum) / (SUM(count) * {SCALE}) AS temperature,
+            SUM(humidity_sum) / (SUM(count) * {SCALE}) AS humidity
+          FROM {table}
+          {where}
+          GROUP BY {bucket}
+        """)
+      elif sensor_id is not None:
+        # (sensor_id, ts) is the primary key, only an all-sensor query has rows to average.
+        selects.append(f"""
+          SELECT
+            ts,
+            temperature / {SCALE} AS temperature,
+            humidity / {SCALE} AS humidity
+          FROM readings
+          {where}
+        """)
+      else:
+        selects.append(f"""
+          SELECT
+            ts,
+            AVG(temperature) / {SCALE} AS temperature,
+            AVG(humidity) / {SCALE} AS humidity
+          FROM readings
+          {where}
+          GROUP BY ts
+        """)
+
+      params += where_params
+
+    return '      UNION ALL\n'.join(selects) + '      ORDER BY ts;', params
+
+  def _daily_query(self, sensor_id: int | None, start: int | None = None, end: int | None = None) -> tuple[str, list[int]]:
+    return self._rollup_query('readings_daily', 'day_ts', sensor_id, start, end)
+
+  def _rollup_query(self, table: str, bucket: str, sensor_id: int | None, start: int | None, end: int | None) -> tuple[str, list[int]]:
+    where, params = self._where(sensor_id, bucket, start, end)
+
+    return f"""
+      SELECT
+        {bucket} AS ts,
+        SUM(temperature_sum) / (SUM(count) * {SCALE}) AS temperature,
+        SUM(humidity_sum) / (SUM(count) * {SCALE}) AS humidity
+      FROM {table}
+      {where}
+      GROUP BY {bucket}
+      ORDER BY {bucket};
+    """, params
+
+  def _check_entry_options(self, points: int | None, page: Page | None, fill: str | None):
+    if fill is not None and fill not in FILL_MODES:
+      raise Exception(f'Invalid fill "{fill}", use {", ".join(FILL_MODES)}.')
+
+    if page is not None:
+      if points is not None:
+        raise Exception('points and limit can not be used together!')
+
+      if fill is not None:
+        raise Exception('fill and limit can not be used together!')
+
+  def _recent_rows(self, sensor_id: int | None, start: int, end: int | None = None) -> list[tuple[int, float, float]] | None:
+    # the ring buffers hold raw rows only, anything reaching into compacted history goes to sqlite.
+    if start < self.compacted_until:
+      return None
+
+    return self.recent.rows(sensor_id, start, end)
+
+  async def _iter_recent_async(self, rows: list[tuple[int, float, float]], fmt: str, points: int | None = None, page: Page | None = None, fill: str | None = None) -> AsyncIterator[dict]:
+    self._check_entry_options(points, page, fill)
+
+    if page is not None:
+      rows = rows[:page.limit]
+
+      if rows and len(rows) >= page.limit:
+        page.next = encode_cursor(rows[-1][0])
+
+    for entry in self._entries(rows, fmt, points, fill):
+      yield entry
+
+  async def _iter_entries_async(self, sql: str, params: list[int], fmt: str, points: int | None = None, page: Page | None = None, fill: str | None = None) -> AsyncIterator[dict]:
+    self._check_entry_options(points, page, fill)
+
+    if page is not None:
+      sql, params = page.limit_query(sql, params)
+
+    # timestamps are stored as epoch seconds and only formatted here, at response time.
+    async with self._reader() as ctx, ctx.execute(sql, params) as cursor:
+      if points is None and fill is None:
+        count = 0
+        ts = None
+
+        async for ts, temperature, humidity in cursor:
+          count += 1
+          yield {'ts': fmt_ts(ts, fmt), 'temperature': temperature, 'humidity': humidity}
+
+        if page is not None and ts is not None and count >= page.limit:
+          page.next = encode_cursor(ts)
+        return
+
+      rows = [(ts, temperature, humidity) for ts, temperature, humidity in await cursor.fetchall()]
+
+    for entry in self._entries(rows, fmt, points, fill):
+      yield entry
+
+  def _entries(self, rows: list, fmt: str, points: int | None, fill: str | None) -> Iterator[dict]:
+    if fill is not None:
+      rows = reconstruct(rows, self.config.sensor_interval, fill)
+
+    if points is not None:
+      rows = lttb(rows, points)
+
+    for ts, temperature, humidity in rows:
+      yield {'ts': fmt_ts(ts, fmt), 'temperature': temperature, 'humidity': humidity}
+
+  def _where(self, sensor_id: int | None, column: str = 'ts', start: int | None = None, end: int | None = None) -> tuple[str, list[int]]:
+    clauses: list[str] = []
+    params: list[int] = []
+
+    if sensor_id is not None:
+      clauses.append('sensor_id = ?')
+      params.append(sensor_id)
+
+    if start is not None:
+      clauses.append(f'{column} >= ?')
+      params.append(start)
+
+    if end is not None:
+      clauses.append(f'{column} < ?')
+      params.append(end)
+
+    if not clauses:
+      return '', params
+
+    return 'WHERE ' + ' AND '.join(clauses), params
+
+  @timed(db_query_duration)
+  async def sensors_async(self) -> list[SensorConfig]:
+    async with self._reader() as ctx, ctx.execute('SELECT * FROM sensors ORDER BY id;') as cursor:
+      return [SensorConfig.from_row(row) for row in await cursor.fetchall()]
+
+  @timed(db_query_duration)
+  async def insert_sensor_async(self, sensor: SensorConfig) -> SensorConfig:
+    async with self._write_lock:
+      sensor_id = await self.ctx.execute_insert("""
+        INSERT INTO sensors (name, type, pin, interval, enabled, read_timeout)
+        VALUES (?, ?, ?, ?, ?, ?);
+      """, [sensor.name, sensor.type, sensor.pin, sensor.interval, sensor.enabled, sensor.read_timeout])
+      await self._bump_config_version_async()
+      await self.ctx.commit()
+
+    if sensor_id is None:
+      raise Exception("Failed to add sensor!")
+
+    return sensor.model_copy(update={'id': sensor_id[0]})
+
+  @timed(db_query_duration)
+  async def update_sensor_async(self, sensor_id: int, sensor: SensorConfig) -> bool:
+    async with self._write_lock:
+      async with self.ctx.execute("""
+        UPDATE sensors
+        SET name = ?, type = ?, pin = ?, interval = ?, enabled = ?, read_timeout = ?
+        WHERE id = ?;
+      """, [sensor.name, sensor.type, sensor.pin, sensor.interval, sensor.enabled, sensor.read_timeout, sensor_id]) as cursor:
+        await self._bump_config_version_async()
+        await self.ctx.commit()
+        return cursor.rowcount > 0
+
+  @timed(db_query_duration)
+  async def delete_sensor_async(self, sensor_id: int) -> bool:
+    async with self._write_lock:
+      async with self.ctx.execute('DELETE FROM sensors WHERE id = ?;', [sensor_id]) as cursor:
+        await self._bump_config_version_async()
+        await self.ctx.commit()
+        return cursor.rowcount > 0
+
+  async def insert_sensor_entry_async(self, sensor_id: int, temp: float, humi: float, ts: int, store: int = STORE_ALL):
+    self._pending_readings.append((sensor_id, ts, to_fixed(temp), to_fixed(humi), store))
+
+    if len(self._pending_readings) >= self.config.write_buffer_size:
+      # a cancelled poll task must not abandon a half-written batch.
+      await asyncio.shield(self.flush_async())
+    else:
+      self._schedule_flush()
+
+  @timed(db_query_duration)
+  async def flush_async(self):
+    async with self._write_lock:
+      self._cancel_scheduled_flush()
+
+      readings, self._pending_readings = self._pending_readings, []
+      logs, self._pending_logs = self._pending_logs, []
+
+      if not readings and not logs:
+        return
+
+      try:
+        if readings:
+          await self._write_readings_async(readings)
+
+        if logs:
+          await self._write_logs_async(logs)
+
+        await self.ctx.commit()
+      except Exception:
+        await self.ctx.rollback()
+
+        # a busy database is usually transient, the batch goes back in front of anything
+        # buffered meanwhile and is retried with the next flush.
+        self._pending_readings = readings + self._pending_readings
+        self._pending_logs = logs + self._pending_logs
+        self._schedule_flush()
+        raise
+      finally:
+        if readings:
+          self._bump_versions(min(reading[1] for reading in readings))
+
+      self.recent.observe((reading[0], reading[1]) for reading in readings if reading[4] & STORE_RAW)
+
+  async def _write_readings_async(self, pending: list[tuple[int, int, int, int, int]]):
+    # (sensor_id, ts) is the primary key, keep only the first reading per second.
+    unique: dict[tuple[int, int], list[int]] = {}
+    for sensor_id, ts, temp, humi, store in pending:
+      unique.setdefault((sensor_id, ts), [sensor_id, ts, temp, humi, 0])[4] |= store
+
+    # a reading that is already stored was counted when it was written, it must not reach the
+    # rollups and statistics a second time.
+    for key in await self._stored_keys_async(list(unique)):
+      del unique[key]
+
+    await self.ctx.executemany("""
+      INSERT OR IGNORE INTO readings (sensor_id, ts, temperature, humidity)
       VALUES (?, ?, ?, ?);
-    """, [temp, humi, date, time])
+    """, [reading[:4] for reading in unique.values() if reading[4] & STORE_RAW])
+
+    readings = [tuple(reading[:4]) for reading in unique.values() if reading[4] & STORE_ROLLUP]
+
+    # rollups of a day with compressed away readings can't be recounted from the raw rows.
+    dropped = [reading[1] for reading in unique.values() if not reading[4] & STORE_RAW]
+    if dropped:
+      await self.ctx.execute("""
+        INSERT INTO meta (key, value) VALUES ('compressed_until', ?)
+        ON CONFLICT (key) DO UPDATE SET value = MAX(value, excluded.value);
+      """, [date_end(date.fromtimestamp(max(dropped)))])
+
+    await self.ctx.executemany(_rollup_upsert('readings_hourly', 'hour_ts'), [
+      [sensor_id, hour_start(ts), temp, temp, temp, humi, humi, humi]
+      for sensor_id, ts, temp, humi in readings
+    ])
+
+    await self.ctx.executemany(_rollup_upsert('readings_daily', 'day_ts'), [
+      [sensor_id, day_start(ts), temp, temp, temp, humi, humi, humi]
+      for sensor_id, ts, temp, humi in readings
+    ])
+
+    await self.ctx.executemany("""
+      INSERT INTO readings_statistics (
+        sensor_id, total_entries, temperature_sum, humidity_sum,
+        min_temperature, min_temperature_ts,
+        max_temperature, max_temperature_ts,
+        min_humidity, min_humidity_ts,
+        max_humidity, max_humidity_ts
+      ) VALUES (:sensor_id, 1, :temp, :humi, :temp, :ts, :temp, :ts, :humi, :ts, :humi, :ts)
+      ON CONFLICT (sensor_id) DO UPDATE SET
+        total_entries = total_entries + 1,
+        temperature_sum = temperature_sum + :temp,
+        humidity_sum = humidity_sum + :humi,
+        min_temperature_ts = CASE
+          WHEN :temp < min_temperature OR (:temp = min_temperature AND :ts < min_temperature_ts)
+          THEN :ts ELSE min_temperature_ts END,
+        min_temperature = MIN(min_temperature, :temp),
+        max_temperature_ts = CASE
+          WHEN :temp > max_temperature OR (:temp = max_temperature AND :ts < max_temperature_ts)
+          THEN :ts ELSE max_temperature_ts END,
+        max_temperature = MAX(max_temperature, :temp),
+        min_humidity_ts = CASE
+          WHEN :humi < min_humidity OR (:humi = min_humidity AND :ts < min_humidity_ts)
+          THEN :ts ELSE min_humidity_ts END,
+        min_humidity = MIN(min_humidity, :humi),
+        max_humidity_ts = CASE
+          WHEN :humi > max_humidity OR (:humi = max_humidity AND :ts < max_humidity_ts)
+          THEN :ts ELSE max_humidity_ts END,
+        max_humidity = MAX(max_humidity, :humi);
+    """, [
+      {'sensor_id': sensor_id, 'ts': ts, 'temp': temp, 'humi': humi}
+      for sensor_id, ts, temp, humi in readings
+    ])
+
+  async def _stored_keys_async(self, keys: list[tuple[int, int]]) -> list[tuple[int, int]]:
+    stored = []
+
+    # two parameters per key, well below sqlite's variable limit.
+    for i in range(0, len(keys), STORED_KEYS_CHUNK):
+      chunk = keys[i:i + STORED_KEYS_CHUNK]
+      values = ', '.join(['(?, ?)'] * len(chunk))
+
+      async with self.ctx.execute(
+        f'SELECT sensor_id, ts FROM readings WHERE (sensor_id, ts) IN (VALUES {values});',
+        [value for key in chunk for value in key]
+      ) as cursor:
+        stored.extend((row[0], row[1]) for row in await cursor.fetchall())
+
+    return stored
+
+  @timed(db_query_duration)
+  async def bulk_insert_async(self, rows: list[list[int]]) -> tuple[int, int]:
+    inserted = 0
+
+    # buffered poll readings go first, so they are never counted as bulk duplicates.
+    await self.flush_async()
+
+    for i in range(0, len(rows), BULK_CHUNK_SIZE):
+      chunk = rows[i:i + BULK_CHUNK_SIZE]
+
+      async with self._write_lock:
+        inserted += await self._bulk_chunk_async(chunk)
+
+      self._bump_versions(min(row[1] for row in chunk))
+      self.recent.observe(((row[0], row[1]) for row in chunk), external=True)
+      await asyncio.sleep(0)
+
+    return inserted, len(rows) - inserted
+
+  async def _bulk_chunk_async(self, chunk: list[list[int]]) -> int:
+    await self.ctx.create_function('thum_hour_start', 1, hour_start, deterministic=True)
+    await self.ctx.create_function('thum_day_start', 1, day_start, deterministic=True)
+
+    try:
+      await self.ctx.execute("""
+        CREATE TEMP TABLE IF NOT EXISTS bulk_staging (
+          sensor_id INTEGER NOT NULL,
+          ts INTEGER NOT NULL,
+          temperature INTEGER NOT NULL,
+          humidity INTEGER NOT NULL,
+          PRIMARY KEY (sensor_id, ts)
+        ) WITHOUT ROWID;
+      """)
+      await self.ctx.execute('DELETE FROM bulk_staging;')
+
+      # the staging key drops duplicates inside the chunk, the join below drops stored ones.
+      await self.ctx.executemany('INSERT OR IGNORE INTO bulk_staging VALUES (?, ?, ?, ?);', chunk)
+      await self.ctx.execute("""
+        DELETE FROM bulk_staging
+        WHERE EXISTS (
+          SELECT 1 FROM readings r
+          WHERE r.sensor_id = bulk_staging.sensor_id AND r.ts = bulk_staging.ts
+        );
+      """)
+
+      # compacted raw rows are gone, so a stored reading below the watermark can't be told apart from a new one.
+      # ingest rejects those rows, this only catches a watermark that moved since they were validated.
+      await self.ctx.execute('DELETE FROM bulk_staging WHERE ts < ?;', [self.compacted_until])
+
+      await self.ctx.execute(_bulk_rollup('readings_hourly', 'hour_ts', 'thum_hour_start(ts)'))
+      await self.ctx.execute(_bulk_rollup('readings_daily', 'day_ts', 'thum_day_start(ts)'))
+
+      await self.ctx.execute("""
+        INSERT INTO readings_statistics (
+          sensor_id, total_entries, temperature_sum, humidity_sum,
+          min_temperature, min_temperature_ts,
+          max_temperature, max_temperature_ts,
+          min_humidity, min_humidity_ts,
+          max_humidity, max_humidity_ts
+        )
+        SELECT
+          s.sensor_id, COUNT(*), SUM(s.temperature), SUM(s.humidity),
+          MIN(s.temperature),
+          (SELECT MIN(ts) FROM bulk_staging WHERE sensor_id = s.sensor_id AND temperature = MIN(s.temperature)),
+          MAX(s.temperature),
+          (SELECT MIN(ts) FROM bulk_staging WHERE sensor_id = s.sensor_id AND temperature = MAX(s.temperature)),
+          MIN(s.humidity),
+          (SELECT MIN(ts) FROM bulk_staging WHERE sensor_id = s.sensor_id AND humidity = MIN(s.humidity)),
+          MAX(s.humidity),
+          (SELECT MIN(ts) FROM bulk_staging WHERE sensor_id = s.sensor_id AND humidity = MAX(s.humidity))
+        FROM bulk_staging s
+        WHERE true
+        GROUP BY s.sensor_id
+        ON CONFLICT (sensor_id) DO UPDATE SET
+          total_entries = total_entries + excluded.total_entries,
+          temperature_sum = temperature_sum + excluded.temperature_sum,
+          humidity_sum = humidity_sum + excluded.humidity_sum,
+          min_temperature_ts = CASE
+            WHEN excluded.min_temperature < min_temperature
+              OR (excluded.min_temperature = min_temperature AND excluded.min_temperature_ts < min_temperature_ts)
+            THEN excluded.min_temperature_ts ELSE min_temperature_ts END,
+          min_temperature = MIN(min_temperature, excluded.min_temperature),
+          max_temperature_ts = CASE
+            WHEN excluded.max_temperature > max_temperature
+              OR (excluded.max_temperature = max_temperature AND excluded.max_temperature_ts < max_temperature_ts)
+            THEN excluded.max_temperature_ts ELSE max_temperature_ts END,
+          max_temperature = MAX(max_temperature, excluded.max_temperature),
+          min_humidity_ts = CASE
+            WHEN excluded.min_humidity < min_humidity
+              OR (excluded.min_humidity = min_humidity AND excluded.min_humidity_ts < min_humidity_ts)
+            THEN excluded.min_humidity_ts ELSE min_humidity_ts END,
+          min_humidity = MIN(min_humidity, excluded.min_humidity),
+          max_humidity_ts = CASE
+            WHEN excluded.max_humidity > max_humidity
+              OR (excluded.max_humidity = max_humidity AND excluded.max_humidity_ts < max_humidity_ts)
+            THEN excluded.max_humidity_ts ELSE max_humidity_ts END,
+          max_humidity = MAX(max_humidity, excluded.max_humidity);
+      """)
+
+      async with self.ctx.execute('INSERT INTO readings SELECT * FROM bulk_staging;') as cursor:
+        inserted = cursor.rowcount
+
+      await self.ctx.commit()
+      return inserted
+    except Exception:
+      await self.ctx.rollback()
+      raise
+
+  def _schedule_flush(self):
+    if self._flush_task is None or self._flush_task.done():
+      self._flush_task = asyncio.create_task(self._flush_later_async())
+
+  def _cancel_scheduled_flush(self):
+    if self._flush_task is not None and self._flush_task is not asyncio.current_task():
+      self._flush_task.cancel()
+
+    self._flush_task = None
+
+  async def _flush_later_async(self):
+    await asyncio.sleep(self.config.write_buffer_max_age)
+
+    try:
+      await self.flush_async()
+    except Exception as e:
+      print(f'database(flush): {e}')
+
+  @timed(db_query_duration)
+  async def migrate_async(self):
+    if await self._columns_async('logs_legacy'):
+      async with self._write_lock:
+        await self._migrate_logs_async()
+
+    columns = await self._columns_async('sensor_data')
+    if 'timestamp_date' not in columns:
+      return
+
+    # one-shot conversion of the text based sensor_data table into readings.
+    sensor_id = 'sensor_id' if 'sensor_id' in columns else '1'
+
+    async with self._write_lock:
+      await self.ctx.create_function('thum_legacy_epoch', 2, self._legacy_epoch, deterministic=True)
+
+      async with self.ctx.execute(f"""
+        INSERT OR IGNORE INTO readings (sensor_id, ts, temperature, humidity)
+        SELECT sensor_id, ts, temperature, humidity FROM (
+          SELECT
+            {sensor_id} AS sensor_id,
+            thum_legacy_epoch(timestamp_date, timestamp_time) AS ts,
+            CAST(ROUND(temperature * {FIXED_POINT}) AS INTEGER) AS temperature,
+            CAST(ROUND(humidity * {FIXED_POINT}) AS INTEGER) AS humidity
+          FROM sensor_data
+        )
+        WHERE ts IS NOT NULL;
+      """) as cursor:
+        migrated = cursor.rowcount
+
+      async with self.ctx.execute('SELECT COUNT(*) FROM sensor_data;') as cursor:
+        row = await cursor.fetchone()
+        total = row[0] if row else 0
+
+      for table in ('sensor_data', 'sensor_rollup_hourly', 'sensor_rollup_daily', 'sensor_statistics'):
+        await self.ctx.execute(f'DROP TABLE IF EXISTS {table};')
+
+      await self.ctx.commit()
+      await self.ctx.execute('VACUUM;')
+
+    self._bump_versions()
+    print(f'database(migrate): migrated {migrated}/{total} rows from sensor_data.')
+
+    if migrated < total:
+      await self.insert_log_entry_async(
+        f'migration skipped {total - migrated} sensor_data rows with unparseable or duplicate timestamps',
+        'warning'
+      )
+
+  def _legacy_log_epoch(self, timestamp: str) -> int | None:
+    date, _, time = str(timestamp).partition(' ')
+    return self._legacy_epoch(date, time)
+
+  def _legacy_epoch(self, date: str, time: str) -> int | None:
+    default = AppConfig.default()
+
+    for dateformat, timeformat in ((self.config.dateformat, self.config.timeformat), (default.dateformat, default.timeformat)):
+      try:
+        return int(datetime.strptime(f'{date} {time}', f'{dateformat} {timeformat}').timestamp())
+      except ValueError:
+        continue
+
+    return None
+
+  @timed(db_query_duration)
+  async def backfill_async(self):
+    async with self.ctx.execute('SELECT 1 FROM readings_daily LIMIT 1;') as cursor:
+      has_rollups = await cursor.fetchone() is not None
+
+    async with self.ctx.execute('SELECT 1 FROM readings LIMIT 1;') as cursor:
+      has_data = await cursor.fetchone() is not None
+
+    if has_data and not has_rollups:
+      await self.rebuild_rollups_async()
+
+    async with self.ctx.execute('SELECT 1 FROM readings_statistics LIMIT 1;') as cursor:
+      has_statistics = await cursor.fetchone() is not None
+
+    if has_data and not has_statistics:
+      await self.rebuild_statistics_async()
+
+    self.recent.latest = await self._latest_by_sensor_async()
+
+  @timed(db_query_duration)
+  async def rebuild_rollups_async(self):
+    await self.flush_async()
+
+    async with self._write_lock:
+      await self._rebuild_rollups_async()
+
+  async def _rebuild_rollups_async(self):
+    await self.ctx.create_function('thum_hour_start', 1, hour_start, deterministic=True)
+    await self.ctx.create_function('thum_day_start', 1, day_start, deterministic=True)
+
+    # rollups below the watermark were built by compaction and have no raw rows left, and days
+    # with compressed readings have more readings in their rollups than in the readings table.
+    since = max(self.compacted_until, await self._meta_async('compressed_until'))
+
+    await self.ctx.execute('DELETE FROM readings_hourly WHERE hour_ts >= ?;', [since])
+    await self.ctx.execute('DELETE FROM readings_daily WHERE day_ts >= ?;', [since])
+
+    await self.ctx.execute("""
+      INSERT INTO readings_hourly (
+        sensor_id, hour_ts, count,
+        temperature_sum, temperature_min, temperature_max,
+        humidity_sum, humidity_min, humidity_max
+      )
+      SELECT
+        sensor_id,
+        thum_hour_start(ts),
+        COUNT(*),
+        SUM(temperature), MIN(temperature), MAX(temperature),
+        SUM(humidity), MIN(humidity), MAX(humidity)
+      FROM readings
+      WHERE ts >= ?
+      GROUP BY sensor_id, thum_hour_start(ts);
+    """, [since])
+
+    await self.ctx.execute("""
+      INSERT INTO readings_daily (
+        sensor_id, day_ts, count,
+        temperature_sum, temperature_min, temperature_max,
+        humidity_sum, humidity_min, humidity_max
+      )
+      SELECT
+        sensor_id,
+        thum_day_start(hour_ts),
+        SUM(count),
+        SUM(temperature_sum), MIN(temperature_min), MAX(temperature_max),
+        SUM(humidity_sum), MIN(humidity_min), MAX(humidity_max)
+      FROM readings_hourly
+      WHERE hour_ts >= ?
+      GROUP BY sensor_id, thum_day_start(hour_ts);
+    """, [since])
+
     await self.ctx.commit()
+    self._bump_versions()
+
+  @timed(db_query_duration)
+  async def compact_async(self) -> int:
+    raw_days = self.config.raw_retention_days
+    aggregate_days = self.config.aggregate_retention_days
+    today = day_start(int(time.time()))
+    removed = 0
+
+    if raw_days > 0:
+      await self.flush_async()
+      cutoff = day_start(today - raw_days * 86400)
+
+      async with self.ctx.execute('SELECT MIN(ts) FROM readings WHERE ts >= ?;', [self.compacted_until]) as cursor:
+        row = await cursor.fetchone()
+        oldest = row[0] if row else None
+
+      day = day_start(oldest) if oldest is not None else cutoff
+
+      # one day per transaction, the watermark moves together with the aggregated rows.
+      while day < cutoff:
+        next_day = day_start(day + 90000)
 
-  async def delete_log_by_ts_async(self, timestamp: str) -> LogDeleteResult:
-    async with self.ctx.execute('DELETE FROM logs WHERE timestamp = ?;', [timestamp]) as cursor:
+        async with self._write_lock:
+          await self._compact_day_async(day, next_day)
+
+        day = next_day
+        await asyncio.sleep(0)
+
+      removed += await self._delete_batched_async('readings', 'ts', self.compacted_until)
+
+    if aggregate_days > 0:
+      cutoff = day_start(today - aggregate_days * 86400)
+
+      # queries switch to the daily tier before the finer buckets go away.
+      if cutoff > self.pruned_until:
+        async with self._write_lock:
+          await self._set_meta_async('pruned_until', cutoff)
+          await self.ctx.commit()
+
+        self.pruned_until = cutoff
+
+      removed += await self._delete_batched_async('readings_5min', 'bucket_ts', cutoff)
+      removed += await self._delete_batched_async('readings_hourly', 'hour_ts', cutoff)
+
+    if removed:
+      async with self._write_lock:
+        await self.ctx.execute(f'PRAGMA incremental_vacuum({INCREMENTAL_VACUUM_PAGES});')
+        await self.ctx.commit()
+
+      self._bump_versions()
+
+    return removed
+
+  async def _compact_day_async(self, start: int, end: int):
+    try:
+      await self.ctx.execute(f"""
+        INSERT INTO readings_5min (
+          sensor_id, bucket_ts, count,
+          temperature_sum, temperature_min, temperature_max,
+          humidity_sum, humidity_min, humidity_max
+        )
+        SELECT
+          sensor_id,
+          ts - ts % {COMPACTED_BUCKET},
+          COUNT(*),
+          SUM(temperature), MIN(temperature), MAX(temperature),
+          SUM(humidity), MIN(humidity), MAX(humidity)
+        FROM readings
+        WHERE ts >= ? AND ts < ?
+        GROUP BY sensor_id, ts - ts % {COMPACTED_BUCKET}
+        ON CONFLICT (sensor_id, bucket_ts) DO UPDATE SET
+          count = count + excluded.count,
+          temperature_sum = temperature_sum + excluded.temperature_sum,
+          temperature_min = MIN(temperature_min, excluded.temperature_min),
+          temperature_max = MAX(temperature_max, excluded.temperature_max),
+          humidity_sum = humidity_sum + excluded.humidity_sum,
+          humidity_min = MIN(humidity_min, excluded.humidity_min),
+          humidity_max = MAX(humidity_max, excluded.humidity_max);
+      """, [start, end])
+
+      await self._set_meta_async('compacted_until', end)
       await self.ctx.commit()
-      return LogDeleteResult(count=cursor.rowcount)
+    except Exception:
+      await self.ctx.rollback()
+      raise
+
+    self.compacted_until = end
+
+  async def _delete_batched_async(self, table: str, column: str, before: int) -> int:
+    removed = 0
+
+    # small batches keep each write transaction short, so the poll loop never waits long.
+    while True:
+      async with self._write_lock:
+        async with self.ctx.execute(f"""
+          DELETE FROM {table}
+          WHERE (sensor_id, {column}) IN (
+            SELECT sensor_id, {column} FROM {table} WHERE {column} < ? LIMIT ?
+          );
+        """, [before, self.config.compaction_batch_size]) as cursor:
+          deleted = cursor.rowcount
+
+        await self.ctx.commit()
+
+      removed += deleted
+
+      if deleted < self.config.compaction_batch_size:
+        return removed
+
+      await asyncio.sleep(0)
+
+  async def _meta_async(self, key: str, default: int = 0) -> int:
+    async with self.ctx.execute('SELECT value FROM meta WHERE key = ?;', [key]) as cursor:
+      row = await cursor.fetchone()
+      return row[0] if row else default
+
+  async def _set_meta_async(self, key: str, value: int):
+    await self.ctx.execute("""
+      INSERT INTO meta (key, value) VALUES (?, ?)
+      ON CONFLICT (key) DO UPDATE SET value = excluded.value;
+    """, [key, value])
+
+  async def _increment_meta_async(self, key: str) -> int:
+    async with self.ctx.execute("""
+      INSERT INTO meta (key, value) VALUES (?, 1)
+      ON CONFLICT (key) DO UPDATE SET value = value + 1
+      RETURNING value;
+    """, [key]) as cursor:
+      row = await cursor.fetchone()
+      return row[0] if row else 0
+
+  async def _bump_config_version_async(self):
+    # runs inside the caller's transaction, other processes reload once it commits.
+    version = await self._increment_meta_async('config_version')
+
+    # a gap means another process bumped it first, leave it for sync_async to notice.
+    if version == self._seen_config_version + 1:
+      self._seen_config_version = version
+
+  @timed(db_query_duration)
+  async def sync_async(self) -> tuple[bool, bool]:
+    if self._history_changed:
+      self._history_changed = False
+
+      async with self._write_lock:
+        version = await self._increment_meta_async('history_version')
+        await self.ctx.commit()
+
+      if version == self._seen_history_version + 1:
+        self._seen_history_version = version
+
+    # data_version only moves when another connection commits, so this process' own
+    # writes never show up here.
+    async with self.ctx.execute('PRAGMA data_version;') as cursor:
+      row = await cursor.fetchone()
+      data_version = row[0] if row else 0
+
+    if data_version == self._seen_data_version:
+      return False, False
 
-  def _fmt_range(self, min: str, max: str | None, fmt: str) -> DateRange:
+    self._seen_data_version = data_version
+    self.data_version += 1
+    self.compacted_until = await self._meta_async('compacted_until')
+    self.pruned_until = await self._meta_async('pruned_until')
+
+    # another process wrote readings this one's ring buffers never saw, they refill on the next poll.
+    self.recent.invalidate()
+    self.recent.latest = await self._latest_by_sensor_async()
+
+    history_version = await self._meta_async('history_version')
+    if history_version != self._seen_history_version:
+      self._seen_history_version = history_version
+      self.history_version += 1
+
+    config_version = await self._meta_async('config_version')
+    config_changed = config_version != self._seen_config_version
+    self._seen_config_version = config_version
+
+    return True, config_changed
+
+  @timed(db_query_duration)
+  async def latest_readings_async(self) -> list[tuple[int, int, float, float]]:
+    async with self._reader() as ctx, ctx.execute(f"""
+      SELECT r.sensor_id, r.ts, r.temperature / {SCALE}, r.humidity / {SCALE}
+      FROM sensors s
+      JOIN readings r ON r.sensor_id = s.id
+        AND r.ts = (SELECT MAX(ts) FROM readings WHERE sensor_id = s.id);
+    """) as cursor:
+      return [tuple(row) for row in await cursor.fetchall()]
+
+  @timed(db_query_duration)
+  async def delete_log_async(self, log_id: int) -> LogDeleteResult:
+    await self.flush_async()
+
+    async with self._write_lock:
+      async with self.ctx.execute('DELETE FROM logs WHERE id = ?;', [log_id]) as cursor:
+        await self.ctx.commit()
+        return LogDeleteResult(count=cursor.rowcount)
+
+  def _fmt_range(self, min: int | None, max: int | None, fmt: str) -> DateRange:
     now_str = datetime.now().strftime(fmt)
 
-    def _fmt_internal(val: str | None) -> str:
+    def _fmt_internal(val: int | None) -> str:
       if val is None:
         return now_str
-      return datetime.strptime(val, self.config.dateformat).strftime(fmt)
+      return datetime.fromtimestamp(val).strftime(fmt)
 
     return DateRange(first=_fmt_internal(min), last=_fmt_internal(max))
 
-  async def all_logs_async(self) -> list[LogEntry]:
-    async with self.ctx.execute("""
-      SELECT message as msg, timestamp as ts
+  @timed(db_query_duration)
+  async def logs_async(self, before: int | None = None, limit: int = 100, level: str | None = None) -> list[LogEntry]:
+    clauses: list[str] = []
+    params: list[int | str] = []
+
+    # keyset pagination on the primary key, every page is a short index range scan.
+    if before is not None:
+      clauses.append('id < ?')
+      params.append(before)
+
+    if level is not None:
+      clauses.append('level = ?')
+      params.append(level)
+
+    where = 'WHERE ' + ' AND '.join(clauses) if clauses else ''
+
+    async with self._reader() as ctx, ctx.execute(f"""
+      SELECT id, level, message, first_ts, ts, count
       FROM logs
-      GROUP BY ts
-      ORDER BY ts;
-    """) as cursor:
+      {where}
+      ORDER BY id DESC
+      LIMIT ?;
+    """, params + [limit]) as cursor:
 
-      return [LogEntry.from_row(row) for row in await cursor.fetchall()]
+      fmt = f'{self.config.dateformat} {self.config.timeformat}'
+      return [LogEntry.from_row(row, fmt) for row in await cursor.fetchall()]
 
+  @timed(db_query_duration)
   async def delete_all_logs_async(self) -> LogDeleteResult:
-    async with self.ctx.execute('DELETE FROM logs;') as cursor:
-      await self.ctx.commit()
-      return LogDeleteResult(count=cursor.rowcount)
+    await self.flush_async()
+
+    async with self._write_lock:
+      async with self.ctx.execute('DELETE FROM logs;') as cursor:
+        await self.ctx.commit()
+        return LogDeleteResult(count=cursor.rowcount)
+
+  async def insert_log_entry_async(self, msg: str, level: str = 'error', ts: int | None = None):
+    self._pending_logs.append((level, msg, int(time.time()) if ts is None else ts))
+    self._schedule_flush()
+
+  async def _write_logs_async(self, logs: list[tuple[str, str, int]]):
+    # identical messages are collapsed in the buffer first, then into a recent stored entry.
+    collapsed: dict[tuple[str, str], list[int]] = {}
+
+    for level, message, ts in logs:
+      entry = collapsed.setdefault((level, message), [ts, ts, 0])
+      entry[0] = min(entry[0], ts)
+      entry[1] = max(entry[1], ts)
+      entry[2] += 1
+
+    inserted = False
+
+    for (level, message), (first_ts, ts, count) in collapsed.items():
+      async with self.ctx.execute("""
+        UPDATE logs SET
+          ts = MAX(ts, :ts),
+          count = count + :count
+        WHERE id = (
+          SELECT id FROM logs
+          WHERE message = :message AND level = :level AND ts >= :since
+          ORDER BY id DESC
+          LIMIT 1
+        );
+      """, {
+        'ts': ts,
+        'count': count,
+        'message': message,
+        'level': level,
+        'since': first_ts - self.config.log_dedupe_window
+      }) as cursor:
+        if cursor.rowcount:
+          continue
 
-  async def insert_log_entry_async(self, msg: str, ts: str):
-    await self.ctx.execute_insert('INSERT INTO logs VALUES (?, ?);', [msg, ts])
+      await self.ctx.execute(
+        'INSERT INTO logs (level, message, first_ts, ts, count) VALUES (?, ?, ?, ?, ?);',
+        [level, message, first_ts, ts, count]
+      )
+      inserted = True
+
+    # the table is a ring buffer, only the newest log_max_entries entries are kept.
+    if inserted:
+      await self.ctx.execute("""
+        DELETE FROM logs
+        WHERE id < (SELECT id FROM logs ORDER BY id DESC LIMIT 1 OFFSET ?);
+      """, [max(1, self.config.log_max_entries) - 1])
+
+  async def _migrate_logs_async(self):
+    await self.ctx.create_function('thum_legacy_log_epoch', 1, self._legacy_log_epoch, deterministic=True)
+
+    # rows with an unreadable timestamp are kept, stamped with the migration time.
+    await self.ctx.execute("""
+      INSERT INTO logs (level, message, first_ts, ts, count)
+      SELECT
+        'error',
+        message,
+        MIN(epoch),
+        MAX(epoch),
+        COUNT(*)
+      FROM (
+        SELECT message, COALESCE(thum_legacy_log_epoch(timestamp), CAST(strftime('%s', 'now') AS INTEGER)) AS epoch
+        FROM logs_legacy
+      )
+      GROUP BY message, epoch
+      ORDER BY MIN(epoch);
+    """)
+    await self.ctx.execute('DROP TABLE logs_legacy;')
     await self.ctx.commit()
 
+    print('database(migrate): moved logs into the indexed log table.')
+
+  @timed(db_query_duration)
+  async def snapshot_async(self, target: str, start: str | None = None, end: str | None = None):
+    # buffered readings belong in the dump, flushing first makes them visible to readers.
+    await self.flush_async()
+
+    source = f'{Path(self.dbfile).resolve().as_uri()}?mode=ro'
+
+    if start is None and end is None:
+      # a dedicated WAL reader copies a consistent snapshot without blocking the writer
+      # or holding a pooled connection for the whole copy.
+      async with aiosqlite.connect(source, uri=True) as ctx:
+        await ctx.execute('VACUUM INTO ?;', [target])
+      return
+
+    start_ts = date_start(datetime.strptime(start, self.config.dateformat).date()) if start else None
+    end_ts = date_end(datetime.strptime(end, self.config.dateformat).date()) if end else None
+
+    async with aiosqlite.connect(target, uri=True) as dump:
+      await dump.execute('ATTACH DATABASE ? AS src;', [source])
+
+      # everything below runs in one transaction, so all tables come from the same snapshot.
+      await dump.execute('BEGIN;')
+
+      async with dump.execute(f"""
+        SELECT sql FROM src.sqlite_master
+        WHERE sql IS NOT NULL AND tbl_name IN ({', '.join('?' for _ in DUMP_TABLES)})
+        ORDER BY type DESC;
+      """, [table for table, _ in DUMP_TABLES]) as cursor:
+        for (sql,) in await cursor.fetchall():
+          await dump.execute(sql)
+
+      for table, column in DUMP_TABLES:
+        where, params = self._where(None, column, start_ts, end_ts) if column else ('', [])
+        await dump.execute(f'INSERT INTO main.{table} SELECT * FROM src.{table} {where};', params)
+
+      await dump.commit()
+      await dump.execute('DETACH DATABASE src;')
+
+  async def iter_export_async(self, sensor_id: int | None = None, start: str | None = None, end: str | None = None) -> AsyncGenerator[list[tuple[int, int, int, int]], None]:
+    await self.flush_async()
+
+    start_ts = date_start(datetime.strptime(start, self.config.dateformat).date()) if start else None
+    end_ts = date_end(datetime.strptime(end, self.config.dateformat).date()) if end else None
+    tiers = self._tiers('readings')
+
+    # like snapshot_async, a dedicated connection keeps slow downloads off the read pool.
+    # without a row factory batches come back as plain tuples of fixed-point integers.
+    async with aiosqlite.connect(f'{Path(self.dbfile).resolve().as_uri()}?mode=ro', uri=True) as ctx:
+      await ctx.execute('BEGIN;')
+
+      async with ctx.execute('SELECT DISTINCT sensor_id FROM readings_daily ORDER BY sensor_id;') as cursor:
+        sensors = [row[0] for row in await cursor.fetchall() if sensor_id is None or row[0] == sensor_id]
+
+      for sensor in sensors:
+        queries = []
+
+        # compacted history only exists as 5 minute averages, pruned history as daily ones.
+        for table, bucket, segment_start, segment_end in self._segments(tiers, start_ts, end_ts):
+          where, params = self._where(sensor, bucket, segment_start or None, segment_end)
+
+          # every table is keyed by (sensor_id, bucket), so every query streams in index order.
+          if table == 'readings':
+            queries.append((f"""
+              SELECT sensor_id, ts, temperature, humidity
+              FROM readings
+              {where}
+              ORDER BY ts;
+            """, params))
+          else:
+            queries.append((f"""
+              SELECT
+                sensor_id,
+                {bucket},
+                CAST(ROUND(temperature_sum * 1.0 / count) AS INTEGER),
+                CAST(ROUND(humidity_sum * 1.0 / count) AS INTEGER)
+              FROM {table}
+              {where}
+              ORDER BY {bucket};
+            """, params))
+
+        for sql, params in queries:
+          async with ctx.execute(sql, params) as cursor:
+            while rows := await cursor.fetchmany(EXPORT_BATCH_SIZE):
+              yield rows
+
   async def shutdown_async(self):
+    self._cancel_scheduled_flush()
+
+    if self.readers:
+      await self.readers.close_async()
+
     if self.ctx:
       await self.ctx.close()
 
+  def queue_depths(self) -> dict[tuple[str, ...], float]:
+    return {
+      ('writer',): queue_depth(self.ctx) if hasattr(self, 'ctx') else 0,
+      ('readers',): self.readers.queued_requests() if self.readers else 0,
+      ('read_pool_waiting',): self.readers.waiting if self.readers else 0,
+      ('write_lock_waiting',): len(getattr(self._write_lock, '_waiters', None) or ()),
+      ('write_buffer',): len(self._pending_readings) + len(self._pending_logs)
+    }
+
+  async def _latest_by_sensor_async(self) -> dict[int, int]:
+    # one primary key lookup per sensor instead of grouping the whole readings table.
+    async with self.ctx.execute("""
+      SELECT
+        sensor_id,
+        (SELECT MAX(ts) FROM readings WHERE readings.sensor_id = readings_statistics.sensor_id) AS ts
+      FROM readings_statistics;
+    """) as cursor:
+      return {row["sensor_id"]: row["ts"] for row in await cursor.fetchall() if row["ts"] is not None}
+
+  def _reader(self):
+    if self.readers is None:
+      raise Exception("Database is not configured!")
+
+    return self.readers.acquire()
+
+  async def _configure_connection_async(self, conn: aiosqlite.Connection, cfg: AppConfig | None = None):
+    cfg = cfg or self.config
+
+    synchronous = cfg.db_synchronous.upper()
+    if synchronous not in ('OFF', 'NORMAL', 'FULL', 'EXTRA'):
+      raise Exception(f'Invalid synchronous mode "{cfg.db_synchronous}"!')
+
+    await conn.execute(f'PRAGMA synchronous = {synchronous};')
+    await conn.execute(f'PRAGMA cache_size = {int(cfg.db_cache_size)};')
+    await conn.execute(f'PRAGMA mmap_size = {int(cfg.db_mmap_size)};')
+
+  async def _columns_async(self, table: str) -> list[str]:
+    async with self.ctx.execute(f'PRAGMA table_info({table});') as cursor:
+      return [row["name"] for row in await cursor.fetchall()]
+
+  async def _add_column_async(self, table: str, column: str, definition: str):
+    if column not in await self._columns_async(table):
+      await self.ctx.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition};')
+
   async def init_database_async(self):
-    self.ctx = await aiosqlite.connect(self.dbfile)
+    # with several workers the writer can wait on another process, a compaction day or a
+    # bulk chunk, so it waits longer than sqlite's default five seconds.
+    self.ctx = await aiosqlite.connect(self.dbfile, timeout=WRITE_LOCK_TIMEOUT)
     self.ctx.row_factory = aiosqlite.Row
 
+    # incremental auto vacuum lets compaction hand freed pages back without a full VACUUM.
+    async with self.ctx.execute('PRAGMA auto_vacuum;') as cursor:
+      row = await cursor.fetchone()
+
+    if row and row[0] != 2:
+      await self.ctx.execute('PRAGMA auto_vacuum = INCREMENTAL;')
+      await self.ctx.execute('VACUUM;')
+
+    await self.ctx.execute('PRAGMA journal_mode = WAL;')
+
+    await self.ctx.execute("""
+      CREATE TABLE IF NOT EXISTS meta (
+        key TEXT PRIMARY KEY,
+        value INTEGER NOT NULL
+      );
+    """)
+
+    # the first log table had no key or index, it is rebuilt below.
+    if 'timestamp' in await self._columns_async('logs'):
+      await self.ctx.execute('ALTER TABLE logs RENAME TO logs_legacy;')
+
     await self.ctx.execute("""
       CREATE TABLE IF NOT EXISTS logs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        level TEXT NOT NULL,
         message TEXT NOT NULL,
-        timestamp TEXT NOT NULL
+        first_ts INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        count INTEGER NOT NULL DEFAULT 1
       );
     """)
+    await self.ctx.execute("CREATE INDEX IF NOT EXISTS idx_logs_ts ON logs (ts);")
+    await self.ctx.execute("CREATE INDEX IF NOT EXISTS idx_logs_message ON logs (message, level);")
 
     await self.ctx.execute("""
-      CREATE TABLE IF NOT EXISTS sensor_data (
-        temperature NUMERIC NOT NULL,
-        humidity NUMERIC NOT NULL,
-        timestamp_date date NOT NULL,
-        timestamp_time time NOT NULL
+      CREATE TABLE IF NOT EXISTS sensors (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT NOT NULL,
+        type TEXT NOT NULL,
+        pin TEXT,
+        interval NUMERIC,
+        enabled BOOLEAN NOT NULL DEFAULT 1 CHECK (enabled IN (0, 1)),
+        read_timeout REAL NOT NULL DEFAULT 5.0
+      );
+    """)
+    await self._add_column_async('sensors', 'read_timeout', 'REAL NOT NULL DEFAULT 5.0')
+
+    default_sensor = SensorConfig.default()
+    await self.ctx.execute("""
+      INSERT INTO sensors (id, name, type, pin, interval, enabled)
+      SELECT ?, ?, ?, ?, ?, ?
+      WHERE NOT EXISTS (SELECT 1 FROM sensors);
+    """, [
+      default_sensor.id,
+      default_sensor.name,
+      default_sensor.type,
+      default_sensor.pin,
+      default_sensor.interval,
+      default_sensor.enabled
+    ])
+
+    await self.ctx.execute("""
+      CREATE TABLE IF NOT EXISTS readings (
+        sensor_id INTEGER NOT NULL,
+        ts INTEGER NOT NULL,
+        temperature INTEGER NOT NULL,
+        humidity INTEGER NOT NULL,
+        PRIMARY KEY (sensor_id, ts)
+      ) WITHOUT ROWID;
+    """)
+
+    for table, bucket in (('readings_5min', 'bucket_ts'), ('readings_hourly', 'hour_ts'), ('readings_daily', 'day_ts')):
+      await self.ctx.execute(f"""
+        CREATE TABLE IF NOT EXISTS {table} (
+          sensor_id INTEGER NOT NULL,
+          {bucket} INTEGER NOT NULL,
+          count INTEGER NOT NULL,
+          temperature_sum INTEGER NOT NULL,
+          temperature_min INTEGER NOT NULL,
+          temperature_max INTEGER NOT NULL,
+          humidity_sum INTEGER NOT NULL,
+          humidity_min INTEGER NOT NULL,
+          humidity_max INTEGER NOT NULL,
+          PRIMARY KEY (sensor_id, {bucket})
+        ) WITHOUT ROWID;
+      """)
+
+    await self.ctx.execute("""
+      CREATE TABLE IF NOT EXISTS readings_statistics (
+        sensor_id INTEGER PRIMARY KEY,
+        total_entries INTEGER NOT NULL,
+        temperature_sum INTEGER NOT NULL,
+        humidity_sum INTEGER NOT NULL,
+        min_temperature INTEGER,
+        min_temperature_ts INTEGER,
+        max_temperature INTEGER,
+        max_temperature_ts INTEGER,
+        min_humidity INTEGER,
+        min_humidity_ts INTEGER,
+        max_humidity INTEGER,
+        max_humidity_ts INTEGER
       );
     """)
 
@@ -216,9 +1612,51 @@ class Database:
         weekformat TEXT NOT NULL,
         monthformat TEXT NOT NULL,
         iso_week_format TEXT NOT NULL,
-        use_sensor BOOLEAN NOT NULL CHECK (use_sensor IN (0, 1))
+        use_sensor BOOLEAN NOT NULL CHECK (use_sensor IN (0, 1)),
+        write_buffer_size INTEGER NOT NULL DEFAULT 1,
+        write_buffer_max_age NUMERIC NOT NULL DEFAULT 60,
+        read_pool_size INTEGER NOT NULL DEFAULT 2,
+        db_synchronous TEXT NOT NULL DEFAULT 'NORMAL',
+        db_cache_size INTEGER NOT NULL DEFAULT -16000,
+        db_mmap_size INTEGER NOT NULL DEFAULT 67108864,
+        max_concurrent_reads INTEGER NOT NULL DEFAULT 2,
+        response_cache_size INTEGER NOT NULL DEFAULT 4194304,
+        current_max_age NUMERIC NOT NULL DEFAULT 10,
+        raw_retention_days INTEGER NOT NULL DEFAULT 0,
+        aggregate_retention_days INTEGER NOT NULL DEFAULT 0,
+        compaction_interval INTEGER NOT NULL DEFAULT 3600,
+        compaction_batch_size INTEGER NOT NULL DEFAULT 2000,
+        log_max_entries INTEGER NOT NULL DEFAULT 10000,
+        log_dedupe_window INTEGER NOT NULL DEFAULT 3600,
+        compression TEXT NOT NULL DEFAULT 'off',
+        compression_temperature REAL NOT NULL DEFAULT 0.2,
+        compression_humidity REAL NOT NULL DEFAULT 1.0,
+        compression_max_gap INTEGER NOT NULL DEFAULT 1800,
+        recent_hours INTEGER NOT NULL DEFAULT 24
       );
     """)
+
+    await self._add_column_async('config', 'write_buffer_size', 'INTEGER NOT NULL DEFAULT 1')
+    await self._add_column_async('config', 'write_buffer_max_age', 'NUMERIC NOT NULL DEFAULT 60')
+    await self._add_column_async('config', 'read_pool_size', 'INTEGER NOT NULL DEFAULT 2')
+    await self._add_column_async('config', 'db_synchronous', "TEXT NOT NULL DEFAULT 'NORMAL'")
+    await self._add_column_async('config', 'db_cache_size', 'INTEGER NOT NULL DEFAULT -16000')
+    await self._add_column_async('config', 'db_mmap_size', 'INTEGER NOT NULL DEFAULT 67108864')
+    await self._add_column_async('config', 'max_concurrent_reads', 'INTEGER NOT NULL DEFAULT 2')
+    await self._add_column_async('config', 'response_cache_size', 'INTEGER NOT NULL DEFAULT 4194304')
+    await self._add_column_async('config', 'current_max_age', 'NUMERIC NOT NULL DEFAULT 10')
+    await self._add_column_async('config', 'raw_retention_days', 'INTEGER NOT NULL DEFAULT 0')
+    await self._add_column_async('config', 'aggregate_retention_days', 'INTEGER NOT NULL DEFAULT 0')
+    await self._add_column_async('config', 'compaction_interval', 'INTEGER NOT NULL DEFAULT 3600')
+    await self._add_column_async('config', 'compaction_batch_size', 'INTEGER NOT NULL DEFAULT 2000')
+    await self._add_column_async('config', 'log_max_entries', 'INTEGER NOT NULL DEFAULT 10000')
+    await self._add_column_async('config', 'log_dedupe_window', 'INTEGER NOT NULL DEFAULT 3600')
+    await self._add_column_async('config', 'compression', "TEXT NOT NULL DEFAULT 'off'")
+    await self._add_column_async('config', 'compression_temperature', 'REAL NOT NULL DEFAULT 0.2')
+    await self._add_column_async('config', 'compression_humidity', 'REAL NOT NULL DEFAULT 1.0')
+    await self._add_column_async('config', 'compression_max_gap', 'INTEGER NOT NULL DEFAULT 1800')
+    await self._add_column_async('config', 'recent_hours', 'INTEGER NOT NULL DEFAULT 24')
+
     await self.ctx.execute("""
       INSERT OR IGNORE INTO config (
         id,
@@ -228,8 +1666,28 @@ class Database:
         weekformat,
         monthformat,
         iso_week_format,
-        use_sensor
-      ) VALUES (1, ?, ?, ?, ?, ?, ?, ?);
+        use_sensor,
+        write_buffer_size,
+        write_buffer_max_age,
+        read_pool_size,
+        db_synchronous,
+        db_cache_size,
+        db_mmap_size,
+        max_concurrent_reads,
+        response_cache_size,
+        current_max_age,
+        raw_retention_days,
+        aggregate_retention_days,
+        compaction_interval,
+        compaction_batch_size,
+        log_max_entries,
+        log_dedupe_window,
+        compression,
+        compression_temperature,
+        compression_humidity,
+        compression_max_gap,
+        recent_hours
+      ) VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
     """, [
       self.config.sensor_interval,
       self.config.dateformat,
@@ -237,18 +1695,82 @@ class Database:
       self.config.weekformat,
       self.config.monthformat,
       self.config.iso_week_format,
-      self.config.use_sensor
+      self.config.use_sensor,
+      self.config.write_buffer_size,
+      self.config.write_buffer_max_age,
+      self.config.read_pool_size,
+      self.config.db_synchronous,
+      self.config.db_cache_size,
+      self.config.db_mmap_size,
+      self.config.max_concurrent_reads,
+      self.config.response_cache_size,
+      self.config.current_max_age,
+      self.config.raw_retention_days,
+      self.config.aggregate_retention_days,
+      self.config.compaction_interval,
+      self.config.compaction_batch_size,
+      self.config.log_max_entries,
+      self.config.log_dedupe_window,
+      self.config.compression,
+      self.config.compression_temperature,
+      self.config.compression_humidity,
+      self.config.compression_max_gap,
+      self.config.recent_hours
     ])
 
-    await self.ctx.execute("CREATE INDEX IF NOT EXISTS idx_timestamp_date ON sensor_data (timestamp_date);")
+    await self.ctx.execute("CREATE INDEX IF NOT EXISTS idx_readings_ts ON readings (ts);")
+    await self.ctx.execute("CREATE INDEX IF NOT EXISTS idx_readings_hourly_ts ON readings_hourly (hour_ts);")
+    await self.ctx.execute("CREATE INDEX IF NOT EXISTS idx_readings_daily_ts ON readings_daily (day_ts);")
+    await self.ctx.execute("CREATE INDEX IF NOT EXISTS idx_readings_5min_ts ON readings_5min (bucket_ts);")
     await self.ctx.commit()
 
+    self.compacted_until = await self._meta_async('compacted_until')
+    self.pruned_until = await self._meta_async('pruned_until')
+    self._seen_history_version = await self._meta_async('history_version')
+    self._seen_config_version = await self._meta_async('config_version')
+
+    async with self.ctx.execute('PRAGMA data_version;') as cursor:
+      row = await cursor.fetchone()
+      self._seen_data_version = row[0] if row else 0
+
+  @timed(db_query_duration)
   async def configure_async(self):
+    # the writer is shared with flushes and compaction, sqlite refuses to change the safety
+    # level inside their transactions, so its pragmas are only set while holding the lock.
+    async with self._write_lock:
+      await self._configure_writer_async()
+
+    # reopen the read pool so new pragmas and pool size take effect.
+    readers = ReadPool(self.dbfile, self.config.read_pool_size, self._configure_connection_async)
+    await readers.open_async()
+
+    previous, self.readers = self.readers, readers
+
+    if previous:
+      await previous.close_async()
+
+  async def _configure_writer_async(self):
     await self.ctx.execute("""
       INSERT OR IGNORE INTO config (
         id, sensor_interval, dateformat, timeformat,
-        weekformat, monthformat, iso_week_format, use_sensor
-      ) VALUES (1, ?, ?, ?, ?, ?, ?, ?);
+        weekformat, monthformat, iso_week_format, use_sensor,
+        write_buffer_size, write_buffer_max_age,
+        read_pool_size, db_synchronous, db_cache_size, db_mmap_size,
+        max_concurrent_reads,
+        response_cache_size,
+        current_max_age,
+        raw_retention_days,
+        aggregate_retention_days,
+        compaction_interval,
+        compaction_batch_size,
+        log_max_entries,
+        log_dedupe_window,
+        compression,
+        compression_temperature,
+        compression_humidity,
+        compression_max_gap,
+        recent_hours
+      ) VALUES (1, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?);
     """, [
         self.config.sensor_interval,
         self.config.dateformat,
@@ -256,7 +1778,27 @@ class Database:
         self.config.weekformat,
         self.config.monthformat,
         self.config.iso_week_format,
-        self.config.use_sensor
+        self.config.use_sensor,
+        self.config.write_buffer_size,
+        self.config.write_buffer_max_age,
+        self.config.read_pool_size,
+        self.config.db_synchronous,
+        self.config.db_cache_size,
+        self.config.db_mmap_size,
+        self.config.max_concurrent_reads,
+        self.config.response_cache_size,
+        self.config.current_max_age,
+        self.config.raw_retention_days,
+        self.config.aggregate_retention_days,
+        self.config.compaction_interval,
+        self.config.compaction_batch_size,
+        self.config.log_max_entries,
+        self.config.log_dedupe_window,
+        self.config.compression,
+        self.config.compression_temperature,
+        self.config.compression_humidity,
+        self.config.compression_max_gap,
+        self.config.recent_hours
       ])
     await self.ctx.commit()
 
@@ -269,7 +1811,28 @@ class Database:
       else:
         self.config = AppConfig.from_row(row)
 
+    await self._configure_connection_async(self.ctx)
+
+  @timed(db_query_duration)
   async def update_config_async(self, cfg: AppConfig):
+    if cfg.compression not in COMPRESSION_MODES:
+      raise Exception(f'Invalid compression mode "{cfg.compression}", use {", ".join(COMPRESSION_MODES)}.')
+
+    async with self._write_lock:
+      # pragmas first, outside any transaction, a bad value fails before the row changes.
+      await self._configure_connection_async(self.ctx, cfg)
+
+      try:
+        await self._write_config_async(cfg)
+      except Exception:
+        await self.ctx.rollback()
+        await self._configure_connection_async(self.ctx)
+        raise
+
+    # formats are baked into cached responses.
+    self._bump_versions()
+
+  async def _write_config_async(self, cfg: AppConfig):
     await self.ctx.execute("""
       UPDATE config
       SET sensor_interval = ?,
@@ -278,7 +1841,27 @@ class Database:
         weekformat = ?,
         monthformat = ?,
         iso_week_format = ?,
-        use_sensor = ?
+        use_sensor = ?,
+        write_buffer_size = ?,
+        write_buffer_max_age = ?,
+        read_pool_size = ?,
+        db_synchronous = ?,
+        db_cache_size = ?,
+        db_mmap_size = ?,
+        max_concurrent_reads = ?,
+        response_cache_size = ?,
+        current_max_age = ?,
+        raw_retention_days = ?,
+        aggregate_retention_days = ?,
+        compaction_interval = ?,
+        compaction_batch_size = ?,
+        log_max_entries = ?,
+        log_dedupe_window = ?,
+        compression = ?,
+        compression_temperature = ?,
+        compression_humidity = ?,
+        compression_max_gap = ?,
+        recent_hours = ?
       WHERE id = 1;
     """, [
       cfg.sensor_interval,
@@ -287,33 +1870,109 @@ class Database:
       cfg.weekformat,
       cfg.monthformat,
       cfg.iso_week_format,
-      cfg.use_sensor
+      cfg.use_sensor,
+      cfg.write_buffer_size,
+      cfg.write_buffer_max_age,
+      cfg.read_pool_size,
+      cfg.db_synchronous,
+      cfg.db_cache_size,
+      cfg.db_mmap_size,
+      cfg.max_concurrent_reads,
+      cfg.response_cache_size,
+      cfg.current_max_age,
+      cfg.raw_retention_days,
+      cfg.aggregate_retention_days,
+      cfg.compaction_interval,
+      cfg.compaction_batch_size,
+      cfg.log_max_entries,
+      cfg.log_dedupe_window,
+      cfg.compression,
+      cfg.compression_temperature,
+      cfg.compression_humidity,
+      cfg.compression_max_gap,
+      cfg.recent_hours
     ])
+    await self._bump_config_version_async()
     await self.ctx.commit()
 
-  async def statistics_async(self) -> StatisticEntry:
-    async with self.ctx.execute("""
+  @timed(db_query_duration)
+  async def statistics_async(self, sensor_id: int | None = None) -> StatisticEntry:
+    where, params = self._where(sensor_id)
+
+    async with self._reader() as ctx, ctx.execute(f"""
       SELECT
-        COUNT(*) AS total_entries,
-        AVG(temperature) AS avg_temperature,
-        AVG(humidity) AS avg_humidity,
-        MIN(temperature) AS min_temperature,
-        (SELECT MIN(timestamp_date) FROM sensor_data
-          WHERE temperature = (SELECT MIN(temperature) FROM sensor_data)) AS min_temperature_date,
-        MAX(temperature) AS max_temperature,
-        (SELECT MIN(timestamp_date) FROM sensor_data
-          WHERE temperature = (SELECT MAX(temperature) FROM sensor_data)) AS max_temperature_date,
-        MIN(humidity) AS min_humidity,
-        (SELECT MIN(timestamp_date) FROM sensor_data
-          WHERE humidity = (SELECT MIN(humidity) FROM sensor_data)) AS min_humidity_date,
-        MAX(humidity) AS max_humidity,
-        (SELECT MIN(timestamp_date) FROM sensor_data
-          WHERE humidity = (SELECT MAX(humidity) FROM sensor_data)) AS max_humidity_date
-      FROM sensor_data;
-    """) as cursor:
+        total_entries,
+        temperature_sum / {SCALE} AS temperature_sum,
+        humidity_sum / {SCALE} AS humidity_sum,
+        min_temperature / {SCALE} AS min_temperature,
+        min_temperature_ts AS min_temperature_date,
+        max_temperature / {SCALE} AS max_temperature,
+        max_temperature_ts AS max_temperature_date,
+        min_humidity / {SCALE} AS min_humidity,
+        min_humidity_ts AS min_humidity_date,
+        max_humidity / {SCALE} AS max_humidity,
+        max_humidity_ts AS max_humidity_date
+      FROM readings_statistics {where};
+    """, params) as cursor:
 
-      row = await cursor.fetchone()
-      if row is None:
+      rows = await cursor.fetchall()
+      if not rows:
         raise Exception("Failed to fetch statistics!")
 
-      return StatisticEntry.from_row(row)
+      return StatisticEntry.from_rows(rows, self.config.dateformat)
+
+  @timed(db_query_duration)
+  async def rebuild_statistics_async(self):
+    await self.flush_async()
+
+    async with self._write_lock:
+      await self._rebuild_statistics_async()
+
+  async def _rebuild_statistics_async(self):
+    await self.ctx.create_function('thum_day_start', 1, day_start, deterministic=True)
+
+    # the daily rollups hold every extreme, the readings table only while the row hasn't been
+    # compacted, pruned or compressed away. the first day comes from the rollups, the exact
+    # reading from the table when it is still there.
+    def _first(extreme: str, rollup: str, column: str) -> str:
+      day = f'(SELECT MIN(day_ts) FROM readings_daily WHERE sensor_id = s.sensor_id AND {rollup} = s.{extreme})'
+
+      return f"""COALESCE(
+          (SELECT MIN(ts) FROM readings
+            WHERE sensor_id = s.sensor_id AND {column} = s.{extreme}
+              AND ts >= {day} AND ts < {day} + 90000 AND thum_day_start(ts) = {day}),
+          {day}
+        )"""
+
+    await self.ctx.execute('DELETE FROM readings_statistics;')
+
+    await self.ctx.execute(f"""
+      INSERT INTO readings_statistics (
+        sensor_id, total_entries, temperature_sum, humidity_sum,
+        min_temperature, min_temperature_ts,
+        max_temperature, max_temperature_ts,
+        min_humidity, min_humidity_ts,
+        max_humidity, max_humidity_ts
+      )
+      SELECT
+        s.sensor_id, s.total_entries, s.temperature_sum, s.humidity_sum,
+        s.min_temperature, {_first('min_temperature', 'temperature_min', 'temperature')},
+        s.max_temperature, {_first('max_temperature', 'temperature_max', 'temperature')},
+        s.min_humidity, {_first('min_humidity', 'humidity_min', 'humidity')},
+        s.max_humidity, {_first('max_humidity', 'humidity_max', 'humidity')}
+      FROM (
+        SELECT
+          sensor_id,
+          SUM(count) AS total_entries,
+          SUM(temperature_sum) AS temperature_sum,
+          SUM(humidity_sum) AS humidity_sum,
+          MIN(temperature_min) AS min_temperature,
+          MAX(temperature_max) AS max_temperature,
+          MIN(humidity_min) AS min_humidity,
+          MAX(humidity_max) AS max_humidity
+        FROM readings_daily
+        GROUP BY sensor_id
+      ) s;
+    """)
+    await self.ctx.commit()
+    self._bump_versions()
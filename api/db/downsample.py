@@ -0,0 +1,68 @@
+import numpy as np
+
+Point = tuple[int, float | None, float | None]
+
+def lttb(points: list[Point], threshold: int) -> list[Point]:
+  # largest-triangle-three-buckets, keeps first and last point and the most
+  # significant point of every bucket in between.
+  if threshold >= len(points) or threshold < 3:
+    return points
+
+  n = len(points)
+  # missing values become nan.
+  data = np.array(points, dtype=np.float64)
+  known = ~np.isnan(data)
+  values = np.where(known, data, 0.0)
+
+  every = (n - 2) / (threshold - 2)
+  edges = np.minimum((np.arange(threshold) * every).astype(np.int64) + 1, n)
+
+  # every bucket's average up front from running sums, an empty bucket falls back to the last point.
+  sums = np.vstack((np.zeros(3), np.cumsum(values, axis=0)))
+  counts = np.vstack((np.zeros(3), np.cumsum(known, axis=0)))
+  starts, ends = edges[1:], np.append(edges[2:], n)
+  empty = starts >= ends
+  starts, ends = np.where(empty, n - 1, starts), np.where(empty, n, ends)
+  totals = counts[ends] - counts[starts]
+  averages = np.divide(sums[ends] - sums[starts], totals, out=np.zeros_like(totals), where=totals > 0)
+
+  sampled = [0]
+  a = 0
+
+  for i in range(threshold - 2):
+    bucket = data[edges[i]:edges[i + 1]]
+    c = averages[i]
+
+    # temperature and humidity share the x axis, so both triangles are summed, a missing value adds nothing.
+    area = np.abs((data[a, 0] - c[0]) * (bucket[:, 1:] - data[a, 1:]) - (data[a, 0] - bucket[:, :1]) * (c[1:] - data[a, 1:]))
+    a = edges[i] + int(np.argmax(np.nansum(area, axis=1)))
+    sampled.append(a)
+
+  sampled.append(n - 1)
+  return [points[i] for i in sampled]
+
+def reconstruct(points: list[Point], interval: int, mode: str) -> list[Point]:
+  # compressed series only store the points where the signal changed, this puts back
+  # one point per poll interval, holding the last value (step) or interpolating (linear).
+  if len(points) < 2 or interval < 1:
+    return points
+
+  ts = np.array([p[0] for p in points], dtype=np.int64)
+  grid = np.union1d(np.arange(ts[0], ts[-1] + 1, interval), ts)
+  series = []
+
+  for i in (1, 2):
+    values = np.array([np.nan if p[i] is None else p[i] for p in points], dtype=np.float64)
+    known = ~np.isnan(values)
+
+    if not known.any():
+      series.append(np.full(len(grid), np.nan))
+    elif mode == 'linear':
+      series.append(np.interp(grid, ts[known], values[known]))
+    else:
+      series.append(values[np.searchsorted(ts, grid, side='right') - 1])
+
+  return [
+    (int(t), None if np.isnan(temperature) else round(float(temperature), 2), None if np.isnan(humidity) else round(float(humidity), 2))
+    for t, temperature, humidity in zip(grid, *series)
+  ]
@@ -0,0 +1,226 @@
+import codecs
+import csv
+import io
+import json
+import time
+from datetime import datetime
+from typing import TYPE_CHECKING, Any, AsyncIterator, Iterable
+import numpy as np
+from api.db.storage import FIXED_POINT
+from api.models.bulk_insert_result import BulkInsertResult
+
+if TYPE_CHECKING:
+  from api.db.database import Database
+
+# widest range any supported DHT sensor reports, anything outside is a bad row.
+TEMPERATURE_RANGE = (-40.0, 80.0)
+HUMIDITY_RANGE = (0.0, 100.0)
+FUTURE_TOLERANCE = 300
+MAX_REPORTED_ERRORS = 20
+INGEST_BATCH_LINES = 50000
+
+Columns = dict[str, list[Any]]
+
+def _empty() -> Columns:
+  return {'sensor_id': [], 'ts': [], 'temperature': [], 'humidity': []}
+
+def columns_from_records(records: Iterable[dict], sensor_id: int | None = None) -> Columns:
+  columns = _empty()
+
+  for record in records:
+    if not isinstance(record, dict):
+      record = {}
+
+    columns['sensor_id'].append(record.get('sensor_id', sensor_id))
+    columns['ts'].append(record.get('ts', record.get('timestamp')))
+    columns['temperature'].append(record.get('temperature'))
+    columns['humidity'].append(record.get('humidity'))
+
+  return columns
+
+def parse_json(body: bytes, sensor_id: int | None = None) -> Columns:
+  records = json.loads(body)
+
+  if not isinstance(records, list):
+    raise Exception('Expected a JSON array of readings.')
+
+  return columns_from_records(records, sensor_id)
+
+def parse_ndjson(lines: Iterable[str], sensor_id: int | None = None) -> Columns:
+  records = []
+
+  for line in lines:
+    line = line.strip()
+    if not line:
+      continue
+
+    try:
+      records.append(json.loads(line))
+    except ValueError:
+      # kept as an empty record so validation reports it with its line index.
+      records.append({})
+
+  return columns_from_records(records, sensor_id)
+
+def parse_csv(lines: Iterable[str], header: list[str], sensor_id: int | None = None) -> Columns:
+  return columns_from_records((dict(zip(header, row)) for row in csv.reader(lines) if row), sensor_id)
+
+def csv_header(line: str) -> list[str]:
+  return [name.strip().lower() for name in next(csv.reader(io.StringIO(line)))]
+
+def _floats(values: list[Any]) -> np.ndarray:
+  try:
+    return np.asarray(values, dtype=np.float64)
+  except (TypeError, ValueError):
+    pass
+
+  # slow path, only taken when a chunk contains malformed values.
+  result = np.full(len(values), np.nan)
+
+  for i, value in enumerate(values):
+    try:
+      result[i] = float(value)
+    except (TypeError, ValueError):
+      pass
+
+  return result
+
+def _epochs(values: list[Any]) -> np.ndarray:
+  try:
+    return np.asarray(values, dtype=np.float64)
+  except (TypeError, ValueError):
+    pass
+
+  result = np.full(len(values), np.nan)
+
+  # iso 8601 strings without an offset are local time, like every other timestamp in thum.
+  for i, value in enumerate(values):
+    try:
+      result[i] = float(value)
+    except (TypeError, ValueError):
+      try:
+        result[i] = datetime.fromisoformat(str(value)).timestamp()
+      except ValueError:
+        pass
+
+  return result
+
+def validate(columns: Columns, sensors: set[int], offset: int = 0, compacted_until: int = 0) -> tuple[np.ndarray, dict[str, int], list[str]]:
+  sensor_id = _floats(columns['sensor_id'])
+  ts = _epochs(columns['ts'])
+  temperature = _floats(columns['temperature'])
+  humidity = _floats(columns['humidity'])
+
+  checks = {
+    'malformed': np.isfinite(sensor_id) & np.isfinite(ts) & np.isfinite(temperature) & np.isfinite(humidity),
+    'unknown_sensor': np.isin(sensor_id, np.fromiter(sensors, dtype=np.float64, count=len(sensors))),
+    'bad_timestamp': (ts > 0) & (ts <= time.time() + FUTURE_TOLERANCE),
+    # raw rows before the watermark are compacted away, a re-import there would be counted twice.
+    'compacted': ts >= compacted_until,
+    'temperature_out_of_range': (temperature >= TEMPERATURE_RANGE[0]) & (temperature <= TEMPERATURE_RANGE[1]),
+    'humidity_out_of_range': (humidity >= HUMIDITY_RANGE[0]) & (humidity <= HUMIDITY_RANGE[1])
+  }
+
+  valid = np.ones(len(ts), dtype=bool)
+  rejected: dict[str, int] = {}
+  errors: list[str] = []
+
+  # each row is reported once, under the first check it fails.
+  for reason, passed in checks.items():
+    failed = valid & ~passed
+
+    if failed.any():
+      rejected[reason] = int(failed.sum())
+
+      for index in np.flatnonzero(failed)[:max(0, MAX_REPORTED_ERRORS - len(errors))]:
+        errors.append(f'row {offset + int(index)}: {reason}')
+
+    valid &= passed
+
+  rows = np.column_stack((
+    sensor_id[valid],
+    np.floor(ts[valid]),
+    np.rint(temperature[valid] * FIXED_POINT),
+    np.rint(humidity[valid] * FIXED_POINT)
+  )).astype(np.int64)
+
+  return rows, rejected, errors
+
+def format_of(content_type: str) -> str:
+  media_type = content_type.split(';')[0].strip().lower()
+
+  if media_type in ('application/x-ndjson', 'application/ndjson', 'application/jsonl'):
+    return 'ndjson'
+
+  if media_type in ('text/csv', 'application/csv'):
+    return 'csv'
+
+  if media_type == 'application/json':
+    return 'json'
+
+  raise Exception(f'Unsupported content type "{content_type}", use application/json, application/x-ndjson or text/csv.')
+
+async def _lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[list[str]]:
+  # an incremental decoder keeps multi-byte characters split across chunks intact.
+  decoder = codecs.getincrementaldecoder('utf-8')()
+  remainder = ''
+  batch: list[str] = []
+
+  async for chunk in chunks:
+    lines = (remainder + decoder.decode(chunk)).split('\n')
+    remainder = lines.pop()
+    batch.extend(lines)
+
+    if len(batch) >= INGEST_BATCH_LINES:
+      yield batch
+      batch = []
+
+  if remainder:
+    batch.append(remainder)
+
+  if batch:
+    yield batch
+
+async def ingest_async(db: 'Database', chunks: AsyncIterator[bytes], fmt: str, sensor_id: int | None = None) -> BulkInsertResult:
+  sensors = {sensor.id for sensor in await db.sensors_async() if sensor.id is not None}
+  result = BulkInsertResult(received=0, inserted=0, duplicates=0, rejected={}, errors=[])
+
+  async def _store(columns: Columns):
+    rows, rejected, errors = validate(columns, sensors, result.received, db.compacted_until)
+
+    result.received += len(columns['ts'])
+    result.errors.extend(errors[:MAX_REPORTED_ERRORS - len(result.errors)])
+
+    for reason, count in rejected.items():
+      result.rejected[reason] = result.rejected.get(reason, 0) + count
+
+    if len(rows):
+      inserted, duplicates = await db.bulk_insert_async(rows.tolist())
+      result.inserted += inserted
+      result.duplicates += duplicates
+
+  if fmt == 'json':
+    body = b''.join([chunk async for chunk in chunks])
+    columns = parse_json(body, sensor_id)
+
+    for i in range(0, len(columns['ts']), INGEST_BATCH_LINES):
+      await _store({name: values[i:i + INGEST_BATCH_LINES] for name, values in columns.items()})
+
+    return result
+
+  header: list[str] | None = None
+
+  async for lines in _lines(chunks):
+    if fmt == 'csv' and header is None:
+      header = csv_header(lines[0])
+      lines = lines[1:]
+
+      if not {'ts', 'timestamp'} & set(header) or not {'temperature', 'humidity'} <= set(header):
+        raise Exception('CSV header must contain ts, temperature and humidity columns.')
+
+    if fmt == 'csv':
+      await _store(parse_csv(lines, header or [], sensor_id))
+    else:
+      await _store(parse_ndjson(lines, sensor_id))
+
+  return result
@@ -0,0 +1,40 @@
+import base64
+import binascii
+
+MAX_PAGE_SIZE = 10000
+CURSOR_HEADER = 'X-Next-Cursor'
+
+def encode_cursor(ts: int) -> str:
+  return base64.urlsafe_b64encode(f'ts:{ts}'.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor: str) -> int:
+  try:
+    kind, _, value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode().partition(':')
+
+    if kind == 'ts':
+      return int(value)
+  except (binascii.Error, UnicodeDecodeError, ValueError):
+    pass
+
+  raise Exception(f'Invalid cursor "{cursor}"!')
+
+class Page:
+  def __init__(self, limit: int, after: str | None = None):
+    self.limit = limit
+    self.after = decode_cursor(after) if after else None
+
+    # set by the query once it returns a full page, None means this was the last one.
+    self.next: str | None = None
+
+  def start(self, start: int | None) -> int | None:
+    # keyset pagination, the cursor just moves the lower bound past the last bucket sent.
+    if self.after is None:
+      return start
+
+    return self.after + 1 if start is None else max(start, self.after + 1)
+
+  def limit_query(self, sql: str, params: list[int]) -> tuple[str, list[int]]:
+    return sql.rstrip().rstrip(';') + '\n      LIMIT ?;', params + [self.limit]
+
+  def headers(self) -> dict[str, str]:
+    return {CURSOR_HEADER: self.next} if self.next else {}
@@ -0,0 +1,58 @@
+import asyncio
+import aiosqlite
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import AsyncIterator, Awaitable, Callable
+
+# rows fetched per worker thread round trip when iterating a cursor.
+ITER_CHUNK_SIZE = 512
+
+def queue_depth(conn: aiosqlite.Connection) -> int:
+  # requests waiting for the connection's worker thread, aiosqlite keeps them in _tx.
+  tx = getattr(conn, '_tx', None)
+  return tx.qsize() if tx is not None else 0
+
+class ReadPool:
+  def __init__(self, db_file: str, size: int, configure: Callable[[aiosqlite.Connection], Awaitable[None]]):
+    self.uri = f'{Path(db_file).resolve().as_uri()}?mode=ro'
+    self.size = max(1, size)
+    self._configure = configure
+    self._idle: asyncio.Queue[aiosqlite.Connection] = asyncio.Queue()
+    self._connections: list[aiosqlite.Connection] = []
+    self._closed = False
+    self.waiting = 0
+
+  async def open_async(self):
+    for _ in range(self.size):
+      conn = await aiosqlite.connect(self.uri, uri=True, iter_chunk_size=ITER_CHUNK_SIZE)
+      conn.row_factory = aiosqlite.Row
+      await self._configure(conn)
+      self._connections.append(conn)
+      self._idle.put_nowait(conn)
+
+  @asynccontextmanager
+  async def acquire(self) -> AsyncIterator[aiosqlite.Connection]:
+    self.waiting += 1
+
+    try:
+      conn = await self._idle.get()
+    finally:
+      self.waiting -= 1
+
+    try:
+      yield conn
+    finally:
+      # connections borrowed while the pool was replaced are closed on return.
+      if self._closed:
+        await conn.close()
+      else:
+        self._idle.put_nowait(conn)
+
+  def queued_requests(self) -> int:
+    return sum(queue_depth(conn) for conn in self._connections)
+
+  async def close_async(self):
+    self._closed = True
+
+    while not self._idle.empty():
+      await self._idle.get_nowait().close()
@@ -0,0 +1,61 @@
+from typing import Iterable
+import numpy as np
+from api.db.storage import FIXED_POINT
+from api.sensors.ring_buffer import RingBuffer
+
+class RecentReadings:
+  # ring buffers of the polled sensors, answers recent raw queries without touching sqlite.
+  def __init__(self):
+    self.rings: dict[int, RingBuffer] = {}
+
+    # newest stored reading per sensor, None until loaded. an all-sensor query can only skip
+    # sqlite when the sensors without a ring have nothing in its range.
+    self.latest: dict[int, int] | None = None
+
+  def register(self, sensor_id: int, ring: RingBuffer):
+    self.rings[sensor_id] = ring
+
+  def unregister(self, sensor_id: int, ring: RingBuffer | None):
+    if ring is not None and self.rings.get(sensor_id) is ring:
+      del self.rings[sensor_id]
+
+  def observe(self, readings: Iterable[tuple[int, int]], external: bool = False):
+    for sensor_id, ts in readings:
+      if self.latest is not None and ts > self.latest.get(sensor_id, -1):
+        self.latest[sensor_id] = ts
+
+      # rows the poll didn't write itself, e.g. a bulk import, are missing from the ring.
+      ring = self.rings.get(sensor_id)
+      if external and ring is not None and ring.covers(ts):
+        ring.invalidate()
+
+  def invalidate(self):
+    for ring in self.rings.values():
+      ring.invalidate()
+
+  def rows(self, sensor_id: int | None, start: int, end: int | None = None) -> list[tuple[int, float, float]] | None:
+    if sensor_id is not None:
+      ring = self.rings.get(sensor_id)
+      if ring is None or not ring.covers(start):
+        return None
+
+      ts, values = ring.window(start, end)
+      return list(zip(ts.tolist(), (values[:, 0] / FIXED_POINT).tolist(), (values[:, 1] / FIXED_POINT).tolist()))
+
+    if not self.rings or self.latest is None or not all(ring.covers(start) for ring in self.rings.values()):
+      return None
+
+    if any(ts >= start for sensor_id, ts in self.latest.items() if sensor_id not in self.rings):
+      return None
+
+    windows = [ring.window(start, end) for ring in self.rings.values()]
+    ts = np.concatenate([w[0] for w in windows])
+    values = np.concatenate([w[1] for w in windows])
+
+    # same as AVG(...) GROUP BY ts over every sensor in the readings table.
+    buckets, inverse = np.unique(ts, return_inverse=True)
+    counts = np.bincount(inverse, minlength=len(buckets))
+    temperature = np.bincount(inverse, weights=values[:, 0], minlength=len(buckets)) / counts / FIXED_POINT
+    humidity = np.bincount(inverse, weights=values[:, 1], minlength=len(buckets)) / counts / FIXED_POINT
+
+    return list(zip(buckets.tolist(), temperature.tolist(), humidity.tolist()))
@@ -0,0 +1,25 @@
+from datetime import date, datetime, timedelta
+
+# readings are stored as integers in hundredths (21.37 °C -> 2137).
+FIXED_POINT = 100
+
+def to_fixed(value: float) -> int:
+  return round(value * FIXED_POINT)
+
+def hour_start(ts: int) -> int:
+  return int(datetime.fromtimestamp(ts).replace(minute=0, second=0, microsecond=0).timestamp())
+
+def day_start(ts: int) -> int:
+  return int(datetime.fromtimestamp(ts).replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+
+def date_start(d: date) -> int:
+  return int(datetime(d.year, d.month, d.day).timestamp())
+
+def date_end(d: date) -> int:
+  return date_start(d + timedelta(days=1))
+
+def fmt_ts(ts: int | None, fmt: str) -> str | None:
+  if ts is None:
+    return None
+
+  return datetime.fromtimestamp(ts).strftime(fmt)
@@ -0,0 +1,47 @@
+import argparse
+import asyncio
+import os
+from typing import AsyncIterator
+from api.db.database import Database
+from api.db.ingest import ingest_async
+
+READ_CHUNK_SIZE = 1024 * 1024
+FORMATS = {'.csv': 'csv', '.ndjson': 'ndjson', '.jsonl': 'ndjson', '.json': 'json'}
+
+async def _chunks(path: str) -> AsyncIterator[bytes]:
+  with open(path, 'rb') as file:
+    while chunk := await asyncio.to_thread(file.read, READ_CHUNK_SIZE):
+      yield chunk
+
+async def run(path: str, db_file: str, fmt: str, sensor_id: int | None):
+  db = Database(db_file)
+
+  # same startup as the api, so an old database is migrated before rows land in it.
+  await db.init_database_async()
+  await db.configure_async()
+  await db.migrate_async()
+  await db.backfill_async()
+
+  try:
+    result = await ingest_async(db, _chunks(path), fmt, sensor_id)
+    print(result.model_dump_json(indent=2))
+  finally:
+    await db.flush_async()
+    await db.shutdown_async()
+
+def main():
+  parser = argparse.ArgumentParser(description='Import readings from a CSV, NDJSON or JSON file.')
+  parser.add_argument('file')
+  parser.add_argument('--db', default='./thum.db')
+  parser.add_argument('--format', choices=sorted(set(FORMATS.values())), help='defaults to the file extension')
+  parser.add_argument('--sensor-id', type=int, help='used for rows without a sensor_id')
+  args = parser.parse_args()
+
+  fmt = args.format or FORMATS.get(os.path.splitext(args.file)[1].lower())
+  if fmt is None:
+    raise SystemExit('Could not tell the file format from its extension, pass --format.')
+
+  asyncio.run(run(args.file, args.db, fmt, args.sensor_id))
+
+if __name__ == '__main__':
+  main()
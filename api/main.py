@@ -1,8 +1,13 @@
+import asyncio
+import os
+import shutil
+import tempfile
 from datetime import datetime
 from contextlib import asynccontextmanager
-from fastapi.responses import FileResponse
+from typing import AsyncIterator, Awaitable, Literal
+from fastapi.responses import PlainTextResponse, StreamingResponse
 from api.db.database import Database
-from fastapi import FastAPI, Request, Response, status
+from fastapi import FastAPI, Query, Request, Response, status
 from fastapi.middleware.cors import CORSMiddleware
 from api.models.app_config import AppConfig
 from api.models.status_response import StatusResponse
@@ -10,126 +15,446 @@ from api.models.entries.log_entry import LogEntry
 from api.models.log_delete_result import LogDeleteResult
 from api.models.entries.sensor_entry import SensorEntry
 from api.models.live_sensor import LiveSensor
+from api.models.bulk_insert_result import BulkInsertResult
+from api.models.sensor_config import SensorConfig
+from api.models.series_query import SeriesQuery
+from api.models.series_result import SeriesResult
+from api.sensors.reading_hub import Reading
+from api.db.ingest import format_of, ingest_async
+from api.db import analytics
+from api.db.export import export_response
+from api.db.pagination import CURSOR_HEADER, MAX_PAGE_SIZE, Page
+from api.db.storage import fmt_ts
 from api.models.entries.statistic_entry import StatisticEntry
+from api.services.compaction_service import CompactionService
+from api.services.leader_service import SYNC_INTERVAL, LeaderService, startup_lock
 from api.services.sensor_service import SensorService
+from api.metrics import Gauge, MetricsMiddleware, registry
+from api.response_cache import ResponseCache, cached_json_response
+from api.streaming import gzip_file_response, ndjson_response, sse_response
 
 DB_FILE = './thum.db'
+ResponseFormat = Literal['json', 'ndjson']
+Resolution = Literal['raw', 'hourly', 'daily']
+Fill = Literal['step', 'linear']
+Metric = Literal['temperature', 'humidity', 'dew_point', 'heat_index', 'absolute_humidity']
+LIVE_KEEPALIVE = 15
 db = Database(DB_FILE)
 sensor_service = SensorService()
+compaction_service = CompactionService()
+leader_service = LeaderService()
+response_cache = ResponseCache(db.config.response_cache_size)
+
+async def reload_sensors():
+  # only the leader touches sensor hardware, followers never start a poll.
+  if leader_service.is_leader:
+    await sensor_service.reload(db)
+
+async def on_promoted():
+  await reload_sensors()
+  compaction_service.start(db)
+
+async def on_data_changed():
+  if leader_service.is_leader:
+    return
+
+  # followers feed their hub from what the leader stored, so current and live keep working.
+  for sensor_id, ts, temperature, humidity in await db.latest_readings_async():
+    latest = sensor_service.hub.latest(sensor_id)
+
+    if latest is None or ts > latest.ts:
+      sensor_service.hub.publish(Reading(sensor_id, temperature, humidity, ts))
+
+async def on_config_changed():
+  await db.configure_async()
+  await reload_sensors()
+
+  response_cache.resize(db.config.response_cache_size)
+  response_cache.clear()
+  db.config.settings_changed.set()
 
 @asynccontextmanager
 async def lifespan(_app: FastAPI):
-  await db.init_database_async()
-  await db.configure_async()
+  # lock files live next to the database, whichever file it was pointed at after import.
+  leader_service.lock_path = f'{db.dbfile}.leader'
+
+  async with startup_lock(f'{db.dbfile}.startup'):
+    await db.init_database_async()
+    await db.configure_async()
+    await db.migrate_async()
+    await db.backfill_async()
+
+  response_cache.resize(db.config.response_cache_size)
 
-  sensor_service.init_sensor()
+  # with --workers, one process polls the sensors and compacts, the rest only serve requests.
+  if leader_service.try_acquire():
+    await on_promoted()
+  else:
+    await on_data_changed()
 
-  if db.config.use_sensor:
-    sensor_service.start(db)
+  leader_service.start(db, on_promoted, on_data_changed, on_config_changed)
 
   yield
 
+  await leader_service.stop()
+  await compaction_service.stop()
   await sensor_service.stop()
+  await db.flush_async()
   await db.shutdown_async()
 
 app = FastAPI(lifespan=lifespan)
 
+registry.register(Gauge(
+  'thum_db_queue_depth',
+  'Requests waiting on database connections and the write buffer.',
+  db.queue_depths,
+  ('queue',)
+))
+
+app.add_middleware(MetricsMiddleware)
+
 app.add_middleware(
   CORSMiddleware,
   allow_origins=["*"],
   allow_credentials=True,
   allow_methods=["*"],
   allow_headers=["*"],
+  expose_headers=[CURSOR_HEADER],
 )
 
 def fail_with_http_400(response: Response, e: Exception) -> StatusResponse:
   response.status_code = status.HTTP_400_BAD_REQUEST
   return StatusResponse(success=False, message=str(e))
 
+def fail_on_follower(response: Response) -> StatusResponse:
+  # writes go through the leader, a follower's retry is likely to land on another worker.
+  response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+  response.headers['Retry-After'] = str(SYNC_INTERVAL)
+  return StatusResponse(success=False, message='This worker does not accept writes, retry the request.')
+
+def cached(request: Request, key: tuple, end: int | None, load, page: Page | None = None) -> Awaitable[Response]:
+  closed = end is not None and db.is_closed(end)
+  return cached_json_response(response_cache, request, key, db.version_of(end), closed, load, page.headers if page else None)
+
+def page_of(limit: int | None, after: str | None) -> Page | None:
+  if limit is None and after is None:
+    return None
+
+  return Page(limit or MAX_PAGE_SIZE, after)
+
 @app.get('/api/sensor/all')
-async def all(response: Response) -> list[SensorEntry] | StatusResponse:
+async def all(request: Request, response: Response, sensor_id: int | None = None, fmt: ResponseFormat = Query('json', alias='format'), points: int | None = Query(None, ge=3), limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str | None = None) -> list[SensorEntry] | StatusResponse:
   try:
-    return await db.all_async()
+    page = page_of(limit, after)
+
+    if fmt == 'ndjson':
+      return await ndjson_response(db.iter_all_async(sensor_id, points, page), page)
+
+    return await cached(request, ('all', sensor_id, points, limit, after), None, lambda: db.all_async(sensor_id, points, page), page)
   except Exception as e:
     return fail_with_http_400(response, e)
 
 @app.get('/api/sensor/monthly/{year}/{month}')
-async def monthly(year: int, month: int, response: Response) -> list[SensorEntry] | StatusResponse:
+async def monthly(year: int, month: int, request: Request, response: Response, sensor_id: int | None = None, fmt: ResponseFormat = Query('json', alias='format'), points: int | None = Query(None, ge=3), limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str | None = None) -> list[SensorEntry] | StatusResponse:
   try:
-    return await db.by_month_async(year, month)
+    page = page_of(limit, after)
+
+    if fmt == 'ndjson':
+      return await ndjson_response(db.iter_by_month_async(year, month, sensor_id, points, page), page)
+
+    _, end = db.month_bounds(year, month)
+    return await cached(request, ('monthly', year, month, sensor_id, points, limit, after), end, lambda: db.by_month_async(year, month, sensor_id, points, page), page)
   except Exception as e:
     return fail_with_http_400(response, e)
 
 @app.get('/api/sensor/weekly/{week}')
-async def weekly(week: str, response: Response):
+async def weekly(week: str, request: Request, response: Response, sensor_id: int | None = None, fmt: ResponseFormat = Query('json', alias='format')):
   try:
-    return await db.by_week_async(week)
+    if fmt == 'ndjson':
+      return await ndjson_response(await db.by_week_async(week, sensor_id))
+
+    start, end = db.week_bounds(week)
+    return await cached(request, ('weekly', start, sensor_id), end, lambda: db.by_week_async(week, sensor_id))
   except Exception as e:
     return fail_with_http_400(response, e)
 
 @app.get('/api/sensor/daily/{day}/{month}/{year}')
-async def daily(day: int, month: int, year: int, response: Response) -> list[SensorEntry] | StatusResponse:
+async def daily(day: int, month: int, year: int, request: Request, response: Response, sensor_id: int | None = None, fmt: ResponseFormat = Query('json', alias='format'), points: int | None = Query(None, ge=3), limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str | None = None, fill: Fill | None = None) -> list[SensorEntry] | StatusResponse:
   try:
-    return await db.by_date_async(day, month, year)
+    page = page_of(limit, after)
+
+    if fmt == 'ndjson':
+      return await ndjson_response(db.iter_by_date_async(day, month, year, sensor_id, points, page, fill), page)
+
+    start, end = db.date_bounds(day, month, year)
+    return await cached(request, ('daily', start, sensor_id, points, limit, after, fill), end, lambda: db.by_date_async(day, month, year, sensor_id, points, page, fill), page)
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+@app.get('/api/sensor/recent')
+async def recent(response: Response, hours: int = Query(24, ge=1), sensor_id: int | None = None, fmt: ResponseFormat = Query('json', alias='format'), points: int | None = Query(None, ge=3), fill: Fill | None = None) -> list[SensorEntry] | StatusResponse:
+  try:
+    # a sliding window, nothing to cache, the polled sensors answer it from memory.
+    if fmt == 'ndjson':
+      return await ndjson_response(db.iter_recent_async(hours, sensor_id, points, fill))
+
+    return await db.recent_async(hours, sensor_id, points, fill)
   except Exception as e:
     return fail_with_http_400(response, e)
 
 @app.get('/api/sensor/range/{start_date}/{end_date}')
-async def range(start_date: str, end_date: str, response: Response) -> list[SensorEntry] | StatusResponse:
+async def range(start_date: str, end_date: str, request: Request, response: Response, sensor_id: int | None = None, fmt: ResponseFormat = Query('json', alias='format'), points: int | None = Query(None, ge=3), limit: int | None = Query(None, ge=1, le=MAX_PAGE_SIZE), after: str | None = None) -> list[SensorEntry] | StatusResponse:
+  try:
+    page = page_of(limit, after)
+
+    if fmt == 'ndjson':
+      return await ndjson_response(db.iter_by_range_async(start_date, end_date, sensor_id, points, page), page)
+
+    start, end = db.range_bounds(start_date, end_date)
+    return await cached(request, ('range', start, end, sensor_id, points, limit, after), end, lambda: db.by_range_async(start_date, end_date, sensor_id, points, page), page)
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+def live_sensor(reading: Reading) -> LiveSensor:
+  return LiveSensor(
+    success=True,
+    temperature=reading.temperature,
+    humidity=reading.humidity,
+    sensor_id=reading.sensor_id,
+    ts=fmt_ts(reading.ts, f'{db.config.dateformat} {db.config.timeformat}')
+  )
+
+@app.post('/api/sensor/bulk')
+async def bulk_insert(request: Request, response: Response, sensor_id: int | None = None) -> BulkInsertResult | StatusResponse:
+  if not leader_service.is_leader:
+    return fail_on_follower(response)
+
+  try:
+    fmt = format_of(request.headers.get('content-type', 'application/json'))
+    return await ingest_async(db, request.stream(), fmt, sensor_id)
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+@app.post('/api/sensor/query')
+async def query(queries: list[SeriesQuery], request: Request, response: Response) -> list[SeriesResult] | StatusResponse:
   try:
-    return await db.by_range_async(start_date, end_date)
+    if not queries:
+      return []
+
+    # a batch is only as cacheable as its most recent period.
+    end = max(db.range_bounds(query.start, query.end)[1] for query in queries)
+    key = ('query', tuple(tuple(query.model_dump().values()) for query in queries))
+
+    return await cached(request, key, end, lambda: db.batch_query_async(queries))
   except Exception as e:
     return fail_with_http_400(response, e)
 
 @app.get('/api/sensor/current')
-async def current(response: Response) -> LiveSensor | StatusResponse:
+async def current(response: Response, sensor_id: int | None = None) -> LiveSensor | StatusResponse:
   if not db.config.use_sensor:
     return StatusResponse(success=False, message='Sensor is not available.')
 
-  if not sensor_service.sensor_poll:
+  if not leader_service.is_leader:
+    # followers can't read the sensor, they answer with the leader's last stored reading.
+    reading = sensor_service.hub.latest(sensor_id)
+    if reading is None:
+      return StatusResponse(success=False, message='Sensor is not available.')
+
+    return live_sensor(reading)
+
+  sensor_poll = sensor_service.get_sensor_poll(sensor_id)
+  if not sensor_poll:
     return StatusResponse(success=False, message='Sensor is not available.')
 
   try:
-    temp, humi = await sensor_service.sensor_poll.get_sensor_reading()
-    if temp is None or humi is None:
+    # served from the shared latest reading, the sensor is only read when it is too old.
+    reading = await sensor_poll.get_sensor_reading(db.config.current_max_age)
+    if reading is None:
       return StatusResponse(success=False, message='Invalid temperature or humidity reading.')
 
-    return LiveSensor(success=True, temperature=temp, humidity=humi)
+    return live_sensor(reading)
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+async def live_events(sensor_id: int | None) -> AsyncIterator[LiveSensor | None]:
+  with sensor_service.hub.subscribe() as queue:
+    for reading in sensor_service.hub.readings():
+      if sensor_id in (None, reading.sensor_id):
+        yield live_sensor(reading)
+
+    while True:
+      try:
+        reading = await asyncio.wait_for(queue.get(), timeout=LIVE_KEEPALIVE)
+      except asyncio.TimeoutError:
+        yield None
+        continue
+
+      if sensor_id in (None, reading.sensor_id):
+        yield live_sensor(reading)
+
+@app.get('/api/sensor/live')
+async def live(sensor_id: int | None = None) -> StreamingResponse:
+  return sse_response(live_events(sensor_id))
+
+@app.get('/api/analytics/derived/{start_date}/{end_date}')
+async def analytics_derived(start_date: str, end_date: str, request: Request, response: Response, sensor_id: int | None = None, resolution: Resolution = 'hourly'):
+  async def _load():
+    return analytics.encode(analytics.derived(await db.series_array_async(start_date, end_date, sensor_id, resolution)))
+
+  try:
+    start, end = db.range_bounds(start_date, end_date)
+    return await cached(request, ('analytics_derived', start, end, sensor_id, resolution), end, _load)
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+@app.get('/api/analytics/rolling/{start_date}/{end_date}')
+async def analytics_rolling(
+  start_date: str,
+  end_date: str,
+  request: Request,
+  response: Response,
+  sensor_id: int | None = None,
+  metric: Metric = 'temperature',
+  window: int = Query(86400, ge=1),
+  resolution: Resolution = 'hourly'
+):
+  async def _load():
+    series = await db.series_array_async(start_date, end_date, sensor_id, resolution)
+    return analytics.encode(analytics.rolling(series[:, 0], analytics.metric(series, metric), window))
+
+  try:
+    start, end = db.range_bounds(start_date, end_date)
+    return await cached(request, ('analytics_rolling', start, end, sensor_id, metric, window, resolution), end, _load)
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+@app.get('/api/analytics/histogram/{start_date}/{end_date}')
+async def analytics_histogram(
+  start_date: str,
+  end_date: str,
+  request: Request,
+  response: Response,
+  sensor_id: int | None = None,
+  metric: Metric = 'temperature',
+  bins: int = Query(20, ge=1, le=analytics.MAX_HISTOGRAM_BINS),
+  resolution: Resolution = 'raw'
+):
+  async def _load():
+    series = await db.series_array_async(start_date, end_date, sensor_id, resolution)
+    return analytics.encode(analytics.histogram(analytics.metric(series, metric), bins))
+
+  try:
+    start, end = db.range_bounds(start_date, end_date)
+    return await cached(request, ('analytics_histogram', start, end, sensor_id, metric, bins, resolution), end, _load)
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+@app.get('/api/sensors')
+async def get_sensors(response: Response) -> list[SensorConfig] | StatusResponse:
+  try:
+    return await db.sensors_async()
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+@app.post('/api/sensors')
+async def add_sensor(sensor: SensorConfig, response: Response) -> SensorConfig | StatusResponse:
+  if not leader_service.is_leader:
+    return fail_on_follower(response)
+
+  try:
+    sensor = await db.insert_sensor_async(sensor)
+    await reload_sensors()
+
+    return sensor
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+@app.put('/api/sensors/{sensor_id}')
+async def update_sensor(sensor_id: int, sensor: SensorConfig, response: Response) -> StatusResponse:
+  if not leader_service.is_leader:
+    return fail_on_follower(response)
+
+  try:
+    if not await db.update_sensor_async(sensor_id, sensor):
+      raise Exception(f'Sensor {sensor_id} does not exist.')
+
+    await reload_sensors()
+
+    return StatusResponse(success=True, message='Sensor updated successfully!')
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+@app.delete('/api/sensors/{sensor_id}')
+async def remove_sensor(sensor_id: int, response: Response) -> StatusResponse:
+  if not leader_service.is_leader:
+    return fail_on_follower(response)
+
+  try:
+    if not await db.delete_sensor_async(sensor_id):
+      raise Exception(f'Sensor {sensor_id} does not exist.')
+
+    await reload_sensors()
+
+    return StatusResponse(success=True, message='Sensor removed successfully!')
   except Exception as e:
     return fail_with_http_400(response, e)
 
 @app.get('/api/daterange')
-async def get_daterange(response: Response):
+async def get_daterange(request: Request, response: Response, sensor_id: int | None = None):
   try:
-    return await db.daterange_async()
+    return await cached(request, ('daterange', sensor_id), None, lambda: db.daterange_async(sensor_id))
   except Exception as e:
     return fail_with_http_400(response, e)
 
 @app.get('/api/logs')
-async def get_logs_all(response: Response) -> list[LogEntry] | StatusResponse:
+async def get_logs(
+  response: Response,
+  before: int | None = None,
+  limit: int = Query(100, ge=1, le=1000),
+  level: Literal['info', 'warning', 'error'] | None = None
+) -> list[LogEntry] | StatusResponse:
   try:
-    return await db.all_logs_async()
+    return await db.logs_async(before, limit, level)
   except Exception as e:
     return fail_with_http_400(response, e)
 
-@app.delete('/api/logs/{timestamp}')
-async def remove_log_by_timestamp(timestamp: str, response: Response) -> LogDeleteResult | StatusResponse:
+@app.delete('/api/logs/{log_id}')
+async def remove_log(log_id: int, response: Response) -> LogDeleteResult | StatusResponse:
+  if not leader_service.is_leader:
+    return fail_on_follower(response)
+
   try:
-    return await db.delete_log_by_ts_async(timestamp)
+    return await db.delete_log_async(log_id)
   except Exception as e:
     return fail_with_http_400(response, e)
 
 @app.delete('/api/logs')
 async def remove_all_logs(response: Response) -> LogDeleteResult | StatusResponse:
+  if not leader_service.is_leader:
+    return fail_on_follower(response)
+
   try:
     return await db.delete_all_logs_async()
   except Exception as e:
     return fail_with_http_400(response, e)
 
 @app.get('/api/statistics')
-async def get_statistics(response: Response) -> StatisticEntry | StatusResponse:
+async def get_statistics(request: Request, response: Response, sensor_id: int | None = None) -> StatisticEntry | StatusResponse:
+  try:
+    return await cached(request, ('statistics', sensor_id), None, lambda: db.statistics_async(sensor_id))
+  except Exception as e:
+    return fail_with_http_400(response, e)
+
+@app.post('/api/statistics/rebuild')
+async def rebuild_statistics(response: Response) -> StatusResponse:
+  if not leader_service.is_leader:
+    return fail_on_follower(response)
+
   try:
-    return await db.statistics_async()
+    await db.rebuild_rollups_async()
+    await db.rebuild_statistics_async()
+
+    return StatusResponse(success=True, message='Statistics rebuilt successfully!')
   except Exception as e:
     return fail_with_http_400(response, e)
 
@@ -137,21 +462,28 @@ async def get_statistics(response: Response) -> StatisticEntry | StatusResponse:
 async def get_all_urls_from_request(request: Request) -> list[str]:
   return [route.path for route in request.app.routes]
 
+@app.get('/metrics')
+async def get_metrics() -> PlainTextResponse:
+  return PlainTextResponse(registry.render(), media_type='text/plain; version=0.0.4')
+
 @app.get('/api/config')
 async def get_app_config() -> AppConfig:
   return db.config
 
 @app.put('/api/config')
 async def update_config(cfg: AppConfig, response: Response) -> StatusResponse:
+  if not leader_service.is_leader:
+    return fail_on_follower(response)
+
   try:
+    # fields missing from the request keep their current value.
+    cfg = db.config.model_copy(update=cfg.model_dump(exclude_unset=True))
+
     await db.update_config_async(cfg)
     await db.configure_async()
+    await reload_sensors()
 
-    if db.config.use_sensor:
-      sensor_service.start(db)
-    else:
-      await sensor_service.stop()
-
+    response_cache.resize(db.config.response_cache_size)
     db.config.settings_changed.set()
 
     return StatusResponse(success=True, message='Configuration updated successfully!')
@@ -159,11 +491,36 @@ async def update_config(cfg: AppConfig, response: Response) -> StatusResponse:
     return fail_with_http_400(response, e)
 
 @app.get('/api/dump')
-async def get_database_dump() -> FileResponse:
+async def get_database_dump(
+  response: Response,
+  start: str | None = Query(None, alias='from'),
+  end: str | None = Query(None, alias='to')
+):
   timestamp = datetime.now().strftime("%d%m%Y%H%M%S")
 
-  return FileResponse(
-    path=DB_FILE,
-    filename=f'thum-{timestamp}.db',
-    media_type='application/x-sqlite3'
-  )
+  # snapshots are written next to the database, /tmp is often a small tmpfs on a pi.
+  snapshot_dir = tempfile.mkdtemp(prefix='.thum-dump-', dir=os.path.dirname(os.path.abspath(db.dbfile)))
+  snapshot = os.path.join(snapshot_dir, 'thum.db')
+
+  try:
+    await db.snapshot_async(snapshot, start, end)
+  except Exception as e:
+    shutil.rmtree(snapshot_dir, ignore_errors=True)
+    return fail_with_http_400(response, e)
+
+  return gzip_file_response(snapshot, f'thum-{timestamp}.db.gz', snapshot_dir)
+
+@app.get('/api/export')
+async def export(
+  response: Response,
+  sensor_id: int | None = None,
+  fmt: Literal['csv', 'arrow', 'parquet'] = Query('csv', alias='format'),
+  start: str | None = Query(None, alias='from'),
+  end: str | None = Query(None, alias='to')
+):
+  timestamp = datetime.now().strftime("%d%m%Y%H%M%S")
+
+  try:
+    return await export_response(db.iter_export_async(sensor_id, start, end), fmt, f'thum-{timestamp}')
+  except Exception as e:
+    return fail_with_http_400(response, e)
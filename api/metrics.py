@@ -0,0 +1,209 @@
+import functools
+import time
+from typing import Callable, Iterable, TypeVar
+
+# prometheus' default latency buckets, trimmed at the low end for a pi.
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+DRIFT_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+def _escape(value: str) -> str:
+  return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = '') -> str:
+  pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+
+  if extra:
+    pairs.append(extra)
+
+  return '{' + ','.join(pairs) + '}' if pairs else ''
+
+def _number(value: float) -> str:
+  if value == float('inf'):
+    return '+Inf'
+
+  return repr(float(value)) if isinstance(value, float) else str(value)
+
+class Metric:
+  kind = 'untyped'
+
+  def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+    self.name = name
+    self.help = help
+    self.labels = tuple(labels)
+
+  def samples(self) -> Iterable[str]:
+    return ()
+
+  def render(self) -> str:
+    lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+    lines.extend(self.samples())
+    return '\n'.join(lines)
+
+class Counter(Metric):
+  kind = 'counter'
+
+  def __init__(self, name: str, help: str, labels: Iterable[str] = ()):
+    super().__init__(name, help, labels)
+    self._values: dict[tuple[str, ...], float] = {}
+
+  def inc(self, *labels: object, amount: float = 1):
+    key = tuple(str(label) for label in labels)
+    self._values[key] = self._values.get(key, 0) + amount
+
+  def samples(self) -> Iterable[str]:
+    for key, value in self._values.items():
+      yield f'{self.name}{_labels(self.labels, key)} {_number(value)}'
+
+class Gauge(Metric):
+  kind = 'gauge'
+
+  def __init__(self, name: str, help: str, collect: Callable[[], dict[tuple[str, ...], float]], labels: Iterable[str] = ()):
+    super().__init__(name, help, labels)
+    self._collect = collect
+
+  def samples(self) -> Iterable[str]:
+    for key, value in self._collect().items():
+      yield f'{self.name}{_labels(self.labels, key)} {_number(value)}'
+
+class Histogram(Metric):
+  kind = 'histogram'
+
+  def __init__(self, name: str, help: str, labels: Iterable[str] = (), buckets: tuple[float, ...] = LATENCY_BUCKETS):
+    super().__init__(name, help, labels)
+    self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+    self._counts: dict[tuple[str, ...], list[int]] = {}
+    self._sums: dict[tuple[str, ...], float] = {}
+
+  def observe(self, value: float, *labels: object):
+    key = tuple(str(label) for label in labels)
+    counts = self._counts.get(key)
+
+    if counts is None:
+      counts = self._counts[key] = [0] * len(self.buckets)
+      self._sums[key] = 0.0
+
+    # counts are stored per bucket and made cumulative when rendered.
+    for i, bound in enumerate(self.buckets):
+      if value <= bound:
+        counts[i] += 1
+        break
+
+    self._sums[key] += value
+
+  def samples(self) -> Iterable[str]:
+    for key, counts in self._counts.items():
+      total = 0
+
+      for bound, count in zip(self.buckets, counts):
+        total += count
+        le = 'le="' + _number(bound) + '"'
+        yield f'{self.name}_bucket{_labels(self.labels, key, le)} {total}'
+
+      yield f'{self.name}_sum{_labels(self.labels, key)} {_number(self._sums[key])}'
+      yield f'{self.name}_count{_labels(self.labels, key)} {total}'
+
+M = TypeVar('M', bound=Metric)
+
+class Registry:
+  def __init__(self):
+    self._metrics: dict[str, Metric] = {}
+
+  def register(self, metric: M) -> M:
+    self._metrics[metric.name] = metric
+    return metric
+
+  def render(self) -> str:
+    return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+registry = Registry()
+
+http_request_duration = registry.register(Histogram(
+  'thum_http_request_duration_seconds',
+  'Time spent handling HTTP requests, up to the first response byte.',
+  ('method', 'route', 'status')
+))
+
+db_query_duration = registry.register(Histogram(
+  'thum_db_query_duration_seconds',
+  'Time spent in Database query methods.',
+  ('method',)
+))
+
+sensor_reads = registry.register(Counter(
+  'thum_sensor_reads_total',
+  'Hardware sensor reads by result.',
+  ('sensor_id', 'result')
+))
+
+sensor_read_retries = registry.register(Counter(
+  'thum_sensor_read_retries_total',
+  'Sensor reads retried by the poll loop after a failed read.',
+  ('sensor_id',)
+))
+
+sensor_read_duration = registry.register(Histogram(
+  'thum_sensor_read_duration_seconds',
+  'Duration of hardware sensor reads.',
+  ('sensor_id',)
+))
+
+poll_drift = registry.register(Histogram(
+  'thum_sensor_poll_drift_seconds',
+  'Delay between the scheduled and the actual start of a poll.',
+  ('sensor_id',),
+  DRIFT_BUCKETS
+))
+
+def timed(histogram: Histogram, label: str | None = None):
+  def decorator(fn):
+    name = label or fn.__name__
+
+    @functools.wraps(fn)
+    async def wrapper(*args, **kwargs):
+      started = time.perf_counter()
+
+      try:
+        return await fn(*args, **kwargs)
+      finally:
+        histogram.observe(time.perf_counter() - started, name)
+
+    return wrapper
+
+  return decorator
+
+class MetricsMiddleware:
+  # plain asgi middleware, BaseHTTPMiddleware would wrap and re-stream every body.
+  def __init__(self, app):
+    self.app = app
+
+  async def __call__(self, scope, receive, send):
+    if scope['type'] != 'http':
+      await self.app(scope, receive, send)
+      return
+
+    started = time.perf_counter()
+    status_code = 500
+    observed = False
+
+    def _observe():
+      nonlocal observed
+      observed = True
+
+      # the router stores the matched route in scope, its template keeps label cardinality bounded.
+      path = getattr(scope.get('route'), 'path', 'unmatched')
+      http_request_duration.observe(time.perf_counter() - started, scope['method'], path, status_code)
+
+    async def _send(message):
+      nonlocal status_code
+
+      if message['type'] == 'http.response.start':
+        status_code = message['status']
+        _observe()
+
+      await send(message)
+
+    try:
+      await self.app(scope, receive, _send)
+    finally:
+      if not observed:
+        _observe()
@@ -3,6 +3,26 @@ from aiosqlite import Row
 from pydantic import BaseModel
 from asyncio import Event
 
+class SettingsChanged:
+  # every sensor poll waits on this. each change bumps a generation that every poll compares
+  # with the last one it saw, so one poll noticing a change can't hide it from the others.
+  def __init__(self):
+    self.generation = 0
+    self._event = Event()
+
+  def set(self):
+    self.generation += 1
+
+    # wakes everything waiting on the current event, later waits get a fresh one.
+    self._event.set()
+    self._event = Event()
+
+  async def wait(self, seen: int) -> int:
+    while self.generation == seen:
+      await self._event.wait()
+
+    return self.generation
+
 class AppConfig(BaseModel):
   id: int
   sensor_interval: int
@@ -12,8 +32,28 @@ class AppConfig(BaseModel):
   monthformat: str
   iso_week_format: str
   use_sensor: bool
+  write_buffer_size: int = 1
+  write_buffer_max_age: float = 60
+  read_pool_size: int = 2
+  db_synchronous: str = 'NORMAL'
+  db_cache_size: int = -16000
+  db_mmap_size: int = 67108864
+  max_concurrent_reads: int = 2
+  response_cache_size: int = 4194304
+  current_max_age: float = 10
+  raw_retention_days: int = 0
+  aggregate_retention_days: int = 0
+  compaction_interval: int = 3600
+  compaction_batch_size: int = 2000
+  log_max_entries: int = 10000
+  log_dedupe_window: int = 3600
+  compression: str = 'off'
+  compression_temperature: float = 0.2
+  compression_humidity: float = 1.0
+  compression_max_gap: int = 1800
+  recent_hours: int = 24
 
-  settings_changed: ClassVar[Event] = Event()
+  settings_changed: ClassVar[SettingsChanged] = SettingsChanged()
 
   @classmethod
   def from_row(cls, row: Row):
@@ -25,7 +65,27 @@ class AppConfig(BaseModel):
       weekformat=row["weekformat"],
       monthformat=row["monthformat"],
       iso_week_format=row["iso_week_format"],
-      use_sensor=bool(row["use_sensor"])
+      use_sensor=bool(row["use_sensor"]),
+      write_buffer_size=row["write_buffer_size"],
+      write_buffer_max_age=row["write_buffer_max_age"],
+      read_pool_size=row["read_pool_size"],
+      db_synchronous=row["db_synchronous"],
+      db_cache_size=row["db_cache_size"],
+      db_mmap_size=row["db_mmap_size"],
+      max_concurrent_reads=row["max_concurrent_reads"],
+      response_cache_size=row["response_cache_size"],
+      current_max_age=row["current_max_age"],
+      raw_retention_days=row["raw_retention_days"],
+      aggregate_retention_days=row["aggregate_retention_days"],
+      compaction_interval=row["compaction_interval"],
+      compaction_batch_size=row["compaction_batch_size"],
+      log_max_entries=row["log_max_entries"],
+      log_dedupe_window=row["log_dedupe_window"],
+      compression=row["compression"],
+      compression_temperature=row["compression_temperature"],
+      compression_humidity=row["compression_humidity"],
+      compression_max_gap=row["compression_max_gap"],
+      recent_hours=row["recent_hours"]
     )
 
   @classmethod
@@ -38,5 +98,25 @@ class AppConfig(BaseModel):
       weekformat='%G-W%V',
       monthformat='%Y-%m',
       iso_week_format='%G-W%V-%u',
-      use_sensor=False
+      use_sensor=False,
+      write_buffer_size=1,
+      write_buffer_max_age=60,
+      read_pool_size=2,
+      db_synchronous='NORMAL',
+      db_cache_size=-16000,
+      db_mmap_size=67108864,
+      max_concurrent_reads=2,
+      response_cache_size=4194304,
+      current_max_age=10,
+      raw_retention_days=0,
+      aggregate_retention_days=0,
+      compaction_interval=3600,
+      compaction_batch_size=2000,
+      log_max_entries=10000,
+      log_dedupe_window=3600,
+      compression='off',
+      compression_temperature=0.2,
+      compression_humidity=1.0,
+      compression_max_gap=1800,
+      recent_hours=24
     )
@@ -0,0 +1,8 @@
+from pydantic import BaseModel
+
+class BulkInsertResult(BaseModel):
+  received: int
+  inserted: int
+  duplicates: int
+  rejected: dict[str, int]
+  errors: list[str]
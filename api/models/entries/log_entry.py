@@ -1,10 +1,22 @@
 from aiosqlite import Row
 from pydantic import BaseModel
+from api.db.storage import fmt_ts
 
 class LogEntry(BaseModel):
+  id: int
+  level: str
   message: str
   timestamp: str
+  first_timestamp: str
+  count: int
 
   @classmethod
-  def from_row(cls, row: Row):
-    return cls(message=row["msg"], timestamp=row["ts"])
+  def from_row(cls, row: Row, fmt: str):
+    return cls(
+      id=row["id"],
+      level=row["level"],
+      message=row["message"],
+      timestamp=fmt_ts(row["ts"], fmt),
+      first_timestamp=fmt_ts(row["first_ts"], fmt),
+      count=row["count"]
+    )
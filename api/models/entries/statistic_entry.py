@@ -1,12 +1,13 @@
 from aiosqlite import Row
 from pydantic import BaseModel
+from api.db.storage import fmt_ts
 
 class ValueDatePair(BaseModel):
   value: float
-  date: str
+  date: str | None
 
   @classmethod
-  def from_rows(cls, v: float, d: str):
+  def from_rows(cls, v: float, d: str | None):
     return cls(value=v, date=d)
 
 class StatisticEntry(BaseModel):
@@ -19,25 +20,21 @@ class StatisticEntry(BaseModel):
   min_humidity: ValueDatePair
 
   @classmethod
-  def from_row(cls, row: Row):
+  def from_rows(cls, rows: list[Row], fmt_date: str):
+    total_entries = sum(row["total_entries"] for row in rows)
+
+    # combines per-sensor rows, keeping the first date the extreme occurred.
+    def _extreme(key: str, pick) -> ValueDatePair:
+      value = pick(row[key] for row in rows)
+      ts = min((row[f'{key}_date'] for row in rows if row[key] == value and row[f'{key}_date'] is not None), default=None)
+      return ValueDatePair.from_rows(value, fmt_ts(ts, fmt_date))
+
     return cls(
-      total_entries=row["total_entries"],
-      avg_temperature=row["avg_temperature"],
-      avg_humidity=row["avg_humidity"],
-      min_temperature=ValueDatePair.from_rows(
-        row["min_temperature"],
-        row["min_temperature_date"]
-      ),
-      max_temperature=ValueDatePair.from_rows(
-        row["max_temperature"],
-        row["max_temperature_date"]
-      ),
-      min_humidity=ValueDatePair.from_rows(
-        row["min_humidity"],
-        row["min_humidity_date"]
-      ),
-      max_humidity=ValueDatePair.from_rows(
-        row["max_humidity"],
-        row["max_humidity_date"]
-      )
+      total_entries=total_entries,
+      avg_temperature=sum(row["temperature_sum"] for row in rows) / total_entries,
+      avg_humidity=sum(row["humidity_sum"] for row in rows) / total_entries,
+      min_temperature=_extreme("min_temperature", min),
+      max_temperature=_extreme("max_temperature", max),
+      min_humidity=_extreme("min_humidity", min),
+      max_humidity=_extreme("max_humidity", max)
     )
@@ -4,3 +4,5 @@ class LiveSensor(BaseModel):
   success: bool
   temperature: float
   humidity: float
+  sensor_id: int | None = None
+  ts: str | None = None
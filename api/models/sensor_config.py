@@ -0,0 +1,34 @@
+import sys
+from typing import Literal
+from aiosqlite import Row
+from pydantic import BaseModel, Field
+
+SensorType = Literal['DHT11', 'DHT21', 'DHT22', 'Dummy']
+
+class SensorConfig(BaseModel):
+  id: int | None = None
+  name: str
+  type: SensorType
+  pin: str | None = None
+  interval: int | None = None
+  enabled: bool = True
+  read_timeout: float = Field(5.0, gt=0)
+
+  @classmethod
+  def from_row(cls, row: Row):
+    return cls(
+      id=row["id"],
+      name=row["name"],
+      type=row["type"],
+      pin=row["pin"],
+      interval=row["interval"],
+      enabled=bool(row["enabled"]),
+      read_timeout=row["read_timeout"]
+    )
+
+  @classmethod
+  def default(cls):
+    if sys.platform.startswith("linux"):
+      return cls(id=1, name='default', type='DHT11', pin='D4')
+
+    return cls(id=1, name='default', type='Dummy')
@@ -0,0 +1,12 @@
+from typing import Literal
+from pydantic import BaseModel, Field
+
+Granularity = Literal['raw', 'hourly', 'daily']
+
+class SeriesQuery(BaseModel):
+  id: str | None = None
+  start: str
+  end: str
+  granularity: Granularity = 'daily'
+  sensor_id: int | None = None
+  points: int | None = Field(None, ge=3)
@@ -0,0 +1,7 @@
+from pydantic import BaseModel
+from api.models.entries.sensor_entry import SensorEntry
+
+class SeriesResult(BaseModel):
+  id: str | None
+  granularity: str
+  entries: list[SensorEntry]
@@ -0,0 +1,104 @@
+import hashlib
+import json
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+# closed periods rarely change, but a format change, bulk import, rebuild or compaction still
+# rewrites them, so browsers only keep them briefly and then revalidate against the etag.
+CLOSED_CACHE_CONTROL = 'public, max-age=300, must-revalidate'
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+class CachedBody:
+  def __init__(self, version: int, body: bytes, headers: dict[str, str] | None = None):
+    self.version = version
+    self.body = body
+    self.headers = headers or {}
+    self.etag = f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+class ResponseCache:
+  def __init__(self, max_bytes: int):
+    self.max_bytes = max_bytes
+    self.size = 0
+    self._entries: OrderedDict[Hashable, CachedBody] = OrderedDict()
+
+  def get(self, key: Hashable, version: int) -> CachedBody | None:
+    entry = self._entries.get(key)
+    if entry is None:
+      return None
+
+    # entries written before the last matching data change are stale.
+    if entry.version != version:
+      self._remove(key)
+      return None
+
+    self._entries.move_to_end(key)
+    return entry
+
+  def put(self, key: Hashable, version: int, body: bytes, headers: dict[str, str] | None = None) -> CachedBody:
+    entry = CachedBody(version, body, headers)
+
+    if key in self._entries:
+      self._remove(key)
+
+    if len(body) <= self.max_bytes:
+      self._entries[key] = entry
+      self.size += len(body)
+      self._evict()
+
+    return entry
+
+  def resize(self, max_bytes: int):
+    self.max_bytes = max_bytes
+    self._evict()
+
+  def clear(self):
+    self._entries.clear()
+    self.size = 0
+
+  def _remove(self, key: Hashable):
+    self.size -= len(self._entries.pop(key).body)
+
+  def _evict(self):
+    while self.size > self.max_bytes:
+      _, entry = self._entries.popitem(last=False)
+      self.size -= len(entry.body)
+
+def _etag_matches(header: str | None, etag: str) -> bool:
+  if not header:
+    return False
+
+  tags = [tag.strip().removeprefix('W/') for tag in header.split(',')]
+  return '*' in tags or etag in tags
+
+async def cached_json_response(
+  cache: ResponseCache,
+  request: Request,
+  key: Hashable,
+  version: int,
+  closed: bool,
+  load: Callable[[], Awaitable[Any]],
+  extra_headers: Callable[[], dict[str, str]] | None = None
+) -> Response:
+  entry = cache.get(key, version)
+
+  if entry is None:
+    data = await load()
+
+    # loaders that build large payloads themselves can hand over encoded json.
+    body = data if isinstance(data, bytes) else json.dumps(jsonable_encoder(data), separators=(',', ':')).encode()
+
+    # headers that depend on the loaded data are cached with the body.
+    entry = cache.put(key, version, body, extra_headers() if extra_headers else None)
+
+  headers = {
+    **entry.headers,
+    'ETag': entry.etag,
+    'Cache-Control': CLOSED_CACHE_CONTROL if closed else REVALIDATE_CACHE_CONTROL
+  }
+
+  if _etag_matches(request.headers.get('if-none-match'), entry.etag):
+    return Response(status_code=304, headers=headers)
+
+  return Response(content=entry.body, media_type='application/json', headers=headers)
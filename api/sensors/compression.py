@@ -0,0 +1,120 @@
+from typing import Optional
+from api.db.database import STORE_ALL, STORE_RAW, STORE_ROLLUP
+
+# (ts, temperature, humidity, store), store tells the database which tables get the reading.
+Entry = tuple[int, float, float, int]
+
+class Compressor:
+  def __init__(self, temperature_band: float, humidity_band: float, max_gap: int):
+    self.bands = (temperature_band, humidity_band)
+    self.max_gap = max_gap
+    self.archived: Optional[tuple[int, float, float]] = None
+
+  def offer(self, ts: int, temperature: float, humidity: float) -> list[Entry]:
+    raise NotImplementedError
+
+  def flush(self) -> list[Entry]:
+    return []
+
+  def _archive(self, ts: int, temperature: float, humidity: float):
+    self.archived = (ts, temperature, humidity)
+
+  def _heartbeat_due(self, ts: int) -> bool:
+    # a stored point at least every max_gap seconds, so a flat series still shows the sensor is alive.
+    return self.archived is None or ts - self.archived[0] >= self.max_gap
+
+class Passthrough(Compressor):
+  def offer(self, ts: int, temperature: float, humidity: float) -> list[Entry]:
+    return [(ts, temperature, humidity, STORE_ALL)]
+
+class Deadband(Compressor):
+  def offer(self, ts: int, temperature: float, humidity: float) -> list[Entry]:
+    archived = self.archived
+
+    if (
+      archived is None
+      or self._heartbeat_due(ts)
+      or abs(temperature - archived[1]) > self.bands[0]
+      or abs(humidity - archived[2]) > self.bands[1]
+    ):
+      self._archive(ts, temperature, humidity)
+      return [(ts, temperature, humidity, STORE_ALL)]
+
+    # rollups still count every reading, only the raw row is dropped.
+    return [(ts, temperature, humidity, STORE_ROLLUP)]
+
+class SwingingDoor(Compressor):
+  def __init__(self, temperature_band: float, humidity_band: float, max_gap: int):
+    super().__init__(temperature_band, humidity_band, max_gap)
+    self.held: Optional[tuple[int, float, float]] = None
+    self.upper = [float('inf'), float('inf')]
+    self.lower = [float('-inf'), float('-inf')]
+
+  def offer(self, ts: int, temperature: float, humidity: float) -> list[Entry]:
+    if self._heartbeat_due(ts):
+      # the held point ends the current segment, restarting without it would cut a ramp short.
+      entries = self.flush()
+      self._restart(ts, temperature, humidity)
+      return entries + [(ts, temperature, humidity, STORE_ALL)]
+
+    entries: list[Entry] = []
+
+    if not self._fits(ts, (temperature, humidity)) and self.held is not None:
+      # the doors closed, the last point that still fitted becomes the next archived point.
+      held = self.held
+      entries.append((*held, STORE_RAW))
+
+      self._restart(*held)
+      self._fits(ts, (temperature, humidity))
+
+    self.held = (ts, temperature, humidity)
+    entries.append((ts, temperature, humidity, STORE_ROLLUP))
+
+    return entries
+
+  def flush(self) -> list[Entry]:
+    # the held point ends the last segment, without it a linear fill stops at the archived one.
+    held, self.held = self.held, None
+
+    if held is None or (self.archived is not None and held[0] == self.archived[0]):
+      return []
+
+    return [(*held, STORE_RAW)]
+
+  def _restart(self, ts: int, temperature: float, humidity: float):
+    self._archive(ts, temperature, humidity)
+    self.held = None
+    self.upper = [float('inf'), float('inf')]
+    self.lower = [float('-inf'), float('-inf')]
+
+  def _fits(self, ts: int, values: tuple[float, float]) -> bool:
+    archived = self.archived
+    assert archived is not None
+
+    elapsed = ts - archived[0]
+    if elapsed <= 0:
+      return True
+
+    fits = True
+
+    # each series has its own pair of doors, a point fits while every pair is still open.
+    for i, value in enumerate(values):
+      self.upper[i] = min(self.upper[i], (value + self.bands[i] - archived[i + 1]) / elapsed)
+      self.lower[i] = max(self.lower[i], (value - self.bands[i] - archived[i + 1]) / elapsed)
+
+      if self.lower[i] > self.upper[i]:
+        fits = False
+
+    return fits
+
+COMPRESSORS: dict[str, type[Compressor]] = {
+  'off': Passthrough,
+  'deadband': Deadband,
+  'swinging_door': SwingingDoor
+}
+
+def create_compressor(mode: str, temperature_band: float, humidity_band: float, max_gap: int) -> Compressor:
+  if mode not in COMPRESSORS:
+    raise Exception(f'Invalid compression mode "{mode}", use {", ".join(COMPRESSORS)}.')
+
+  return COMPRESSORS[mode](temperature_band, humidity_band, max_gap)
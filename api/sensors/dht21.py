@@ -3,10 +3,10 @@ from adafruit_dht import DHT21
 from api.sensors.sensor import Sensor
 
 class DHT21Sensor(Sensor):
-  def __init__(self):
-    self.sensor = DHT21(board.D4)
+  def __init__(self, pin: str = 'D4'):
+    self.sensor = DHT21(getattr(board, pin))
 
-  async def read(self) -> tuple[None, None] | tuple[float, float]:
+  def read_sync(self) -> tuple[None, None] | tuple[float, float]:
     temperature = self.sensor.temperature
     humidity = self.sensor.humidity
 
@@ -14,3 +14,6 @@ class DHT21Sensor(Sensor):
       return None, None
 
     return float(temperature), float(humidity)
+
+  def close(self):
+    self.sensor.exit()
@@ -0,0 +1,27 @@
+from api.models.sensor_config import SensorConfig
+from api.sensors.sensor import Sensor
+
+def create_sensor(cfg: SensorConfig) -> Sensor:
+  sensor = _create_driver(cfg)
+  sensor.read_timeout = cfg.read_timeout
+
+  return sensor
+
+def _create_driver(cfg: SensorConfig) -> Sensor:
+  pin = cfg.pin or 'D4'
+
+  # drivers are imported lazily, board/adafruit_dht only exist on the Pi.
+  if cfg.type == 'DHT11':
+    from api.sensors.dht11 import DHT11Sensor
+    return DHT11Sensor(pin)
+
+  if cfg.type == 'DHT21':
+    from api.sensors.dht21 import DHT21Sensor
+    return DHT21Sensor(pin)
+
+  if cfg.type == 'DHT22':
+    from api.sensors.dht22 import DHT22Sensor
+    return DHT22Sensor(pin)
+
+  from api.sensors.dummy import Dummy
+  return Dummy()
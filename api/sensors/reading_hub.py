@@ -0,0 +1,60 @@
+import asyncio
+import time
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+# a slow subscriber only ever misses old readings, it never blocks the poll loop.
+SUBSCRIBER_QUEUE_SIZE = 16
+
+class Reading:
+  def __init__(self, sensor_id: int, temperature: float, humidity: float, ts: int):
+    self.sensor_id = sensor_id
+    self.temperature = temperature
+    self.humidity = humidity
+    self.ts = ts
+    self.received = time.monotonic()
+
+  def age(self) -> float:
+    return time.monotonic() - self.received
+
+class ReadingHub:
+  def __init__(self):
+    self._latest: dict[int, Reading] = {}
+    self._subscribers: set[asyncio.Queue[Reading]] = set()
+
+  def latest(self, sensor_id: Optional[int], max_age: Optional[float] = None) -> Optional[Reading]:
+    if sensor_id is None:
+      reading = max(self._latest.values(), key=lambda latest: latest.ts, default=None)
+    else:
+      reading = self._latest.get(sensor_id)
+
+    if reading is None or (max_age is not None and reading.age() > max_age):
+      return None
+
+    return reading
+
+  def publish(self, reading: Reading):
+    self._latest[reading.sensor_id] = reading
+
+    for queue in self._subscribers:
+      if queue.full():
+        queue.get_nowait()
+
+      queue.put_nowait(reading)
+
+  def readings(self) -> list[Reading]:
+    return list(self._latest.values())
+
+  @contextmanager
+  def subscribe(self) -> Iterator[asyncio.Queue[Reading]]:
+    queue: asyncio.Queue[Reading] = asyncio.Queue(SUBSCRIBER_QUEUE_SIZE)
+    self._subscribers.add(queue)
+
+    try:
+      yield queue
+    finally:
+      self._subscribers.discard(queue)
+
+  @property
+  def subscriber_count(self) -> int:
+    return len(self._subscribers)
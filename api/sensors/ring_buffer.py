@@ -0,0 +1,57 @@
+import numpy as np
+
+class RingBuffer:
+  # the newest readings of one sensor in preallocated arrays, fixed point like the readings table.
+  def __init__(self, capacity: int):
+    self.capacity = max(1, capacity)
+    self.ts = np.zeros(self.capacity, dtype=np.int64)
+    self.values = np.zeros((self.capacity, 2), dtype=np.int32)
+    self.head = 0
+    self.size = 0
+
+    # every stored reading from this epoch on is in the buffer, None until it is filled.
+    self.since: int | None = None
+
+  @property
+  def stale(self) -> bool:
+    return self.since is None
+
+  def fill(self, since: int, rows: np.ndarray):
+    # rows are (ts, temperature, humidity) sorted by ts, as loaded by recent_readings_async.
+    kept = rows[-self.capacity:]
+
+    self.ts[:len(kept)] = kept[:, 0]
+    self.values[:len(kept)] = kept[:, 1:]
+    self.size = len(kept)
+    self.head = self.size % self.capacity
+    self.since = since if len(kept) == len(rows) else int(rows[-self.capacity - 1, 0]) + 1
+
+  def invalidate(self):
+    self.since = None
+
+  def append(self, ts: int, temperature: int, humidity: int):
+    # the table keeps the first reading of a second, so does the buffer, which also keeps it sorted.
+    if self.size and ts <= self.ts[(self.head - 1) % self.capacity]:
+      return
+
+    if self.size == self.capacity:
+      if self.since is not None:
+        self.since = max(self.since, int(self.ts[self.head]) + 1)
+    else:
+      self.size += 1
+
+    self.ts[self.head] = ts
+    self.values[self.head] = (temperature, humidity)
+    self.head = (self.head + 1) % self.capacity
+
+  def covers(self, start: int) -> bool:
+    return self.since is not None and start >= self.since
+
+  def window(self, start: int, end: int | None = None) -> tuple[np.ndarray, np.ndarray]:
+    order = (np.arange(self.size) + self.head - self.size) % self.capacity
+    ts = self.ts[order]
+
+    lo = np.searchsorted(ts, start)
+    hi = self.size if end is None else np.searchsorted(ts, end)
+
+    return ts[lo:hi], self.values[order[lo:hi]]
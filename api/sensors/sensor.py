@@ -1,3 +1,30 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+# hardware reads are blocking (bit-banged GPIO), so they never run on the event loop.
+executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='sensor')
+
 class Sensor:
-  async def read(self) -> tuple[None, None] | tuple[float, float]:
+  read_timeout: float = 5.0
+  _pending: Optional[asyncio.Future] = None
+
+  def read_sync(self) -> tuple[None, None] | tuple[float, float]:
     raise NotImplementedError
+
+  def close(self):
+    pass
+
+  async def read(self) -> tuple[None, None] | tuple[float, float]:
+    # a timed out read keeps running in its thread, never start a second one on the same pin.
+    if self._pending is not None and not self._pending.done():
+      raise RuntimeError('Previous sensor read is still in progress.')
+
+    loop = asyncio.get_running_loop()
+    self._pending = loop.run_in_executor(executor, self.read_sync)
+    self._pending.add_done_callback(lambda f: f.cancelled() or f.exception())
+
+    try:
+      return await asyncio.wait_for(asyncio.shield(self._pending), timeout=self.read_timeout)
+    except asyncio.TimeoutError:
+      raise RuntimeError(f'Sensor read timed out after {self.read_timeout} seconds.')
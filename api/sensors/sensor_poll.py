@@ -1,52 +1,214 @@
 import asyncio
-from datetime import datetime
-from api.db.database import Database
+import random
+import sqlite3
+import time
+from typing import Optional
+from api.db.database import STORE_RAW, Database
+from api.db.storage import to_fixed
+from api.sensors.compression import Compressor, create_compressor
+from api.metrics import poll_drift, sensor_read_duration, sensor_read_retries, sensor_reads
+from api.sensors.reading_hub import Reading, ReadingHub
+from api.sensors.ring_buffer import RingBuffer
 from api.sensors.sensor import Sensor
 
+# dht sensors need about two seconds between reads, backoff starts there.
+RETRY_BACKOFF_BASE = 2.0
+RETRY_BACKOFF_CAP = 30.0
+MAX_READ_RETRIES = 4
+
 class SensorPoll:
-  def __init__(self, sensor: Sensor):
+  def __init__(self, sensor_id: int, sensor: Sensor, interval: Optional[int] = None, read_limit: Optional[asyncio.Semaphore] = None, hub: Optional[ReadingHub] = None):
+    self.sensor_id = sensor_id
     self.sensor = sensor
+    self.interval = interval
+    self.read_limit = read_limit or asyncio.Semaphore(1)
+    self.hub = hub or ReadingHub()
+    self._inflight: Optional[asyncio.Future] = None
 
-  async def poll(self, db: Database):
-    while True:
-      # instantly skip if we don't want to use the sensor.
-      if not db.config.use_sensor:
-        continue
+    # the last recent_hours of stored readings, serves today and recent queries from memory.
+    self.recent: Optional[RingBuffer] = None
 
-      now = datetime.now()
-      date = now.strftime(db.config.dateformat)
-      time = now.strftime(db.config.timeformat)
+  async def read(self) -> tuple[None, None] | tuple[float, float]:
+    # shared between all polls, limits how many hardware reads run at once.
+    async with self.read_limit:
+      started = time.perf_counter()
+      result = 'failure'
 
       try:
         temp, humi = await self.sensor.read()
+        result = 'success' if temp is not None and humi is not None else 'failure'
 
-        # if reading fails -> retry
-        if not temp or not humi:
-          await asyncio.sleep(2)
-          continue
-
-        await db.insert_sensor_entry_async(temp, humi, date, time)
-        await asyncio.wait_for(
-          db.config.settings_changed.wait(),
-          timeout=db.config.sensor_interval
-        )
+        return temp, humi
       except RuntimeError as e:
-        await db.insert_log_entry_async(str(e), f'{date} {time}')
-        await asyncio.sleep(2)
-        continue
-      except asyncio.TimeoutError:
-        pass
+        result = 'timeout' if 'timed out' in str(e) else 'error'
+        raise
       finally:
-        db.config.settings_changed.clear()
+        sensor_read_duration.observe(time.perf_counter() - started, self.sensor_id)
+        sensor_reads.inc(self.sensor_id, result)
+
+  def next_tick(self, interval: float) -> tuple[float, int]:
+    # ticks are aligned to the wall clock (every 10 minutes on :00, :10, ...), but slept
+    # towards on the monotonic clock, so a wall clock step can't stretch or skip a sleep.
+    loop = asyncio.get_running_loop()
+    now = time.time()
+    tick = (int(now // interval) + 1) * interval
+
+    return loop.time() + (tick - now), int(tick)
+
+  async def read_with_retries(self, deadline: float) -> tuple[float, float]:
+    loop = asyncio.get_running_loop()
+    error: Optional[Exception] = None
+
+    for attempt in range(MAX_READ_RETRIES + 1):
+      if attempt > 0:
+        sensor_read_retries.inc(self.sensor_id)
+
+        delay = min(RETRY_BACKOFF_CAP, RETRY_BACKOFF_BASE * 2 ** (attempt - 1)) + random.uniform(0, RETRY_BACKOFF_BASE)
+
+        # a retry that would run into the next tick is left to that tick instead.
+        if loop.time() + delay >= deadline:
+          break
+
+        await asyncio.sleep(delay)
+
+      try:
+        temp, humi = await self.read()
+
+        if temp is not None and humi is not None:
+          return float(temp), float(humi)
+      except RuntimeError as e:
+        error = e
+
+    raise RuntimeError(str(error) if error else 'no reading after retries')
+
+  def create_compressor(self, db: Database) -> Compressor:
+    cfg = db.config
+    return create_compressor(cfg.compression, cfg.compression_temperature, cfg.compression_humidity, cfg.compression_max_gap)
+
+  async def store(self, db: Database, entries: list[tuple[int, float, float, int]]):
+    for ts, temp, humi, store in entries:
+      try:
+        await db.insert_sensor_entry_async(self.sensor_id, temp, humi, ts, store)
+      except Exception:
+        # the reading may or may not have made it into the write buffer, the ring is rebuilt
+        # from the table before the next reading is stored.
+        if self.recent is not None:
+          self.recent.invalidate()
+
+        raise
+
+      # only what gets a raw row, so memory and the readings table answer the same.
+      if store & STORE_RAW and self.recent is not None:
+        self.recent.append(ts, to_fixed(temp), to_fixed(humi))
+
+  async def prefill(self, db: Database):
+    hours = db.config.recent_hours
+
+    if hours <= 0:
+      db.recent.unregister(self.sensor_id, self.recent)
+      self.recent = None
+      return
+
+    interval = max(1, self.interval or db.config.sensor_interval)
+    capacity = hours * 3600 // interval + 1
+
+    if self.recent is None or self.recent.capacity != capacity:
+      self.recent = RingBuffer(capacity)
+      db.recent.register(self.sensor_id, self.recent)
+
+    # buffered readings are written first, the ring is rebuilt from the table alone.
+    await db.flush_async()
+
+    since = max(int(time.time()) - hours * 3600, db.compacted_until)
+    self.recent.fill(since, await db.recent_readings_async(self.sensor_id, since))
+
+  async def poll(self, db: Database):
+    loop = asyncio.get_running_loop()
+    compressor = self.create_compressor(db)
+    seen = db.config.settings_changed.generation
 
-  async def get_sensor_reading(self) -> tuple[float, float] | tuple[None, None]:
     try:
-      temp, humi = await self.sensor.read()
+      await self.prefill(db)
+
+      while True:
+        # sleep until settings change instead of spinning while the sensor is disabled.
+        while not db.config.use_sensor:
+          seen = await db.config.settings_changed.wait(seen)
+
+        interval = max(1, self.interval or db.config.sensor_interval)
+        scheduled, ts = self.next_tick(interval)
+
+        try:
+          seen = await asyncio.wait_for(db.config.settings_changed.wait(seen), timeout=scheduled - loop.time())
+
+          # woken early by a settings change, realign to the new interval and restart compression
+          # with the new bands, the held point of the old one is stored first.
+
+          try:
+            await self.store(db, compressor.flush())
+          except sqlite3.Error as e:
+            await self.log_error(db, f'database: {e}', ts)
+
+          compressor = self.create_compressor(db)
+
+          try:
+            await self.prefill(db)
+          except sqlite3.Error as e:
+            await self.log_error(db, f'database: {e}', ts)
+
+          continue
+        except asyncio.TimeoutError:
+          pass
+
+        poll_drift.observe(max(0.0, loop.time() - scheduled), self.sensor_id)
+
+        try:
+          # the reading is stored under its tick, so rows stay evenly spaced however long reads take.
+          temp, humi = await self.read_with_retries(scheduled + interval)
+
+          self.hub.publish(Reading(self.sensor_id, temp, humi, ts))
+
+          if self.recent is not None and self.recent.stale:
+            await self.prefill(db)
+
+          await self.store(db, compressor.offer(ts, temp, humi))
+        except RuntimeError as e:
+          await self.log_error(db, str(e), ts)
+        except sqlite3.Error as e:
+          # a failed flush keeps its readings buffered, polling goes on and the next flush retries.
+          await self.log_error(db, f'database: {e}', ts)
+    finally:
+      db.recent.unregister(self.sensor_id, self.recent)
+
+      # only buffers the held point, the flush on shutdown writes it.
+      await self.store(db, compressor.flush())
+
+  async def log_error(self, db: Database, message: str, ts: int):
+    print(f'sensor_poll(poll): sensor {self.sensor_id}: {message}')
+    await db.insert_log_entry_async(f'sensor {self.sensor_id}: {message}', 'error', ts)
+
+  async def get_sensor_reading(self, max_age: Optional[float] = None) -> Optional[Reading]:
+    reading = self.hub.latest(self.sensor_id, max_age)
+    if reading is not None:
+      return reading
+
+    # concurrent callers share a single hardware read.
+    if self._inflight is None or self._inflight.done():
+      self._inflight = asyncio.ensure_future(self._read_and_publish())
+
+    return await asyncio.shield(self._inflight)
+
+  async def _read_and_publish(self) -> Optional[Reading]:
+    try:
+      temp, humi = await self.read()
+
+      if temp is None or humi is None:
+        return None
 
-      if temp is not None and humi is not None:
-        return float(temp), float(humi)
+      reading = Reading(self.sensor_id, float(temp), float(humi), int(time.time()))
+      self.hub.publish(reading)
 
-      return None, None
+      return reading
     except RuntimeError as e:
       print(f'Error reading sensor: {e}')
-      return None, None
+      return None
@@ -0,0 +1,40 @@
+import asyncio
+from typing import Optional
+from api.db.database import Database
+
+class CompactionService:
+  def __init__(self):
+    self._task: Optional[asyncio.Task] = None
+
+  def is_running(self) -> bool:
+    return self._task is not None and not self._task.done()
+
+  def start(self, db: Database):
+    if self.is_running():
+      print('compaction_service(start): already running')
+      return
+
+    self._task = asyncio.create_task(self._run(db))
+    print('compaction_service(start): task created.')
+
+  async def stop(self):
+    if not self.is_running() or self._task is None:
+      print('compaction_service(stop): not running')
+      return
+
+    self._task.cancel()
+    await asyncio.gather(self._task, return_exceptions=True)
+    self._task = None
+
+    print('compaction_service(stop): task canceled.')
+
+  async def _run(self, db: Database):
+    while True:
+      try:
+        removed = await db.compact_async()
+        if removed:
+          print(f'compaction_service(run): removed {removed} expired rows.')
+      except Exception as e:
+        print(f'compaction_service(run): {e}')
+
+      await asyncio.sleep(max(60, db.config.compaction_interval))
@@ -0,0 +1,114 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from api.db.database import Database
+
+try:
+  import fcntl
+except ImportError:
+  # no flock on windows, thum only runs as a single process there.
+  fcntl = None
+
+SYNC_INTERVAL = 2
+
+@asynccontextmanager
+async def startup_lock(path: str) -> AsyncIterator[None]:
+  # workers start one at a time, so schema changes and migrations never race each other.
+  if fcntl is None:
+    yield
+    return
+
+  fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+
+  try:
+    await asyncio.to_thread(fcntl.flock, fd, fcntl.LOCK_EX)
+    yield
+  finally:
+    os.close(fd)
+
+class LeaderService:
+  def __init__(self, lock_path: str = ''):
+    # set from the database path at startup when not known up front.
+    self.lock_path = lock_path
+    self.is_leader = False
+    self._fd: Optional[int] = None
+    self._task: Optional[asyncio.Task] = None
+
+  def try_acquire(self) -> bool:
+    if self.is_leader:
+      return True
+
+    if fcntl is None:
+      self.is_leader = True
+      return True
+
+    fd = os.open(self.lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+
+    # the kernel drops the lock when its process dies, which is what lets a follower take over.
+    try:
+      fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except BlockingIOError:
+      os.close(fd)
+      return False
+
+    os.ftruncate(fd, 0)
+    os.write(fd, f'{os.getpid()}\n'.encode())
+
+    self._fd = fd
+    self.is_leader = True
+    return True
+
+  def release(self):
+    if self._fd is not None:
+      os.close(self._fd)
+      self._fd = None
+
+    self.is_leader = False
+
+  def start(
+    self,
+    db: Database,
+    on_promoted: Callable[[], Awaitable[None]],
+    on_data_changed: Callable[[], Awaitable[None]],
+    on_config_changed: Callable[[], Awaitable[None]]
+  ):
+    if self._task is not None and not self._task.done():
+      print('leader_service(start): already running')
+      return
+
+    self._task = asyncio.create_task(self._run(db, on_promoted, on_data_changed, on_config_changed))
+    print(f'leader_service(start): pid {os.getpid()} is {"leader" if self.is_leader else "follower"}.')
+
+  async def stop(self):
+    if self._task is not None:
+      self._task.cancel()
+      await asyncio.gather(self._task, return_exceptions=True)
+      self._task = None
+
+    self.release()
+
+  async def _run(
+    self,
+    db: Database,
+    on_promoted: Callable[[], Awaitable[None]],
+    on_data_changed: Callable[[], Awaitable[None]],
+    on_config_changed: Callable[[], Awaitable[None]]
+  ):
+    while True:
+      await asyncio.sleep(SYNC_INTERVAL)
+
+      try:
+        if not self.is_leader and self.try_acquire():
+          print(f'leader_service(run): pid {os.getpid()} took over as leader.')
+          await on_promoted()
+
+        data_changed, config_changed = await db.sync_async()
+
+        if config_changed:
+          await on_config_changed()
+
+        if data_changed:
+          await on_data_changed()
+      except Exception as e:
+        print(f'leader_service(run): {e}')
@@ -1,56 +1,76 @@
 import asyncio
-import sys
 from typing import Optional
 from api.db.database import Database
-from api.sensors.sensor import Sensor
+from api.models.sensor_config import SensorConfig
+from api.sensors.factory import create_sensor
+from api.sensors.reading_hub import ReadingHub
 from api.sensors.sensor_poll import SensorPoll
 
 class SensorService:
   def __init__(self):
-    self._task: Optional[asyncio.Task] = None
-    self.sensor_poll: Optional[SensorPoll] = None
+    self._tasks: dict[int, asyncio.Task] = {}
+    self.sensor_polls: dict[int, SensorPoll] = {}
+    self.hub = ReadingHub()
 
   def is_running(self) -> bool:
-    return self._task is not None and not self._task.done()
+    return any(not task.done() for task in self._tasks.values())
 
-  def init_sensor(self):
-    sensor: Sensor
+  def get_sensor_poll(self, sensor_id: Optional[int] = None) -> Optional[SensorPoll]:
+    if sensor_id is None:
+      return next(iter(self.sensor_polls.values()), None)
 
-    # TODO: impl DHT21, DHT22
-    if sys.platform.startswith("linux"):
-      from api.sensors.dht11 import DHT11Sensor
-      sensor = DHT11Sensor()
-    else:
-      from api.sensors.dummy import Dummy
-      sensor = Dummy()
+    return self.sensor_polls.get(sensor_id)
 
-    self.sensor_poll = SensorPoll(sensor)
-    print(f'sensor_service(init_sensor): sensor "{sensor.__class__.__name__}" initialized.')
+  def init_sensors(self, sensors: list[SensorConfig], max_concurrent_reads: int):
+    for sensor_poll in self.sensor_polls.values():
+      sensor_poll.sensor.close()
+
+    self.sensor_polls = {}
+    read_limit = asyncio.Semaphore(max(1, max_concurrent_reads))
+
+    for cfg in sensors:
+      if not cfg.enabled or cfg.id is None:
+        continue
+
+      try:
+        sensor = create_sensor(cfg)
+      except Exception as e:
+        print(f'sensor_service(init_sensors): sensor "{cfg.name}" failed: {e}')
+        continue
+
+      self.sensor_polls[cfg.id] = SensorPoll(cfg.id, sensor, cfg.interval, read_limit, self.hub)
+      print(f'sensor_service(init_sensors): sensor "{cfg.name}" ({sensor.__class__.__name__}) initialized.')
 
   def start(self, db: Database):
     if self.is_running():
       print('sensor_service(start): already running')
       return
 
-    if not self.sensor_poll:
-      print('sensor_service(start): sensor_poll is None.')
+    if not self.sensor_polls:
+      print('sensor_service(start): no sensors.')
       return
 
-    self._task = asyncio.create_task(self.sensor_poll.poll(db))
-    print('sensor_service(start): task created.')
+    for sensor_id, sensor_poll in self.sensor_polls.items():
+      self._tasks[sensor_id] = asyncio.create_task(sensor_poll.poll(db))
+
+    print(f'sensor_service(start): {len(self._tasks)} task(s) created.')
 
   async def stop(self):
     if not self.is_running():
       print('sensor_service(stop): not running')
       return
 
-    if self._task is not None:
-      self._task.cancel()
-      print('sensor_service(stop): task canceled.')
+    for task in self._tasks.values():
+      task.cancel()
 
-      try:
-        await self._task
-      except asyncio.CancelledError:
-        pass
-      finally:
-        self._task = None
+    print('sensor_service(stop): tasks canceled.')
+
+    await asyncio.gather(*self._tasks.values(), return_exceptions=True)
+    self._tasks = {}
+
+  async def reload(self, db: Database):
+    await self.stop()
+    self.init_sensors(await db.sensors_async(), db.config.max_concurrent_reads)
+
+    if db.config.use_sensor:
+      self.start(db)
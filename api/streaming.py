@@ -0,0 +1,94 @@
+import asyncio
+import json
+import shutil
+import zlib
+from typing import AsyncIterator, Iterable
+from aiosqlite import Row
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel
+from api.db.pagination import Page
+
+NDJSON_BATCH_SIZE = 500
+GZIP_CHUNK_SIZE = 1024 * 1024
+
+async def _aiter(rows: Iterable) -> AsyncIterator:
+  for row in rows:
+    yield row
+
+def _to_dict(row: Row | BaseModel) -> dict:
+  if isinstance(row, BaseModel):
+    return row.model_dump()
+
+  return dict(row)
+
+async def ndjson_response(rows: AsyncIterator[Row] | Iterable[BaseModel], page: Page | None = None) -> StreamingResponse:
+  if page is not None and isinstance(rows, AsyncIterator):
+    # a page is bounded by its limit, reading it up front lets the next cursor go in a header.
+    rows = [row async for row in rows]
+
+  if not isinstance(rows, AsyncIterator):
+    rows = _aiter(rows)
+
+  # pulls the first row before the response starts, so query errors still become a 400.
+  first = await anext(rows, None)
+
+  async def _body() -> AsyncIterator[str]:
+    if first is None:
+      return
+
+    batch = [json.dumps(_to_dict(first))]
+
+    async for row in rows:
+      batch.append(json.dumps(_to_dict(row)))
+
+      if len(batch) >= NDJSON_BATCH_SIZE:
+        yield '\n'.join(batch) + '\n'
+        batch = []
+
+    yield '\n'.join(batch) + '\n'
+
+  return StreamingResponse(_body(), media_type='application/x-ndjson', headers=page.headers() if page else None)
+
+async def _sse_body(events: AsyncIterator[BaseModel | None]) -> AsyncIterator[str]:
+  async for event in events:
+    # None is a keep-alive, it stops proxies from closing an idle stream.
+    if event is None:
+      yield ': keep-alive\n\n'
+    else:
+      yield f'data: {event.model_dump_json()}\n\n'
+
+def sse_response(events: AsyncIterator[BaseModel | None]) -> StreamingResponse:
+  return StreamingResponse(
+    _sse_body(events),
+    media_type='text/event-stream',
+    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+  )
+
+def _gzip_chunk(compressor, file) -> tuple[bytes, bool]:
+  chunk = file.read(GZIP_CHUNK_SIZE)
+  if not chunk:
+    return compressor.flush(), True
+
+  return compressor.compress(chunk), False
+
+async def _gzip_body(path: str, cleanup: str) -> AsyncIterator[bytes]:
+  # wbits=31 writes a gzip header, compression runs off the event loop.
+  compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+
+  try:
+    with open(path, 'rb') as file:
+      done = False
+
+      while not done:
+        data, done = await asyncio.to_thread(_gzip_chunk, compressor, file)
+        if data:
+          yield data
+  finally:
+    shutil.rmtree(cleanup, ignore_errors=True)
+
+def gzip_file_response(path: str, filename: str, cleanup: str) -> StreamingResponse:
+  return StreamingResponse(
+    _gzip_body(path, cleanup),
+    media_type='application/gzip',
+    headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+  )
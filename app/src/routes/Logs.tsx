@@ -7,12 +7,14 @@ import CenteredSpinnyLoader from "@/components/CenteredSpinnyLoader";
 export default function Logs() {
   const [logs, setLogs] = useState<ILogEntry[]>([]);
   const [logsLoaded, setLogsLoaded] = useState(false);
+  const [hasMore, setHasMore] = useState(false);
   const { successNotification, errorNotification } = useNotification();
 
   useEffect(() => {
     ApiService.logs()
       .then((resp) => {
         setLogs(resp);
+        setHasMore(resp.length > 0);
         setLogsLoaded(true);
       })
       .catch((error) => {
@@ -21,13 +23,25 @@ export default function Logs() {
       });
   }, [errorNotification]);
 
+  const loadMore = () => {
+    ApiService.logs(logs[logs.length - 1].id)
+      .then((resp) => {
+        setLogs((prev) => [...prev, ...resp]);
+        setHasMore(resp.length > 0);
+      })
+      .catch((error) => {
+        errorNotification("Failed to fetch data from API.");
+        console.error(error);
+      });
+  };
+
   const removeLog = (log: ILogEntry) => {
-    ApiService.deleteLog(log.timestamp)
+    ApiService.deleteLog(log.id)
       .then((resp) => {
         if (resp.count > 0) {
           successNotification("Log removed", "Log was successfully removed!");
 
-          setLogs((prev) => prev.filter((l) => l.timestamp !== log.timestamp));
+          setLogs((prev) => prev.filter((l) => l.id !== log.id));
         }
       })
       .catch((error) => {
@@ -81,7 +95,9 @@ export default function Logs() {
             <thead>
               <tr>
                 <th scope="col">#</th>
+                <th scope="col">Level</th>
                 <th scope="col">Message</th>
+                <th scope="col">Count</th>
                 <th scope="col">Timestamp</th>
                 <th scope="col">Remove</th>
               </tr>
@@ -89,9 +105,11 @@ export default function Logs() {
             <tbody>
               {logs.map((log, index) => {
                 return (
-                  <tr key={index}>
+                  <tr key={log.id}>
                     <th scope="row">{index}</th>
+                    <td>{log.level}</td>
                     <td>{log.message}</td>
+                    <td>{log.count}</td>
                     <td>{log.timestamp}</td>
                     <td>
                       <button
@@ -109,6 +127,15 @@ export default function Logs() {
         ) : (
           <p className="text-center">No logs :)</p>
         )}
+
+        {logsAvailable && hasMore && (
+          <button
+            className="btn btn-outline-primary d-block mx-auto mb-3"
+            onClick={loadMore}
+          >
+            Load more
+          </button>
+        )}
       </div>
     </div>
   );
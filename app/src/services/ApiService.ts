@@ -96,8 +96,9 @@ export default class ApiService {
     return await response.json();
   }
 
-  static async logs(): Promise<ILogEntry[]> {
-    const response = await fetch(`${this.baseURL}/logs`);
+  static async logs(before?: number): Promise<ILogEntry[]> {
+    const query = before === undefined ? "" : `?before=${before}`;
+    const response = await fetch(`${this.baseURL}/logs${query}`);
 
     if (!response.ok) {
       throw new Error(`Error fetching logs: ${response.statusText}`);
@@ -116,8 +117,8 @@ export default class ApiService {
     return await response.json();
   }
 
-  static async deleteLog(timestamp: string): Promise<{ count: number }> {
-    const response = await fetch(`${this.baseURL}/logs/${timestamp}`, {
+  static async deleteLog(id: number): Promise<{ count: number }> {
+    const response = await fetch(`${this.baseURL}/logs/${id}`, {
       method: "DELETE",
     });
 
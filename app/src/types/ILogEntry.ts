@@ -1,4 +1,8 @@
 export interface ILogEntry {
+  id: number;
+  level: string;
   message: string;
   timestamp: string;
+  first_timestamp: string;
+  count: number;
 }
@@ -0,0 +1,51 @@
+import json
+import platform
+import resource
+import sqlite3
+import sys
+from typing import Any
+
+def percentile(samples: list[float], p: float) -> float:
+  if not samples:
+    return 0.0
+
+  ordered = sorted(samples)
+  index = (len(ordered) - 1) * p / 100
+  low = int(index)
+  high = min(low + 1, len(ordered) - 1)
+
+  return ordered[low] + (ordered[high] - ordered[low]) * (index - low)
+
+def summarize(samples: list[float]) -> dict[str, float]:
+  return {
+    'count': len(samples),
+    'p50_ms': round(percentile(samples, 50) * 1000, 3),
+    'p95_ms': round(percentile(samples, 95) * 1000, 3),
+    'p99_ms': round(percentile(samples, 99) * 1000, 3),
+    'max_ms': round(max(samples, default=0) * 1000, 3)
+  }
+
+def peak_rss_kb() -> int:
+  peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+  # ru_maxrss is reported in bytes on macOS and in kilobytes everywhere else.
+  return peak // 1024 if sys.platform == 'darwin' else peak
+
+def emit(name: str, params: dict[str, Any], results: Any, out: str | None):
+  report = {
+    'benchmark': name,
+    'python': platform.python_version(),
+    'sqlite': sqlite3.sqlite_version,
+    'machine': platform.machine(),
+    'params': params,
+    'results': results,
+    'peak_rss_kb': peak_rss_kb()
+  }
+
+  text = json.dumps(report, indent=2)
+
+  if out:
+    with open(out, 'w') as file:
+      file.write(text + '\n')
+  else:
+    print(text)
@@ -0,0 +1,99 @@
+import argparse
+import os
+import time
+from datetime import date, timedelta
+from fastapi.testclient import TestClient
+from bench.common import emit, peak_rss_kb, summarize
+
+def endpoints(first: date, last: date) -> list[str]:
+  middle = first + (last - first) / 2
+  week = middle.isocalendar()
+  month_ago = max(first, last - timedelta(days=30))
+
+  return [
+    '/api/sensor/all',
+    f'/api/sensor/monthly/{middle.year}/{middle.month}',
+    f'/api/sensor/weekly/{week.year}-W{week.week:02d}',
+    f'/api/sensor/daily/{last.day}/{last.month}/{last.year}',
+    f'/api/sensor/daily/{middle.day}/{middle.month}/{middle.year}',
+    f'/api/sensor/range/{month_ago}/{last}',
+    f'/api/sensor/range/{first}/{last}',
+    f'/api/sensor/range/{first}/{last}?points=1000',
+    f'/api/sensor/daily/{last.day}/{last.month}/{last.year}?points=500',
+    '/api/sensor/all?format=ndjson',
+    '/api/sensor/current',
+    '/api/sensors',
+    '/api/daterange',
+    '/api/statistics',
+    '/api/logs',
+    '/api/config'
+  ]
+
+def run(path: str, repeat: int, cache: bool, dump: bool) -> list[dict]:
+  import api.main as main
+
+  # the app creates its database at import time, point it at the benchmark file before startup.
+  main.db.dbfile = path
+
+  results = []
+
+  with TestClient(main.app) as client:
+    if not cache:
+      main.response_cache.resize(0)
+
+    first_ts, last_ts = client.portal.call(_bounds, main.db)
+    urls = endpoints(date.fromtimestamp(first_ts), date.fromtimestamp(last_ts))
+
+    if dump:
+      urls.append('/api/dump')
+
+    for url in urls:
+      samples: list[float] = []
+      status = 0
+      size = 0
+
+      for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        samples.append(time.perf_counter() - started)
+
+        status = response.status_code
+        size = len(response.content)
+
+      results.append({
+        'url': url,
+        'status': status,
+        'bytes': size,
+        'first_ms': round(samples[0] * 1000, 3),
+        **summarize(samples),
+        'peak_rss_kb': peak_rss_kb()
+      })
+
+  return results
+
+async def _bounds(db) -> tuple[int, int]:
+  async with db.readers.acquire() as ctx, ctx.execute('SELECT MIN(day_ts), MAX(day_ts) FROM readings_daily;') as cursor:
+    row = await cursor.fetchone()
+
+    if row is None or row[0] is None:
+      raise SystemExit('database has no readings, run python -m bench.generate first.')
+
+    return row[0], row[1]
+
+def main():
+  parser = argparse.ArgumentParser(description='Measure latency of every API endpoint in-process.')
+  parser.add_argument('--db', default='bench.db')
+  parser.add_argument('--repeat', type=int, default=20)
+  parser.add_argument('--no-cache', action='store_true', help='disable the response cache')
+  parser.add_argument('--dump', action='store_true', help='include /api/dump')
+  parser.add_argument('--out', help='write the JSON report here instead of stdout')
+  args = parser.parse_args()
+
+  if not os.path.exists(args.db):
+    raise SystemExit(f'{args.db} does not exist, run python -m bench.generate first.')
+
+  params = {'db': args.db, 'repeat': args.repeat, 'cache': not args.no_cache, 'dump': args.dump}
+  emit('endpoints', params, run(os.path.abspath(args.db), args.repeat, not args.no_cache, args.dump), args.out)
+
+if __name__ == '__main__':
+  main()
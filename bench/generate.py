@@ -0,0 +1,114 @@
+import argparse
+import asyncio
+import math
+import os
+import random
+import time
+from api.db.database import Database
+from bench.common import emit
+from api.db.storage import to_fixed
+from api.models.sensor_config import SensorConfig
+
+BATCH_SIZE = 50000
+RAW_RETENTION_DAYS = 30
+AGGREGATE_RETENTION_DAYS = 365
+
+def reading(ts: int, sensor_id: int, rng: random.Random) -> tuple[float, float]:
+  day_of_year = time.localtime(ts).tm_yday
+  hour = (ts % 86400) / 3600
+
+  # seasonal swing peaking mid july, daily swing peaking mid afternoon.
+  seasonal = -math.cos(2 * math.pi * (day_of_year - 15) / 365)
+  diurnal = -math.cos(2 * math.pi * (hour - 3) / 24)
+
+  temperature = 21 + sensor_id + 3 * seasonal + 1.5 * diurnal + rng.gauss(0, 0.2)
+  humidity = 45 - 8 * seasonal - 6 * diurnal + rng.gauss(0, 1)
+
+  return round(temperature, 1), round(min(100, max(0, humidity)), 1)
+
+async def generate(path: str, years: float, interval: int, sensors: int, seed: int, compact: bool) -> dict:
+  if os.path.exists(path):
+    raise SystemExit(f'{path} already exists.')
+
+  rng = random.Random(seed)
+  db = Database(path)
+
+  await db.init_database_async()
+  await db.configure_async()
+
+  for sensor_id in range(1, sensors + 1):
+    cfg = SensorConfig(id=sensor_id, name=f'bench-{sensor_id}', type='Dummy')
+
+    if sensor_id == 1:
+      await db.update_sensor_async(sensor_id, cfg)
+    else:
+      await db.insert_sensor_async(cfg)
+
+  end = int(time.time()) // interval * interval
+  start = end - int(years * 365 * 86400)
+  started = time.perf_counter()
+  rows = 0
+  batch: list[tuple[int, int, int, int]] = []
+
+  # raw rows go straight into readings, rollups and statistics are rebuilt afterwards.
+  for ts in range(start, end, interval):
+    for sensor_id in range(1, sensors + 1):
+      temperature, humidity = reading(ts, sensor_id, rng)
+      batch.append((sensor_id, ts, to_fixed(temperature), to_fixed(humidity)))
+
+    if len(batch) >= BATCH_SIZE:
+      await db.ctx.executemany('INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?);', batch)
+      await db.ctx.commit()
+      rows += len(batch)
+      batch = []
+
+  if batch:
+    await db.ctx.executemany('INSERT OR IGNORE INTO readings VALUES (?, ?, ?, ?);', batch)
+    await db.ctx.commit()
+    rows += len(batch)
+
+  await db.rebuild_rollups_async()
+  await db.rebuild_statistics_async()
+
+  # leaves the file in the same shape a long running install with retention enabled would have.
+  if compact:
+    await db.update_config_async(db.config.model_copy(update={
+      'raw_retention_days': RAW_RETENTION_DAYS,
+      'aggregate_retention_days': AGGREGATE_RETENTION_DAYS
+    }))
+    await db.configure_async()
+    await db.compact_async()
+
+  await db.shutdown_async()
+
+  return {
+    'rows': rows,
+    'seconds': round(time.perf_counter() - started, 3),
+    'size_bytes': os.path.getsize(path)
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description='Fill a thum database with synthetic readings.')
+  parser.add_argument('--db', default='bench.db')
+  parser.add_argument('--years', type=float, default=1)
+  parser.add_argument('--interval', type=int, default=600, help='seconds between readings')
+  parser.add_argument('--sensors', type=int, default=1)
+  parser.add_argument('--seed', type=int, default=1)
+  parser.add_argument('--no-compact', action='store_true', help='keep every raw reading')
+  parser.add_argument('--out', help='write the JSON report here instead of stdout')
+  args = parser.parse_args()
+
+  params = {
+    'db': args.db,
+    'years': args.years,
+    'interval': args.interval,
+    'sensors': args.sensors,
+    'seed': args.seed,
+    'compact': not args.no_compact
+  }
+
+  results = asyncio.run(generate(args.db, args.years, args.interval, args.sensors, args.seed, not args.no_compact))
+  emit('generate', params, results, args.out)
+
+if __name__ == '__main__':
+  main()
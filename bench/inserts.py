@@ -0,0 +1,54 @@
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from api.db.database import Database
+from bench.common import emit, summarize
+
+async def run(rows: int, buffer_size: int, sensors: int) -> dict:
+  with tempfile.TemporaryDirectory() as directory:
+    db = Database(os.path.join(directory, 'thum.db'))
+
+    await db.init_database_async()
+    await db.configure_async()
+
+    db.config.write_buffer_size = buffer_size
+    db.config.write_buffer_max_age = 3600
+
+    start = int(time.time()) - rows
+    latencies: list[float] = []
+    started = time.perf_counter()
+
+    # the same call the poll loop makes, including the flushes it triggers.
+    for i in range(rows):
+      call = time.perf_counter()
+      await db.insert_sensor_entry_async(i % sensors + 1, 20 + (i % 100) / 10, 40 + (i % 50) / 10, start + i)
+      latencies.append(time.perf_counter() - call)
+
+    await db.flush_async()
+    elapsed = time.perf_counter() - started
+
+    await db.shutdown_async()
+
+  return {
+    'rows': rows,
+    'write_buffer_size': buffer_size,
+    'seconds': round(elapsed, 3),
+    'rows_per_second': round(rows / elapsed, 1),
+    'insert_call': summarize(latencies)
+  }
+
+def main():
+  parser = argparse.ArgumentParser(description='Measure insert_sensor_entry_async throughput.')
+  parser.add_argument('--rows', type=int, default=5000)
+  parser.add_argument('--sensors', type=int, default=1)
+  parser.add_argument('--buffer-sizes', type=int, nargs='+', default=[1, 10, 100, 1000])
+  parser.add_argument('--out', help='write the JSON report here instead of stdout')
+  args = parser.parse_args()
+
+  results = [asyncio.run(run(args.rows, size, args.sensors)) for size in args.buffer_sizes]
+  emit('inserts', {'rows': args.rows, 'sensors': args.sensors, 'buffer_sizes': args.buffer_sizes}, results, args.out)
+
+if __name__ == '__main__':
+  main()
@@ -0,0 +1,31 @@
+import asyncio
+import pytest
+from api.db.database import Database
+
+async def open_database(path: str) -> Database:
+  # same startup sequence as the lifespan in api.main.
+  db = Database(path)
+  await db.init_database_async()
+  await db.configure_async()
+  await db.migrate_async()
+  await db.backfill_async()
+  return db
+
+def count(run, db, table: str) -> int:
+  async def _count():
+    async with db.ctx.execute(f'SELECT COUNT(*) FROM {table};') as cursor:
+      return (await cursor.fetchone())[0]
+
+  return run(_count())
+
+@pytest.fixture
+def run():
+  loop = asyncio.new_event_loop()
+  yield loop.run_until_complete
+  loop.close()
+
+@pytest.fixture
+def db(tmp_path, run):
+  database = run(open_database(str(tmp_path / 'thum.db')))
+  yield database
+  run(database.shutdown_async())
@@ -0,0 +1,64 @@
+import json
+import numpy as np
+import pytest
+from api.db import analytics
+
+def fahrenheit(celsius):
+  return np.asarray(celsius) * 9 / 5 + 32
+
+def celsius(fahrenheit):
+  return (np.asarray(fahrenheit, dtype=np.float64) - 32) * 5 / 9
+
+def test_dew_point():
+  # reference values from psychrometric tables.
+  temperature = np.array([20.0, 30.0, 10.0, 25.0])
+  humidity = np.array([50.0, 100.0, 80.0, 60.0])
+
+  assert analytics.dew_point(temperature, humidity) == pytest.approx([9.3, 30.0, 6.7, 16.7], abs=0.1)
+
+def test_absolute_humidity():
+  temperature = np.array([20.0, 30.0, 0.0])
+  humidity = np.array([50.0, 100.0, 100.0])
+
+  assert analytics.absolute_humidity(temperature, humidity) == pytest.approx([8.65, 30.4, 4.85], rel=0.01)
+
+def test_heat_index_matches_nws_table():
+  # (°F, %RH) -> heat index in °F from the national weather service chart.
+  table = [((80, 40), 80), ((90, 70), 106), ((96, 50), 108), ((86, 90), 105), ((100, 10), 95)]
+  temperature = celsius([t for (t, _), _ in table])
+  humidity = np.array([rh for (_, rh), _ in table], dtype=np.float64)
+
+  assert fahrenheit(analytics.heat_index(temperature, humidity)) == pytest.approx([hi for _, hi in table], abs=1.5)
+
+def test_heat_index_below_80f_uses_simple_formula():
+  assert fahrenheit(analytics.heat_index(np.array([20.0]), np.array([50.0]))) == pytest.approx([66.85])
+
+def test_dew_point_of_dry_air_is_not_a_number():
+  values = analytics.derived(np.array([[0, 20.0, 0.0]]))
+
+  assert np.isneginf(values['dew_point'][0]) or np.isnan(values['dew_point'][0])
+  assert json.loads(analytics.encode(values))['dew_point'] == [None]
+
+def test_rolling_window_is_time_based():
+  ts = np.array([0, 60, 120, 1000, 1060])
+  values = np.array([1.0, 2.0, 3.0, 10.0, 20.0])
+  result = analytics.rolling(ts, values, 120)
+
+  # (ts - 120, ts], the gap before 1000 empties the window instead of averaging across it.
+  assert result['count'].tolist() == [1, 2, 2, 1, 2]
+  assert result['mean'] == pytest.approx([1.0, 1.5, 2.5, 10.0, 15.0])
+  assert result['std'] == pytest.approx([0.0, 0.5, 0.5, 0.0, 5.0])
+
+def test_histogram():
+  values = np.array([1.0, 2.0, 2.0, 3.0, 4.0, np.nan])
+  result = analytics.histogram(values, 3)
+
+  assert result['counts'].tolist() == [1, 2, 2]
+  assert result['edges'].tolist() == [1.0, 2.0, 3.0, 4.0]
+  assert result['percentiles']['p50'] == 2.0
+
+  assert analytics.histogram(np.array([np.nan]), 10)['percentiles'] == {}
+
+def test_unknown_metric():
+  with pytest.raises(Exception, match='Unsupported metric'):
+    analytics.metric(np.zeros((1, 3)), 'wind_chill')
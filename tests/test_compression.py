@@ -0,0 +1,109 @@
+import pytest
+from datetime import datetime
+from api.db.database import STORE_ALL, STORE_RAW, STORE_ROLLUP
+from api.sensors.compression import Deadband, Passthrough, SwingingDoor, create_compressor
+
+def stored(entries):
+  return [entry[:3] for entry in entries if entry[3] & STORE_RAW]
+
+def counted(entries):
+  return [entry[:3] for entry in entries if entry[3] & STORE_ROLLUP]
+
+def feed(compressor, points):
+  entries = []
+
+  for point in points:
+    entries += compressor.offer(*point)
+
+  return entries + compressor.flush()
+
+def test_passthrough_stores_everything():
+  points = [(i * 60, 20.0, 40.0) for i in range(5)]
+  entries = feed(Passthrough(0.5, 1.0, 3600), points)
+
+  assert stored(entries) == points
+  assert counted(entries) == points
+
+def test_deadband_drops_small_changes():
+  points = [(0, 20.0, 40.0), (60, 20.2, 40.5), (120, 20.4, 40.0), (180, 21.0, 40.0), (240, 21.1, 42.0)]
+  entries = feed(Deadband(0.5, 1.0, 3600), points)
+
+  assert stored(entries) == [(0, 20.0, 40.0), (180, 21.0, 40.0), (240, 21.1, 42.0)]
+  assert counted(entries) == points
+
+def test_deadband_heartbeat_on_flat_series():
+  points = [(i * 600, 20.0, 40.0) for i in range(13)]
+  entries = feed(Deadband(0.5, 1.0, 3600), points)
+
+  assert [ts for ts, _, _ in stored(entries)] == [0, 3600, 7200]
+
+def test_swinging_door_keeps_segment_ends():
+  # a ramp up and back down, only the corners are needed to rebuild it within the band.
+  points = [(i * 60, 20.0 + i * 0.1, 40.0) for i in range(11)]
+  points += [(600 + i * 60, 21.0 - i * 0.1, 40.0) for i in range(1, 11)]
+  entries = feed(SwingingDoor(0.05, 1.0, 86400), points)
+
+  assert stored(entries) == [points[0], points[10], points[-1]]
+  assert counted(entries) == points
+
+def test_swinging_door_heartbeat_keeps_held_point():
+  # the ramp is still open when the heartbeat is due, its last point must not be lost.
+  points = [(i * 600, 20.0 + i * 0.1, 40.0) for i in range(6)]
+  compressor = SwingingDoor(0.05, 1.0, 3600)
+  entries = []
+
+  for point in points:
+    entries += compressor.offer(*point)
+
+  assert stored(entries) == [points[0]]
+
+  entries += compressor.offer(3600, 20.6, 40.0)
+
+  assert stored(entries) == [points[0], points[-1], (3600, 20.6, 40.0)]
+  assert [entry[3] for entry in entries[-2:]] == [STORE_RAW, STORE_ALL]
+  assert counted(entries) == points + [(3600, 20.6, 40.0)]
+
+def test_swinging_door_heartbeat_without_held_point():
+  compressor = SwingingDoor(0.05, 1.0, 3600)
+
+  assert compressor.offer(0, 20.0, 40.0) == [(0, 20.0, 40.0, STORE_ALL)]
+  assert compressor.offer(3600, 20.0, 40.0) == [(3600, 20.0, 40.0, STORE_ALL)]
+
+def test_unknown_compression_mode():
+  with pytest.raises(Exception, match='gzip'):
+    create_compressor('gzip', 0.5, 1.0, 3600)
+
+def test_rebuild_keeps_compressed_aggregates(run, db):
+  start = int(datetime(2024, 3, 10, 12).timestamp())
+  compressor = Deadband(0.5, 1.0, 86400)
+  db.config.write_buffer_size = 100
+
+  for i, temperature in enumerate([20.0, 19.8, 20.1, 19.7, 20.0]):
+    for ts, temp, humi, store in compressor.offer(start + i * 600, temperature, 40.0):
+      run(db.insert_sensor_entry_async(1, temp, humi, ts, store))
+
+  # a day after the compressed one, its rollups can still be recounted from the raw rows.
+  later = start + 2 * 86400
+  run(db.insert_sensor_entry_async(1, 22.0, 50.0, later))
+  run(db.flush_async())
+
+  async def corrupt():
+    await db.ctx.execute('UPDATE readings_hourly SET count = 7 WHERE hour_ts >= ?;', [later - 3600])
+    await db.ctx.commit()
+
+  run(corrupt())
+  run(db.rebuild_rollups_async())
+  run(db.rebuild_statistics_async())
+
+  stats = run(db.statistics_async(1))
+  assert stats.total_entries == 6
+  assert (stats.min_temperature.value, stats.min_temperature.date) == (19.7, '2024-03-10')
+
+  async def hourly_counts():
+    async with db.ctx.execute('SELECT SUM(count) FROM readings_hourly WHERE hour_ts < ?;', [later - 3600]) as cursor:
+      compressed = (await cursor.fetchone())[0]
+
+    async with db.ctx.execute('SELECT SUM(count) FROM readings_hourly WHERE hour_ts >= ?;', [later - 3600]) as cursor:
+      return compressed, (await cursor.fetchone())[0]
+
+  assert run(hourly_counts()) == (5, 1)
@@ -0,0 +1,40 @@
+import asyncio
+import pytest
+
+def test_configure_waits_for_open_transaction(run, db):
+  async def scenario():
+    async with db._write_lock:
+      # a flush or compaction day in progress on the shared writer.
+      await db.ctx.execute('INSERT INTO readings (sensor_id, ts, temperature, humidity) VALUES (1, 1700000000, 2150, 4000);')
+      configure = asyncio.create_task(db.configure_async())
+      await asyncio.sleep(0.05)
+      assert not configure.done()
+      await db.ctx.commit()
+
+    await configure
+
+  run(scenario())
+
+def test_update_config_with_concurrent_flush(run, db):
+  async def scenario():
+    db.config.write_buffer_size = 1
+    cfg = db.config.model_copy(update={'use_sensor': True, 'db_synchronous': 'FULL'})
+
+    flushes = [db.insert_sensor_entry_async(1, 20 + i / 10, 40.0, 1700000000 + i) for i in range(20)]
+    await asyncio.gather(db.update_config_async(cfg), *flushes)
+    await db.configure_async()
+
+  run(scenario())
+
+  assert db.config.use_sensor
+  assert db.config.db_synchronous == 'FULL'
+
+def test_invalid_pragma_leaves_config_unchanged(run, db):
+  cfg = db.config.model_copy(update={'use_sensor': True, 'db_synchronous': 'sometimes'})
+
+  with pytest.raises(Exception, match='Invalid synchronous mode'):
+    run(db.update_config_async(cfg))
+
+  run(db.configure_async())
+  assert not db.config.use_sensor
+  assert db.config.db_synchronous != 'sometimes'
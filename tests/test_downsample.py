@@ -0,0 +1,37 @@
+import math
+import pytest
+from api.db.downsample import lttb
+
+def wave(n: int) -> list:
+  return [(i * 60, round(20 + 5 * math.sin(i / 50), 2), round(50 + 10 * math.cos(i / 80), 2)) for i in range(n)]
+
+@pytest.mark.parametrize('threshold', [3, 10, 100, 999])
+def test_at_most_threshold_points(threshold):
+  points = wave(5000)
+  sampled = lttb(points, threshold)
+
+  assert len(sampled) == threshold
+  assert sampled[0] == points[0] and sampled[-1] == points[-1]
+  assert [p[0] for p in sampled] == sorted({p[0] for p in sampled})
+
+def test_keeps_extremes():
+  points = wave(5000)
+  points[1234] = (points[1234][0], 60.0, points[1234][2])
+  points[3210] = (points[3210][0], points[3210][1], -5.0)
+  sampled = lttb(points, 50)
+
+  assert points[1234] in sampled
+  assert points[3210] in sampled
+
+def test_missing_values():
+  points = [(p[0], None if i % 7 == 0 else p[1], None if i % 11 == 0 else p[2]) for i, p in enumerate(wave(1000))]
+  sampled = lttb(points, 40)
+
+  assert len(sampled) == 40
+  assert all(point in points for point in sampled)
+
+def test_short_series_unchanged():
+  points = wave(10)
+
+  assert lttb(points, 10) is points
+  assert lttb(points, 2) is points
@@ -0,0 +1,81 @@
+import gzip
+import os
+import sqlite3
+from datetime import datetime
+from api.streaming import gzip_file_response
+
+START = int(datetime(2024, 3, 10, 12).timestamp())
+
+def counts(path: str) -> dict:
+  conn = sqlite3.connect(path)
+
+  try:
+    return {
+      table: conn.execute(f'SELECT COUNT(*) FROM {table};').fetchone()[0]
+      for table in ('sensors', 'config', 'readings', 'readings_hourly', 'readings_daily')
+    }
+  finally:
+    conn.close()
+
+def fill(run, db, days: int = 3):
+  db.config.write_buffer_size = 1000
+
+  for i in range(days * 24):
+    run(db.insert_sensor_entry_async(1, 20.0 + i % 5, 40.0, START + i * 3600))
+
+  run(db.flush_async())
+
+def test_full_snapshot_includes_buffered_readings(tmp_path, run, db):
+  fill(run, db)
+  run(db.insert_sensor_entry_async(1, 25.0, 45.0, START + 100 * 3600))
+  assert db._pending_readings
+
+  target = str(tmp_path / 'dump.db')
+  run(db.snapshot_async(target))
+
+  assert counts(target) == counts(db.dbfile)
+  assert counts(target)['readings'] == 3 * 24 + 1
+
+def test_snapshot_skips_uncommitted_writes(tmp_path, run, db):
+  fill(run, db)
+
+  async def uncommitted():
+    await db.ctx.execute('INSERT INTO readings VALUES (1, ?, 9900, 9900);', [START + 200 * 3600])
+
+  # a write in flight on the writer connection is not part of the snapshot.
+  run(uncommitted())
+  target = str(tmp_path / 'dump.db')
+  run(db.snapshot_async(target))
+  run(db.ctx.rollback())
+
+  assert counts(target)['readings'] == 3 * 24
+
+def test_ranged_snapshot(tmp_path, run, db):
+  fill(run, db)
+
+  target = str(tmp_path / 'dump.db')
+  run(db.snapshot_async(target, '2024-03-11', '2024-03-11'))
+  dumped = counts(target)
+
+  assert dumped['readings'] == 24
+  assert dumped['readings_hourly'] == 24
+  assert dumped['readings_daily'] == 1
+  assert (dumped['sensors'], dumped['config']) == (1, 1)
+
+def test_gzip_response_cleans_up(tmp_path, run):
+  folder = tmp_path / 'dump'
+  folder.mkdir()
+  path = folder / 'thum.db'
+  data = os.urandom(3 * 1024 * 1024)
+  path.write_bytes(data)
+
+  response = gzip_file_response(str(path), 'thum.db.gz', str(folder))
+
+  async def collect():
+    return b''.join([chunk async for chunk in response.body_iterator])
+
+  assert gzip.decompress(run(collect())) == data
+
+  # the snapshot folder is removed once the body has been sent.
+  assert not folder.exists()
+  assert response.headers['content-disposition'] == 'attachment; filename="thum.db.gz"'
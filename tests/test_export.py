@@ -0,0 +1,83 @@
+import io
+import time
+import pytest
+from conftest import open_database
+from api.db import export
+from api.db.export import export_response
+from api.db.ingest import ingest_async
+
+DAY = 86400
+START = int(time.time()) // DAY * DAY - 5 * DAY
+
+def fill(run, db):
+  db.config.write_buffer_size = 1000
+
+  for i in range(3 * 144):
+    run(db.insert_sensor_entry_async(1, round(20 + (i % 37) / 10, 2), round(45 - (i % 23) / 10, 2), START + i * 600))
+
+  run(db.flush_async())
+
+def stored(run, db) -> list:
+  async def rows():
+    return [row async for batch in db.iter_export_async() for row in batch]
+
+  return run(rows())
+
+def export_bytes(run, db, fmt: str, **filters) -> bytes:
+  async def collect():
+    response = await export_response(db.iter_export_async(**filters), fmt, 'thum')
+    return b''.join([chunk async for chunk in response.body_iterator])
+
+  return run(collect())
+
+def test_csv_round_trip(tmp_path, run, db, monkeypatch):
+  # small batches, so the export is written in several chunks.
+  monkeypatch.setattr('api.db.database.EXPORT_BATCH_SIZE', 100)
+  fill(run, db)
+  data = export_bytes(run, db, 'csv')
+
+  assert data.startswith(export.CSV_HEADER.encode())
+
+  copy = run(open_database(str(tmp_path / 'copy.db')))
+
+  try:
+    async def chunks():
+      yield data
+
+    result = run(ingest_async(copy, chunks(), 'csv'))
+
+    assert (result.received, result.inserted, result.rejected) == (3 * 144, 3 * 144, {})
+    assert stored(run, copy) == stored(run, db)
+  finally:
+    run(copy.shutdown_async())
+
+def test_csv_filters(run, db):
+  fill(run, db)
+  lines = export_bytes(run, db, 'csv', sensor_id=1, start=time.strftime('%Y-%m-%d', time.localtime(START + DAY))).decode().splitlines()
+
+  assert len(lines) == 1 + 2 * 144
+  assert int(lines[1].split(',')[1]) == START + DAY
+
+@pytest.mark.parametrize('fmt', ['arrow', 'parquet'])
+def test_arrow_round_trip(run, db, fmt):
+  pa = pytest.importorskip('pyarrow')
+  import pyarrow.parquet
+
+  fill(run, db)
+  data = export_bytes(run, db, fmt)
+  table = pa.ipc.open_stream(data).read_all() if fmt == 'arrow' else pyarrow.parquet.read_table(io.BytesIO(data))
+
+  assert table.column_names == ['sensor_id', 'ts', 'temperature', 'humidity']
+  assert table.num_rows == 3 * 144
+
+  rows = list(zip(
+    table['sensor_id'].to_pylist(),
+    [int(ts.timestamp()) for ts in table['ts'].to_pylist()],
+    [round(value * 100) for value in table['temperature'].to_pylist()],
+    [round(value * 100) for value in table['humidity'].to_pylist()]
+  ))
+  assert rows == [tuple(row) for row in stored(run, db)]
+
+def test_unknown_format(run, db):
+  with pytest.raises(Exception, match='Unsupported export format'):
+    export_bytes(run, db, 'xlsx')
@@ -0,0 +1,57 @@
+import pytest
+from fastapi.testclient import TestClient
+import api.main as main
+from api.models.app_config import AppConfig
+
+@pytest.fixture
+def follower(monkeypatch):
+  monkeypatch.setattr(main.leader_service, 'is_leader', False)
+
+  # no lifespan, a follower must turn writes away before touching the database.
+  return TestClient(main.app)
+
+@pytest.mark.parametrize('method, url, body', [
+  ('POST', '/api/sensor/bulk', []),
+  ('POST', '/api/sensors', {'name': 'outside', 'type': 'DHT22', 'pin': 'D4'}),
+  ('PUT', '/api/sensors/1', {'name': 'outside', 'type': 'DHT22', 'pin': 'D4'}),
+  ('DELETE', '/api/sensors/1', None),
+  ('DELETE', '/api/logs/1', None),
+  ('DELETE', '/api/logs', None),
+  ('POST', '/api/statistics/rebuild', None),
+  ('PUT', '/api/config', AppConfig.default().model_dump())
+])
+def test_follower_rejects_writes(follower, method, url, body):
+  response = follower.request(method, url, json=body)
+
+  assert response.status_code == 503
+  assert response.headers['retry-after'] == str(main.SYNC_INTERVAL)
+  assert response.json()['success'] is False
+
+def test_follower_does_not_reload_sensors(monkeypatch, run):
+  reloads = []
+
+  async def reload(db):
+    reloads.append(db)
+
+  monkeypatch.setattr(main.sensor_service, 'reload', reload)
+
+  monkeypatch.setattr(main.leader_service, 'is_leader', False)
+  run(main.reload_sensors())
+  assert reloads == []
+
+  monkeypatch.setattr(main.leader_service, 'is_leader', True)
+  run(main.reload_sensors())
+  assert reloads == [main.db]
+
+def test_lock_files_follow_database_path(tmp_path, monkeypatch):
+  path = str(tmp_path / 'elsewhere.db')
+  monkeypatch.setattr(main.db, 'dbfile', path)
+
+  with TestClient(main.app) as client:
+    assert main.leader_service.is_leader
+    assert main.leader_service.lock_path == f'{path}.leader'
+    assert client.get('/api/config').status_code == 200
+
+  assert (tmp_path / 'elsewhere.db.leader').exists()
+  assert (tmp_path / 'elsewhere.db.startup').exists()
+  assert not main.leader_service.is_leader
@@ -0,0 +1,107 @@
+import asyncio
+import api.main as main
+from api.sensors import reading_hub
+from api.sensors.reading_hub import Reading, ReadingHub
+from api.sensors.sensor_poll import SensorPoll
+from api.streaming import _sse_body
+
+def test_hub_fans_out_to_every_subscriber():
+  hub = ReadingHub()
+
+  with hub.subscribe() as first, hub.subscribe() as second:
+    assert hub.subscriber_count == 2
+    hub.publish(Reading(1, 20.0, 40.0, 100))
+    hub.publish(Reading(2, 21.0, 41.0, 101))
+
+    assert [first.get_nowait().sensor_id for _ in range(2)] == [1, 2]
+    assert [second.get_nowait().sensor_id for _ in range(2)] == [1, 2]
+
+  assert hub.subscriber_count == 0
+  assert hub.latest(1).temperature == 20.0
+  assert hub.latest(None).sensor_id == 2
+
+def test_slow_subscriber_only_misses_old_readings(monkeypatch):
+  monkeypatch.setattr(reading_hub, 'SUBSCRIBER_QUEUE_SIZE', 3)
+  hub = ReadingHub()
+
+  with hub.subscribe() as queue:
+    for ts in range(10):
+      hub.publish(Reading(1, 20.0, 40.0, ts))
+
+    assert [queue.get_nowait().ts for _ in range(queue.qsize())] == [7, 8, 9]
+
+def test_latest_respects_max_age():
+  hub = ReadingHub()
+  reading = Reading(1, 20.0, 40.0, 100)
+  reading.received -= 30
+  hub.publish(reading)
+
+  assert hub.latest(1, 60) is reading
+  assert hub.latest(1, 10) is None
+
+def test_live_events_filter_and_disconnect(monkeypatch, run):
+  hub = ReadingHub()
+  hub.publish(Reading(1, 20.0, 40.0, 100))
+  hub.publish(Reading(2, 25.0, 50.0, 100))
+  monkeypatch.setattr(main.sensor_service, 'hub', hub)
+  monkeypatch.setattr(main, 'LIVE_KEEPALIVE', 0.05)
+
+  async def stream():
+    events = main.live_events(2)
+
+    # the latest reading first, then a keep-alive while nothing new arrives.
+    first = await anext(events)
+    keepalive = await anext(events)
+
+    hub.publish(Reading(1, 21.0, 41.0, 200))
+    hub.publish(Reading(2, 26.0, 51.0, 200))
+    live = await anext(events)
+    subscribers = hub.subscriber_count
+
+    # a client disconnecting closes the generator, which drops its queue.
+    await events.aclose()
+    return first, keepalive, live, subscribers
+
+  first, keepalive, live, subscribers = run(stream())
+
+  assert (first.sensor_id, first.temperature) == (2, 25.0)
+  assert keepalive is None
+  assert (live.sensor_id, live.temperature) == (2, 26.0)
+  assert subscribers == 1
+  assert hub.subscriber_count == 0
+
+def test_sse_format(run):
+  async def events():
+    yield main.live_sensor(Reading(1, 20.0, 40.0, 100))
+    yield None
+
+  async def collect():
+    return [chunk async for chunk in _sse_body(events())]
+
+  data, keepalive = run(collect())
+
+  assert data.startswith('data: {') and data.endswith('\n\n')
+  assert '"temperature":20.0' in data
+  assert keepalive == ': keep-alive\n\n'
+
+def test_concurrent_current_requests_share_one_read(run):
+  class SlowSensor:
+    reads = 0
+
+    async def read(self):
+      SlowSensor.reads += 1
+      await asyncio.sleep(0.05)
+      return 21.5, 40.0
+
+  poll = SensorPoll(1, SlowSensor(), hub=ReadingHub())
+
+  async def current():
+    readings = await asyncio.gather(*[poll.get_sensor_reading(10) for _ in range(5)])
+    cached = await poll.get_sensor_reading(10)
+    return readings, cached
+
+  readings, cached = run(current())
+
+  assert SlowSensor.reads == 1
+  assert {reading.temperature for reading in readings} == {21.5}
+  assert cached is readings[0]
@@ -0,0 +1,59 @@
+from conftest import count
+
+TS = 1700000000
+
+def log(run, db, entries: list[tuple[str, str, int]]):
+  for level, message, ts in entries:
+    run(db.insert_log_entry_async(message, level, ts))
+
+  run(db.flush_async())
+
+def test_repeated_messages_are_deduplicated(run, db):
+  db.config.log_dedupe_window = 3600
+
+  log(run, db, [('error', 'sensor 1: checksum', TS), ('error', 'sensor 1: checksum', TS + 600)])
+  log(run, db, [('error', 'sensor 1: checksum', TS + 1200), ('warning', 'sensor 1: checksum', TS + 1200)])
+
+  entries = run(db.logs_async())
+  assert [(entry.level, entry.count) for entry in entries] == [('warning', 1), ('error', 3)]
+  assert entries[1].first_timestamp != entries[1].timestamp
+
+  # outside the window the message starts a new entry.
+  log(run, db, [('error', 'sensor 1: checksum', TS + 1200 + 3601 + 600)])
+  assert [entry.count for entry in run(db.logs_async(level='error'))] == [1, 3]
+
+def test_logs_are_capped(run, db):
+  db.config.log_max_entries = 5
+  log(run, db, [('info', f'message {i}', TS + i) for i in range(12)])
+
+  assert count(run, db, 'logs') == 5
+  assert [entry.message for entry in run(db.logs_async())] == [f'message {i}' for i in range(11, 6, -1)]
+
+def test_keyset_paging(run, db):
+  log(run, db, [('error' if i % 3 == 0 else 'info', f'message {i}', TS + i) for i in range(10)])
+
+  pages = []
+  before = None
+
+  while page := run(db.logs_async(before, 4)):
+    pages.append([entry.message for entry in page])
+    before = page[-1].id
+
+  assert pages == [
+    ['message 9', 'message 8', 'message 7', 'message 6'],
+    ['message 5', 'message 4', 'message 3', 'message 2'],
+    ['message 1', 'message 0']
+  ]
+  assert [entry.message for entry in run(db.logs_async(level='error'))] == ['message 9', 'message 6', 'message 3', 'message 0']
+
+def test_delete_logs(run, db):
+  log(run, db, [('info', f'message {i}', TS + i) for i in range(3)])
+  newest = run(db.logs_async(limit=1))[0]
+
+  assert run(db.delete_log_async(newest.id)).count == 1
+  assert run(db.delete_log_async(newest.id)).count == 0
+
+  # buffered entries are flushed first, so they are deleted too.
+  run(db.insert_log_entry_async('pending', 'info', TS + 10))
+  assert run(db.delete_all_logs_async()).count == 3
+  assert run(db.logs_async()) == []
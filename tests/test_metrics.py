@@ -0,0 +1,81 @@
+import pytest
+from fastapi.testclient import TestClient
+import api.main as main
+from api.metrics import Counter, Histogram, Registry, http_request_duration, timed
+
+def test_counter_exposition():
+  counter = Counter('thum_test_total', 'A test counter.', ('sensor_id', 'result'))
+  counter.inc(1, 'success')
+  counter.inc(1, 'success')
+  counter.inc(2, 'say "hi"\n')
+
+  assert counter.render().splitlines() == [
+    '# HELP thum_test_total A test counter.',
+    '# TYPE thum_test_total counter',
+    'thum_test_total{sensor_id="1",result="success"} 2',
+    'thum_test_total{sensor_id="2",result="say \\"hi\\"\\n"} 1'
+  ]
+
+def test_histogram_buckets_are_cumulative():
+  histogram = Histogram('thum_test_seconds', 'A test histogram.', ('method',), (0.1, 1))
+  for value in (0.05, 0.5, 0.7, 5):
+    histogram.observe(value, 'all')
+
+  lines = histogram.render().splitlines()[2:]
+
+  assert lines == [
+    'thum_test_seconds_bucket{method="all",le="0.1"} 1',
+    'thum_test_seconds_bucket{method="all",le="1"} 3',
+    'thum_test_seconds_bucket{method="all",le="+Inf"} 4',
+    'thum_test_seconds_sum{method="all"} 6.25',
+    'thum_test_seconds_count{method="all"} 4'
+  ]
+
+def test_registry_renders_every_metric():
+  registry = Registry()
+  registry.register(Counter('thum_a_total', 'A.')).inc()
+  registry.register(Counter('thum_b_total', 'B.'))
+
+  assert registry.render() == '# HELP thum_a_total A.\n# TYPE thum_a_total counter\nthum_a_total 1\n# HELP thum_b_total B.\n# TYPE thum_b_total counter\n'
+
+def test_timed_observes_failures(run):
+  histogram = Histogram('thum_test_query_seconds', 'Queries.', ('method',))
+
+  @timed(histogram)
+  async def failing_async():
+    raise Exception('locked')
+
+  with pytest.raises(Exception):
+    run(failing_async())
+
+  assert 'thum_test_query_seconds_count{method="failing_async"} 1' in histogram.render()
+
+def route_counts() -> dict:
+  return {key: sum(counts) for key, counts in http_request_duration._counts.items()}
+
+def test_request_labels_use_route_templates(monkeypatch):
+  monkeypatch.setattr(main.leader_service, 'is_leader', False)
+  client = TestClient(main.app)
+  before = route_counts()
+
+  # followers answer these without touching the database.
+  for log_id in range(5):
+    client.delete(f'/api/logs/{log_id}')
+
+  client.get('/does/not/exist/1')
+  client.get('/does/not/exist/2')
+  after = route_counts()
+
+  added = {key: count - before.get(key, 0) for key, count in after.items() if count != before.get(key, 0)}
+  assert added == {
+    ('DELETE', '/api/logs/{log_id}', '503'): 5,
+    ('GET', 'unmatched', '404'): 2
+  }
+
+def test_metrics_endpoint():
+  response = TestClient(main.app).get('/metrics')
+
+  assert response.status_code == 200
+  assert response.headers['content-type'].startswith('text/plain; version=0.0.4')
+  assert '# TYPE thum_http_request_duration_seconds histogram' in response.text
+  assert '# TYPE thum_db_queue_depth gauge' in response.text
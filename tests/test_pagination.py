@@ -0,0 +1,57 @@
+from datetime import datetime
+import pytest
+from api.db.pagination import Page, decode_cursor, encode_cursor
+
+START = int(datetime(2024, 3, 1, 12).timestamp())
+
+@pytest.fixture
+def days(run, db):
+  db.config.write_buffer_size = 100
+
+  for day in range(10):
+    run(db.insert_sensor_entry_async(1, 20.0 + day, 40.0, START + day * 86400))
+
+  run(db.flush_async())
+  return db
+
+def test_cursor_round_trip():
+  assert decode_cursor(encode_cursor(START)) == START
+  assert Page(5, encode_cursor(START)).start(None) == START + 1
+
+@pytest.mark.parametrize('cursor', ['not a cursor', 'dHM6YWJj', 'aWQ6MTIz'])
+def test_invalid_cursor(cursor):
+  # garbage, ts:abc and id:123.
+  with pytest.raises(Exception, match='Invalid cursor'):
+    Page(5, cursor)
+
+def test_pages_cover_the_range(run, days):
+  seen = []
+  after = None
+  sizes = []
+
+  while True:
+    page = Page(4, after)
+    entries = run(days.by_range_async('2024-03-01', '2024-03-10', 1, page=page))
+    sizes.append(len(entries))
+    seen += [entry.temperature for entry in entries]
+
+    if page.next is None:
+      break
+
+    after = page.next
+
+  assert sizes == [4, 4, 2]
+  assert seen == [20.0 + day for day in range(10)]
+
+def test_last_page_has_no_cursor(run, days):
+  page = Page(10)
+  run(days.by_month_async(2024, 3, 1, page=page))
+  assert page.next is not None
+
+  last = Page(10, page.next)
+  assert run(days.by_month_async(2024, 3, 1, page=last)) == []
+  assert last.next is None
+
+def test_range_rejects_points_with_limit(days):
+  with pytest.raises(Exception, match='points and limit'):
+    days.iter_by_range_async('2024-03-01', '2024-03-10', 1, points=5, page=Page(4))
@@ -0,0 +1,68 @@
+import sqlite3
+import time
+import pytest
+from api.db.database import STORE_ALL, STORE_ROLLUP
+from api.sensors.sensor_poll import SensorPoll
+
+def table_rows(run, db, since: int) -> list:
+  return [tuple(row) for row in run(db.recent_readings_async(1, since)).tolist()]
+
+def ring_rows(poll: SensorPoll, since: int) -> list:
+  ts, values = poll.recent.window(since)
+  return [(t, *v) for t, v in zip(ts.tolist(), values.tolist())]
+
+def test_ring_matches_table(run, db):
+  since = int(time.time()) - 3600
+  poll = SensorPoll(1, None, interval=60)
+  run(poll.prefill(db))
+
+  run(poll.store(db, [(since + 60, 21.5, 40.0, STORE_ALL), (since + 120, 21.6, 40.5, STORE_ROLLUP), (since + 180, 21.7, 41.0, STORE_ALL)]))
+  run(db.flush_async())
+
+  assert ring_rows(poll, since) == table_rows(run, db, since) == [(since + 60, 2150, 4000), (since + 180, 2170, 4100)]
+  assert db.recent.rows(1, since) is not None
+
+def test_failed_flush_invalidates_ring(run, db):
+  since = int(time.time()) - 3600
+  poll = SensorPoll(1, None, interval=60)
+  run(poll.prefill(db))
+
+  write = db._write_readings_async
+  calls = []
+
+  async def busy_once(readings):
+    calls.append(len(readings))
+    if len(calls) == 1:
+      raise sqlite3.OperationalError('database is locked')
+
+    await write(readings)
+
+  db._write_readings_async = busy_once
+  db.config.write_buffer_size = 1
+
+  with pytest.raises(sqlite3.OperationalError):
+    run(poll.store(db, [(since + 60, 21.5, 40.0, STORE_ALL)]))
+
+  # the reading waits in the write buffer, memory must not answer for it until it is rebuilt.
+  assert poll.recent.stale
+  assert db.recent.rows(1, since) is None
+
+  run(poll.prefill(db))
+
+  assert ring_rows(poll, since) == table_rows(run, db, since) == [(since + 60, 2150, 4000)]
+
+def test_rejected_insert_is_not_in_ring(run, db):
+  since = int(time.time()) - 3600
+  poll = SensorPoll(1, None, interval=60)
+  run(poll.prefill(db))
+
+  async def locked(*args):
+    raise sqlite3.OperationalError('database is locked')
+
+  db.insert_sensor_entry_async = locked
+
+  with pytest.raises(sqlite3.OperationalError):
+    run(poll.store(db, [(since + 60, 21.5, 40.0, STORE_ALL)]))
+
+  assert poll.recent.size == 0
+  assert poll.recent.stale
@@ -0,0 +1,27 @@
+from fastapi import Request
+from api.response_cache import ResponseCache, cached_json_response
+
+def request(headers: dict[str, str] | None = None) -> Request:
+  return Request({'type': 'http', 'method': 'GET', 'path': '/', 'headers': [(k.lower().encode(), v.encode()) for k, v in (headers or {}).items()]})
+
+def test_closed_periods_are_revalidated(run):
+  cache = ResponseCache(8)
+
+  rows = [{'ts': '2024-01-01', 'temperature': 21.5, 'humidity': 40.0}]
+
+  async def load():
+    return rows
+
+  response = run(cached_json_response(cache, request(), 'key', 1, True, load))
+  cache_control = response.headers['cache-control']
+
+  assert 'immutable' not in cache_control
+  assert 'max-age=300' in cache_control
+
+  # a bulk import into the past bumps the version, the etag changes and the browser sees it.
+  revalidated = run(cached_json_response(cache, request({'If-None-Match': response.headers['etag']}), 'key', 1, True, load))
+  rows = [{'ts': '2024-01-01', 'temperature': 21.75, 'humidity': 40.0}]
+  changed = run(cached_json_response(cache, request({'If-None-Match': response.headers['etag']}), 'key', 2, True, load))
+
+  assert revalidated.status_code == 304
+  assert changed.status_code == 200
@@ -0,0 +1,107 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+from api.models.series_query import SeriesQuery
+from conftest import count, open_database
+
+DAYS = 800
+
+def baseline_database(path: str) -> int:
+  # the schema thum shipped with before readings were stored as integers.
+  conn = sqlite3.connect(path)
+  conn.executescript("""
+    CREATE TABLE logs (message TEXT NOT NULL, timestamp TEXT NOT NULL);
+    CREATE TABLE sensor_data (
+      temperature NUMERIC NOT NULL,
+      humidity NUMERIC NOT NULL,
+      timestamp_date date NOT NULL,
+      timestamp_time time NOT NULL
+    );
+    CREATE TABLE config (
+      id INTEGER PRIMARY KEY CHECK (id = 1),
+      sensor_interval NUMERIC NOT NULL,
+      dateformat TEXT NOT NULL,
+      timeformat TEXT NOT NULL,
+      weekformat TEXT NOT NULL,
+      monthformat TEXT NOT NULL,
+      iso_week_format TEXT NOT NULL,
+      use_sensor BOOLEAN NOT NULL CHECK (use_sensor IN (0, 1))
+    );
+    INSERT INTO config VALUES (1, 600, '%Y-%m-%d', '%H:%M:%S', '%G-W%V', '%Y-%m', '%G-W%V-%u', 0);
+  """)
+
+  start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=DAYS)
+  rows = [
+    (20 + (i % 50) / 10, 40 + (i % 30) / 10, ts.strftime('%Y-%m-%d'), ts.strftime('%H:%M:%S'))
+    for i, ts in enumerate(start + timedelta(hours=h) for h in range(DAYS * 24))
+  ]
+
+  conn.executemany('INSERT INTO sensor_data VALUES (?, ?, ?, ?);', rows)
+  conn.commit()
+  conn.close()
+
+  return len(rows)
+
+def test_baseline_migration_keeps_every_reading(tmp_path, run):
+  path = str(tmp_path / 'thum.db')
+  rows = baseline_database(path)
+  db = run(open_database(path))
+
+  try:
+    assert count(run, db, 'readings') == rows
+    assert count(run, db, 'readings_hourly') == rows
+    assert count(run, db, 'readings_daily') == DAYS
+    assert run(db.statistics_async(1)).total_entries == rows
+
+    # retention is opt in, the first compaction after an upgrade must not delete anything.
+    assert run(db.compact_async()) == 0
+    assert count(run, db, 'readings') == rows
+  finally:
+    run(db.shutdown_async())
+
+def test_pruned_history_falls_back_to_daily_tier(tmp_path, run):
+  path = str(tmp_path / 'thum.db')
+  baseline_database(path)
+  db = run(open_database(path))
+
+  try:
+    day = datetime.now() - timedelta(days=500)
+    date = day.strftime('%Y-%m-%d')
+    before = run(db.by_date_async(day.day, day.month, day.year, 1))
+    assert len(before) == 24
+
+    run(db.update_config_async(db.config.model_copy(update={'raw_retention_days': 30, 'aggregate_retention_days': 365})))
+    run(db.configure_async())
+    assert run(db.compact_async()) > 0
+    assert db.pruned_until > 0
+
+    assert count(run, db, 'readings_daily') == DAYS
+    expected = run(db.by_range_async(date, date, 1))
+    assert len(expected) == 1
+
+    daily = run(db.by_date_async(day.day, day.month, day.year, 1))
+    assert [entry.temperature for entry in daily] == [expected[0].temperature]
+
+    assert len(run(db.by_range_async(date, date, 1, points=10))) == 1
+    assert len(run(db.series_array_async(date, date, 1, 'raw'))) == 1
+    assert len(run(db.series_array_async(date, date, 1, 'hourly'))) == 1
+
+    results = run(db.batch_query_async([
+      SeriesQuery(start=date, end=date, granularity='raw', sensor_id=1),
+      SeriesQuery(start=date, end=date, granularity='hourly')
+    ]))
+    assert [len(result.entries) for result in results] == [1, 1]
+    assert results[0].entries[0].temperature == expected[0].temperature
+
+    async def export():
+      return [row async for batch in db.iter_export_async(1, date, date) for row in batch]
+
+    assert len(run(export())) == 1
+
+    # a range across the pruned edge mixes tiers but stays ordered.
+    recent = datetime.now() - timedelta(days=2)
+    edge = run(db.by_range_async((datetime.now() - timedelta(days=370)).strftime('%Y-%m-%d'), recent.strftime('%Y-%m-%d'), 1, points=100000))
+    stamps = [datetime.strptime(entry.ts, '%Y-%m-%d %H:%M:%S') for entry in edge]
+    assert stamps == sorted(stamps)
+  finally:
+    run(db.shutdown_async())
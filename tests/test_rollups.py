@@ -0,0 +1,57 @@
+import random
+from datetime import datetime
+from api.db.storage import day_start, hour_start
+
+START = int(datetime(2024, 3, 10, 22).timestamp())
+
+def stored(run, db, sql: str) -> dict:
+  async def fetch():
+    async with db.ctx.execute(sql) as cursor:
+      return {tuple(row[:2]): tuple(row[2:]) for row in await cursor.fetchall()}
+
+  return run(fetch())
+
+def expected(run, db, bucket) -> dict:
+  groups: dict[tuple, list] = {}
+
+  for (sensor_id, ts), (temperature, humidity) in stored(run, db, 'SELECT sensor_id, ts, temperature, humidity FROM readings;').items():
+    groups.setdefault((sensor_id, bucket(ts)), []).append((temperature, humidity))
+
+  return {
+    key: (
+      len(rows),
+      sum(t for t, _ in rows), min(t for t, _ in rows), max(t for t, _ in rows),
+      sum(h for _, h in rows), min(h for _, h in rows), max(h for _, h in rows)
+    )
+    for key, rows in groups.items()
+  }
+
+def test_rollups_match_raw_readings(run, db):
+  random.seed(7)
+  db.config.write_buffer_size = 50
+
+  # two sensors over midnight, with a buffer size that splits hours across flushes.
+  for i in range(400):
+    for sensor_id in (1, 2):
+      run(db.insert_sensor_entry_async(sensor_id, round(random.uniform(-5, 30), 2), round(random.uniform(20, 90), 2), START + i * 300 + sensor_id))
+
+  run(db.flush_async())
+
+  columns = 'count, temperature_sum, temperature_min, temperature_max, humidity_sum, humidity_min, humidity_max'
+  hourly = stored(run, db, f'SELECT sensor_id, hour_ts, {columns} FROM readings_hourly;')
+  daily = stored(run, db, f'SELECT sensor_id, day_ts, {columns} FROM readings_daily;')
+
+  assert hourly == expected(run, db, hour_start)
+  assert daily == expected(run, db, day_start)
+  assert len(daily) == 6
+
+def test_daily_average_matches_raw(run, db):
+  db.config.write_buffer_size = 100
+
+  for i, temperature in enumerate([18.0, 19.5, 21.25, 22.0]):
+    run(db.insert_sensor_entry_async(1, temperature, 40.0 + i, START - 6 * 3600 + i * 600))
+
+  run(db.flush_async())
+  entries = run(db.by_month_async(2024, 3, 1))
+
+  assert [(entry.ts, entry.temperature, entry.humidity) for entry in entries] == [('2024-03-10', 20.1875, 41.5)]
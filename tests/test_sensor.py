@@ -0,0 +1,68 @@
+import asyncio
+import threading
+import time
+import pytest
+from api.models.sensor_config import SensorConfig
+from api.sensors.factory import create_sensor
+from api.sensors.sensor import Sensor
+
+class HungSensor(Sensor):
+  def __init__(self):
+    self.release = threading.Event()
+
+  def read_sync(self):
+    # a DHT read stuck on the GPIO pin, only returns once the test lets it.
+    self.release.wait(5)
+    return 21.5, 40.0
+
+def test_hung_read_times_out_without_blocking_the_loop(run):
+  sensor = HungSensor()
+  sensor.read_timeout = 0.2
+
+  async def read():
+    ticks = 0
+
+    async def tick():
+      nonlocal ticks
+      while True:
+        await asyncio.sleep(0.01)
+        ticks += 1
+
+    ticker = asyncio.ensure_future(tick())
+    started = time.perf_counter()
+
+    with pytest.raises(RuntimeError, match='timed out after 0.2'):
+      await sensor.read()
+
+    elapsed = time.perf_counter() - started
+
+    # the read is still running in its thread, the pin is not read twice.
+    with pytest.raises(RuntimeError, match='still in progress'):
+      await sensor.read()
+
+    ticker.cancel()
+    sensor.release.set()
+    await asyncio.sleep(0.05)
+
+    return elapsed, ticks, await sensor.read()
+
+  elapsed, ticks, reading = run(read())
+
+  assert elapsed < 1
+  assert ticks >= 5
+  assert reading == (21.5, 40.0)
+
+def test_read_timeout_comes_from_the_sensor_config():
+  assert create_sensor(SensorConfig(name='attic', type='Dummy', read_timeout=2.5)).read_timeout == 2.5
+  assert create_sensor(SensorConfig(name='attic', type='Dummy')).read_timeout == 5.0
+
+  with pytest.raises(ValueError):
+    SensorConfig(name='attic', type='Dummy', read_timeout=0)
+
+def test_read_timeout_is_stored(run, db):
+  sensor = run(db.insert_sensor_async(SensorConfig(name='attic', type='Dummy', read_timeout=1.5)))
+  assert next(s for s in run(db.sensors_async()) if s.id == sensor.id).read_timeout == 1.5
+
+  run(db.update_sensor_async(sensor.id, sensor.model_copy(update={'read_timeout': 8.0})))
+  assert next(s for s in run(db.sensors_async()) if s.id == sensor.id).read_timeout == 8.0
+  assert run(db.sensors_async())[0].read_timeout == 5.0
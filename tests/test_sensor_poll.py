@@ -0,0 +1,116 @@
+import asyncio
+import pytest
+from api.models.app_config import SettingsChanged
+from api.sensors import sensor_poll
+from api.sensors.sensor_poll import SensorPoll
+
+class FakeSensor:
+  def __init__(self, results: list):
+    self.results = results
+    self.reads = 0
+
+  async def read(self):
+    result = self.results[min(self.reads, len(self.results) - 1)]
+    self.reads += 1
+
+    if isinstance(result, Exception):
+      raise result
+
+    return result
+
+  def close(self):
+    pass
+
+class FakeClock:
+  # stands in for the wall clock, the loop clock and asyncio.sleep, so retries take no real time.
+  def __init__(self, monkeypatch, now: float):
+    self.now = now
+    self.sleeps: list[float] = []
+
+    monkeypatch.setattr(sensor_poll.time, 'time', lambda: self.now)
+    monkeypatch.setattr(sensor_poll.random, 'uniform', lambda a, b: 0.0)
+    monkeypatch.setattr(sensor_poll.asyncio, 'sleep', self.sleep)
+
+  async def sleep(self, delay: float):
+    self.sleeps.append(delay)
+    self.now += delay
+
+  def install(self):
+    asyncio.get_running_loop().time = lambda: self.now
+
+def test_ticks_align_to_the_wall_clock(monkeypatch, run):
+  clock = FakeClock(monkeypatch, 1000.3)
+
+  async def tick():
+    clock.install()
+    return SensorPoll(1, FakeSensor([])).next_tick(600)
+
+  scheduled, ts = run(tick())
+
+  assert ts == 1200
+  assert scheduled == pytest.approx(1200)
+
+def test_retries_back_off_until_a_reading(monkeypatch, run):
+  clock = FakeClock(monkeypatch, 0.0)
+  sensor = FakeSensor([RuntimeError('checksum'), (None, None), RuntimeError('timed out'), (21.5, 40)])
+
+  async def read():
+    clock.install()
+    return await SensorPoll(1, sensor).read_with_retries(600)
+
+  assert run(read()) == (21.5, 40.0)
+  assert sensor.reads == 4
+  assert clock.sleeps == [2.0, 4.0, 8.0]
+
+def test_retries_stop_before_the_next_tick(monkeypatch, run):
+  clock = FakeClock(monkeypatch, 0.0)
+  sensor = FakeSensor([RuntimeError('checksum')])
+
+  async def read():
+    clock.install()
+    return await SensorPoll(1, sensor).read_with_retries(5)
+
+  with pytest.raises(RuntimeError, match='checksum'):
+    run(read())
+
+  # the 4 second retry would end past the deadline, it is left to the next tick.
+  assert clock.sleeps == [2.0]
+  assert sensor.reads == 2
+
+def test_backoff_is_capped(monkeypatch, run):
+  monkeypatch.setattr(sensor_poll, 'MAX_READ_RETRIES', 6)
+  clock = FakeClock(monkeypatch, 0.0)
+  sensor = FakeSensor([RuntimeError('checksum')])
+
+  async def read():
+    clock.install()
+    return await SensorPoll(1, sensor).read_with_retries(3600)
+
+  with pytest.raises(RuntimeError):
+    run(read())
+
+  assert clock.sleeps == [2.0, 4.0, 8.0, 16.0, 30.0, 30.0]
+
+def test_settings_change_reaches_every_poll(run):
+  changed = SettingsChanged()
+
+  async def waiters():
+    seen = changed.generation
+    first = asyncio.ensure_future(changed.wait(seen))
+    await asyncio.sleep(0)
+
+    changed.set()
+
+    # a poll that was busy when the change happened still sees it on its next wait.
+    return await first, await asyncio.wait_for(changed.wait(seen), 1)
+
+  assert run(waiters()) == (1, 1)
+
+def test_settings_wait_blocks_until_a_change(run):
+  changed = SettingsChanged()
+
+  async def wait():
+    with pytest.raises(asyncio.TimeoutError):
+      await asyncio.wait_for(changed.wait(changed.generation), 0.05)
+
+  run(wait())
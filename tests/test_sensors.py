@@ -0,0 +1,57 @@
+from datetime import datetime
+from api.models.sensor_config import SensorConfig
+from api.services.sensor_service import SensorService
+
+START = int(datetime(2024, 3, 10, 12).timestamp())
+
+def test_sensor_registry_crud(run, db):
+  version = db._seen_config_version
+
+  attic = run(db.insert_sensor_async(SensorConfig(name='attic', type='Dummy', interval=60)))
+  assert attic.id is not None
+  assert [sensor.name for sensor in run(db.sensors_async())] == ['default', 'attic']
+
+  assert run(db.update_sensor_async(attic.id, attic.model_copy(update={'name': 'loft', 'enabled': False})))
+  loft = run(db.sensors_async())[1]
+  assert (loft.name, loft.enabled, loft.interval) == ('loft', False, 60)
+
+  assert run(db.delete_sensor_async(attic.id))
+  assert not run(db.delete_sensor_async(attic.id))
+  assert not run(db.update_sensor_async(attic.id, attic))
+  assert [sensor.id for sensor in run(db.sensors_async())] == [1]
+
+  # every change bumps the config version, which is how other workers notice it.
+  assert db._seen_config_version > version
+
+def test_only_enabled_sensors_are_polled():
+  service = SensorService()
+  service.init_sensors([
+    SensorConfig(id=1, name='living room', type='Dummy'),
+    SensorConfig(id=2, name='attic', type='Dummy', enabled=False),
+    SensorConfig(id=3, name='cellar', type='Dummy', interval=60)
+  ], 2)
+
+  assert list(service.sensor_polls) == [1, 3]
+  assert service.get_sensor_poll().sensor_id == 1
+  assert service.get_sensor_poll(3).interval == 60
+  assert service.get_sensor_poll(2) is None
+
+def test_queries_filter_by_sensor(run, db):
+  db.config.write_buffer_size = 100
+  attic = run(db.insert_sensor_async(SensorConfig(name='attic', type='Dummy')))
+
+  for i in range(3):
+    run(db.insert_sensor_entry_async(1, 20.0, 40.0, START + i * 600))
+    run(db.insert_sensor_entry_async(attic.id, 30.0, 60.0, START + i * 600 + 86400))
+
+  run(db.flush_async())
+
+  assert {entry.temperature for entry in run(db.by_date_async(10, 3, 2024, 1))} == {20.0}
+  assert run(db.by_date_async(10, 3, 2024, attic.id)) == []
+  assert {entry.temperature for entry in run(db.by_date_async(11, 3, 2024, attic.id))} == {30.0}
+  assert [entry.temperature for entry in run(db.by_month_async(2024, 3))] == [20.0, 30.0]
+
+  assert run(db.statistics_async(attic.id)).total_entries == 3
+  assert run(db.statistics_async()).total_entries == 6
+  assert run(db.daterange_async(attic.id))['dates'].first == '2024-03-11'
+  assert run(db.daterange_async())['dates'].first == '2024-03-10'
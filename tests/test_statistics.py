@@ -0,0 +1,82 @@
+from datetime import datetime
+from api.models.entries.statistic_entry import StatisticEntry
+
+START = int(datetime(2024, 3, 10, 12).timestamp())
+READINGS = [
+  (1, START, 20.0, 40.0),
+  (1, START + 600, 18.5, 55.0),
+  (1, START + 86400, 25.5, 35.0),
+  (1, START + 86400 + 600, 18.5, 35.0),
+  (2, START + 1200, 17.0, 60.0)
+]
+
+def store(run, db, readings=READINGS):
+  db.config.write_buffer_size = 100
+
+  for sensor_id, ts, temp, humi in readings:
+    run(db.insert_sensor_entry_async(sensor_id, temp, humi, ts))
+
+  run(db.flush_async())
+
+def summary(entry: StatisticEntry) -> tuple:
+  return (
+    entry.total_entries, round(entry.avg_temperature, 4), round(entry.avg_humidity, 4),
+    entry.min_temperature, entry.max_temperature, entry.min_humidity, entry.max_humidity
+  )
+
+def test_running_statistics(run, db):
+  store(run, db)
+  stats = run(db.statistics_async(1))
+
+  assert stats.total_entries == 4
+  assert round(stats.avg_temperature, 4) == 20.625
+  assert round(stats.avg_humidity, 4) == 41.25
+  assert (stats.min_temperature.value, stats.min_temperature.date) == (18.5, '2024-03-10')
+  assert (stats.max_temperature.value, stats.max_temperature.date) == (25.5, '2024-03-11')
+  assert (stats.min_humidity.value, stats.min_humidity.date) == (35.0, '2024-03-11')
+  assert (stats.max_humidity.value, stats.max_humidity.date) == (55.0, '2024-03-10')
+
+def test_statistics_across_sensors(run, db):
+  store(run, db)
+  stats = run(db.statistics_async())
+
+  assert stats.total_entries == 5
+  assert (stats.min_temperature.value, stats.max_humidity.value) == (17.0, 60.0)
+
+def test_rebuild_matches_running_statistics(run, db):
+  store(run, db)
+  before = [summary(run(db.statistics_async(sensor_id))) for sensor_id in (1, 2, None)]
+
+  run(db.rebuild_statistics_async())
+
+  assert [summary(run(db.statistics_async(sensor_id))) for sensor_id in (1, 2, None)] == before
+
+def test_rebuild_without_raw_rows_uses_daily_rollups(run, db):
+  store(run, db)
+
+  # the rollups keep the day of every extreme after its raw row is gone.
+  async def drop_raw():
+    await db.ctx.execute('DELETE FROM readings;')
+    await db.ctx.commit()
+
+  run(drop_raw())
+  run(db.rebuild_statistics_async())
+  stats = run(db.statistics_async(1))
+
+  assert stats.total_entries == 4
+  assert (stats.max_temperature.value, stats.max_temperature.date) == (25.5, '2024-03-11')
+  assert (stats.min_temperature.value, stats.min_temperature.date) == (18.5, '2024-03-10')
+
+def test_missing_extreme_date():
+  rows = [{
+    'total_entries': 2, 'temperature_sum': 40.0, 'humidity_sum': 80.0,
+    'min_temperature': 19.0, 'min_temperature_date': None,
+    'max_temperature': 21.0, 'max_temperature_date': START,
+    'min_humidity': 40.0, 'min_humidity_date': START,
+    'max_humidity': 40.0, 'max_humidity_date': None
+  }]
+  stats = StatisticEntry.from_rows(rows, '%Y-%m-%d')
+
+  assert stats.min_temperature.date is None
+  assert stats.max_temperature.date == '2024-03-10'
+  assert stats.max_humidity.date is None
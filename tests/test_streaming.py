@@ -0,0 +1,66 @@
+import json
+from datetime import datetime
+import pytest
+from api import streaming
+from api.db.pagination import CURSOR_HEADER, Page
+from api.models.entries.sensor_entry import SensorEntry
+from api.streaming import ndjson_response
+
+def body(run, response) -> tuple[list[str], list[dict]]:
+  async def collect():
+    return [chunk async for chunk in response.body_iterator]
+
+  chunks = run(collect())
+  return chunks, [json.loads(line) for line in ''.join(chunks).splitlines()]
+
+async def rows(count: int):
+  for i in range(count):
+    yield {'ts': i, 'temperature': 20.0, 'humidity': None}
+
+def test_ndjson_streams_in_batches(run, monkeypatch):
+  monkeypatch.setattr(streaming, 'NDJSON_BATCH_SIZE', 10)
+  response = run(ndjson_response(rows(25)))
+  chunks, lines = body(run, response)
+
+  assert response.media_type == 'application/x-ndjson'
+  assert [chunk.count('\n') for chunk in chunks] == [10, 10, 5]
+  assert [line['ts'] for line in lines] == list(range(25))
+  assert lines[0] == {'ts': 0, 'temperature': 20.0, 'humidity': None}
+
+def test_ndjson_empty(run):
+  assert body(run, run(ndjson_response(rows(0)))) == ([], [])
+
+def test_ndjson_models(run):
+  entries = [SensorEntry(ts='Monday', temperature=20.5, humidity=None)]
+  _, lines = body(run, run(ndjson_response(entries)))
+
+  assert lines == [{'ts': 'Monday', 'temperature': 20.5, 'humidity': None}]
+
+def test_ndjson_query_errors_raise_before_streaming(run):
+  async def failing():
+    raise Exception('no such table')
+    yield
+
+  # raised while building the response, so the endpoint can still answer with a 400.
+  with pytest.raises(Exception, match='no such table'):
+    run(ndjson_response(failing()))
+
+def test_ndjson_page_cursor_header(run, db):
+  db.config.write_buffer_size = 100
+  start = int(datetime(2024, 3, 1, 12).timestamp())
+
+  for day in range(5):
+    run(db.insert_sensor_entry_async(1, 20.0 + day, 40.0, start + day * 86400))
+
+  run(db.flush_async())
+
+  page = Page(3)
+  response = run(ndjson_response(db.iter_by_month_async(2024, 3, 1, page=page), page))
+  _, lines = body(run, response)
+
+  assert [line['temperature'] for line in lines] == [20.0, 21.0, 22.0]
+  assert response.headers[CURSOR_HEADER] == page.next
+
+  # the stream carries the same entries as the json endpoint.
+  _, streamed = body(run, run(ndjson_response(db.iter_by_month_async(2024, 3, 1))))
+  assert streamed == [entry.model_dump() for entry in run(db.by_month_async(2024, 3, 1))]
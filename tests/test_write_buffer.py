@@ -0,0 +1,91 @@
+import sqlite3
+import pytest
+from conftest import count
+
+def test_failed_flush_keeps_readings(run, db):
+  write = db._write_readings_async
+  calls = []
+
+  async def busy_once(readings):
+    calls.append(len(readings))
+    if len(calls) == 1:
+      raise sqlite3.OperationalError('database is locked')
+
+    await write(readings)
+
+  db._write_readings_async = busy_once
+  db.config.write_buffer_size = 100
+
+  run(db.insert_sensor_entry_async(1, 21.5, 40.0, 1700000000))
+  run(db.insert_sensor_entry_async(1, 21.6, 41.0, 1700000600))
+
+  with pytest.raises(sqlite3.OperationalError):
+    run(db.flush_async())
+
+  assert count(run, db, 'readings') == 0
+  assert len(db._pending_readings) == 2
+
+  run(db.insert_sensor_entry_async(1, 21.7, 42.0, 1700001200))
+  run(db.flush_async())
+
+  assert calls == [2, 3]
+  assert count(run, db, 'readings') == 3
+  assert db._pending_readings == []
+
+def test_poll_survives_database_errors(run, db):
+  import asyncio
+  from api.sensors.sensor_poll import SensorPoll
+
+  class Sensor:
+    async def read(self):
+      return 21.5, 40.0
+
+    def close(self):
+      pass
+
+  attempts = []
+
+  async def locked(*args):
+    attempts.append(args)
+    raise sqlite3.OperationalError('database is locked')
+
+  db.config.use_sensor = True
+  db.config.sensor_interval = 1
+  db.config.recent_hours = 0
+  db.insert_sensor_entry_async = locked
+
+  async def poll_for(seconds: float):
+    task = asyncio.create_task(SensorPoll(1, Sensor()).poll(db))
+    await asyncio.sleep(seconds)
+    task.cancel()
+    await asyncio.gather(task, return_exceptions=True)
+
+  run(poll_for(2.5))
+
+  assert len(attempts) >= 2
+  assert any('database is locked' in message for _, message, _ in db._pending_logs)
+
+def test_duplicate_reading_is_counted_once(run, db):
+  ts = 1700000000
+
+  run(db.insert_sensor_entry_async(1, 20.0, 40.0, ts))
+  run(db.flush_async())
+  run(db.insert_sensor_entry_async(1, 30.0, 50.0, ts))
+  run(db.flush_async())
+
+  async def stored():
+    async with db.ctx.execute('SELECT temperature FROM readings;') as cursor:
+      readings = [row[0] for row in await cursor.fetchall()]
+
+    async with db.ctx.execute('SELECT count, temperature_max FROM readings_hourly;') as cursor:
+      hourly = [tuple(row) for row in await cursor.fetchall()]
+
+    async with db.ctx.execute('SELECT count, temperature_max FROM readings_daily;') as cursor:
+      daily = [tuple(row) for row in await cursor.fetchall()]
+
+    return readings, hourly, daily
+
+  assert run(stored()) == ([2000], [(1, 2000)], [(1, 2000)])
+
+  stats = run(db.statistics_async(1))
+  assert (stats.total_entries, stats.max_temperature.value) == (1, 20.0)